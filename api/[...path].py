@@ -1,6 +1,9 @@
 """
 Vercel serverless function adapter for FastAPI application.
 This file wraps the FastAPI app using Mangum to make it compatible with Vercel's serverless functions.
+
+Lifespan events are disabled here, so shared resources such as the pooled HTTP client
+are created lazily on first use and reused across warm invocations.
 """
 
 from mangum import Mangum
@@ -0,0 +1,170 @@
+"""
+Local stand-in for the OpenRouter chat-completions API.
+
+Answers the prompts built by services.prompts with synthetic MCAT questions, so the
+API can be load-tested without network access or API spend. Latency is modelled as
+a fixed time to first token plus output tokens divided by the token rate; a share
+of requests can fail with an upstream error or return malformed (truncated) JSON.
+Both plain and streaming (stream=true) completions are supported.
+
+Run from the api directory:
+    python -m benchmarks.fake_openrouter --port 8001 --latency 0.5 --token-rate 200
+and point the API at it:
+    OPENROUTER_API_URL=http://127.0.0.1:8001/api/v1/chat/completions OPENROUTER_API_KEY=fake
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+SUBJECTS = [
+    ("Biology", "Cell Biology"),
+    ("Biochemistry", "Enzyme Kinetics"),
+    ("Psych/Soc", "Cognition"),
+    ("General Chemistry", "Acid-Base Chemistry"),
+    ("Organic Chemistry", "Reactions"),
+    ("Physics", "Mechanics"),
+]
+
+# Rough characters per token, used for latency and the usage field
+CHARS_PER_TOKEN = 4
+
+SINGLE_REQUEST = re.compile(
+    r"^Generate (\d+) discrete MCAT-style .* about (.+)\.$", re.MULTILINE
+)
+BATCH_REQUEST = re.compile(r'^- "([^"]+)": (\d+) questions about (.+)$', re.MULTILINE)
+
+
+def make_question(concept: str, idx: int) -> dict:
+    """One synthetic question in the shape the prompt asks for."""
+    subject, subtopic = SUBJECTS[idx % len(SUBJECTS)]
+    return {
+        "question_text": f"Question {idx + 1} about {concept}: which statement is correct? "
+        + "Consider the underlying principle carefully. " * 3,
+        "answer_choices": [
+            f"Choice {letter} for {concept}" for letter in ("one", "two", "three", "four")
+        ],
+        "correct_answer": idx % 4,
+        "explanation": f"The correct answer follows from first principles of {concept}. "
+        + "For example, a familiar everyday situation illustrates the idea. " * 4,
+        "concept_tags": [concept, subtopic],
+        "subject": subject,
+        "subject_subtopic": subtopic,
+    }
+
+
+def make_questions(num_questions: int, concept: str = "Acids and Bases") -> list[dict]:
+    return [make_question(concept, idx) for idx in range(num_questions)]
+
+
+def completion_text(prompt: str) -> str:
+    """The JSON a well-behaved model would return for this prompt."""
+    batch = BATCH_REQUEST.findall(prompt)
+    if batch:
+        return json.dumps(
+            {
+                request_id: make_questions(int(count), concept)
+                for request_id, count, concept in batch
+            }
+        )
+    match = SINGLE_REQUEST.search(prompt)
+    if match:
+        return json.dumps(make_questions(int(match.group(1)), match.group(2)))
+    return json.dumps(make_questions(1))
+
+
+def create_app(
+    latency: float,
+    token_rate: float,
+    error_rate: float,
+    malformed_rate: float,
+    error_status: int,
+) -> FastAPI:
+    app = FastAPI()
+    stats = {"requests": 0, "errors": 0, "malformed": 0}
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    @app.post("/api/v1/chat/completions")
+    async def chat_completions(request: Request):
+        stats["requests"] += 1
+        payload = await request.json()
+        prompt = payload["messages"][-1]["content"]
+        model = payload.get("model", "fake/model")
+
+        await asyncio.sleep(latency)
+        if random.random() < error_rate:
+            stats["errors"] += 1
+            headers = {"Retry-After": "1"} if error_status == 429 else {}
+            return JSONResponse(
+                {"error": {"message": "Simulated upstream error"}},
+                status_code=error_status,
+                headers=headers,
+            )
+
+        text = completion_text(prompt)
+        if random.random() < malformed_rate:
+            # Cut the output mid-object, like a response that hit max_tokens
+            stats["malformed"] += 1
+            text = text[: int(len(text) * random.uniform(0.3, 0.9))]
+        completion_tokens = max(1, len(text) // CHARS_PER_TOKEN)
+        usage = {
+            "prompt_tokens": len(prompt) // CHARS_PER_TOKEN,
+            "completion_tokens": completion_tokens,
+        }
+
+        if not payload.get("stream"):
+            await asyncio.sleep(completion_tokens / token_rate)
+            return {
+                "model": model,
+                "choices": [{"message": {"role": "assistant", "content": text}}],
+                "usage": usage,
+            }
+
+        async def events():
+            chunk_chars = 64
+            for start in range(0, len(text), chunk_chars):
+                await asyncio.sleep(chunk_chars / CHARS_PER_TOKEN / token_rate)
+                delta = {"choices": [{"delta": {"content": text[start : start + chunk_chars]}}]}
+                yield f"data: {json.dumps(delta)}\n\n"
+            if (payload.get("stream_options") or {}).get("include_usage"):
+                yield f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds to first token")
+    parser.add_argument("--token-rate", type=float, default=200, help="Output tokens per second")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=429)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    app = create_app(
+        latency=args.latency,
+        token_rate=args.token_rate,
+        error_rate=args.error_rate,
+        malformed_rate=args.malformed_rate,
+        error_status=args.error_status,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
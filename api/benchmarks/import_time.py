@@ -0,0 +1,98 @@
+"""
+Report cold-start import time for the API modules.
+
+Each module is imported in a fresh interpreter with ``python -X importtime``, so
+nothing is shared between measurements, the same as a serverless cold start. The
+reported time is the cumulative import time of the module itself, followed by the
+slowest modules it pulls in.
+
+Run from the api directory:
+    python -m benchmarks.import_time --runs 5
+    python -m benchmarks.import_time --modules main services.mcat_question_maker
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+MODULES = [
+    "main",
+    "services.mcat_question_maker",
+    "services.http_client",
+    "services.local_llm",
+    "services.persistence_queue",
+    "services.question_pool",
+    "services.supabase_connector",
+    "services.postgres_connector",
+    "models.question",
+    "models.user_query",
+    "logger_config",
+]
+
+
+def import_times(statement: str) -> dict[str, int]:
+    """Cumulative import time in microseconds per module imported by ``statement``."""
+    env = dict(os.environ, LOG_TO_FILE="false")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--top", type=int, default=5, help="Slowest dependencies to list")
+    args = parser.parse_args()
+
+    # Modules every interpreter loads at startup are not part of the cold start
+    baseline = set(import_times("pass"))
+
+    for module in args.modules:
+        runs = []
+        try:
+            for _ in range(args.runs):
+                runs.append(import_times(f"import {module}"))
+        except RuntimeError as e:
+            print(f"{module:<32} failed: {e}")
+            continue
+
+        totals = [run.get(module, 0) / 1000 for run in runs]
+        print(
+            f"{module:<32} median {statistics.median(totals):8.1f} ms, "
+            f"min {min(totals):8.1f} ms over {len(totals)} runs"
+        )
+
+        # Top-level packages only, so nested submodules are not counted twice
+        last = runs[-1]
+        heaviest = sorted(
+            (
+                (name, micros)
+                for name, micros in last.items()
+                if name != module and "." not in name and name not in baseline
+            ),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+        for name, micros in heaviest[: args.top]:
+            print(f"    {name:<28} {micros / 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
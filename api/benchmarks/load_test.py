@@ -0,0 +1,223 @@
+"""
+Load-test /api/generate-questions at several concurrency levels.
+
+For each level, ``--requests`` requests are sent with at most that many in flight,
+and latency percentiles, throughput and an error breakdown by status are reported.
+Requests use distinct concepts and ``fresh`` so the cache, coalescing and the pool
+do not hide upstream work (pass --repeat-concepts to measure those paths instead).
+
+With --spawn, a fake OpenRouter server and the API are started locally, so the run
+needs no network access or API key:
+    python -m benchmarks.load_test --spawn --concurrency 1 4 16 --requests 40
+Against an already running API:
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --concurrency 1 8
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import httpx
+
+CONCEPTS = [
+    "Acids and Bases",
+    "Enzyme Kinetics",
+    "Classical Conditioning",
+    "Fluid Dynamics",
+    "Stereochemistry",
+    "Glycolysis",
+    "Thermodynamics",
+    "Social Stratification",
+]
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    url: str,
+    concurrency: int,
+    num_requests: int,
+    num_questions: int,
+    repeat_concepts: bool,
+) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    outcomes: Counter = Counter()
+
+    async def one(i: int):
+        concept = CONCEPTS[i % len(CONCEPTS)]
+        if not repeat_concepts:
+            concept = f"{concept} {concurrency}-{i}"
+        body = {
+            "concept": concept,
+            "num_questions": num_questions,
+            "fresh": not repeat_concepts,
+        }
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.post(f"{url}/api/generate-questions", json=body)
+                outcome = str(response.status_code)
+            except httpx.HTTPError as e:
+                outcome = type(e).__name__
+            latency = time.perf_counter() - start
+        outcomes[outcome] += 1
+        if outcome == "200":
+            latencies.append(latency)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(num_requests)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "requests": num_requests,
+        "ok": outcomes.get("200", 0),
+        "rps": outcomes.get("200", 0) / elapsed,
+        "p50": percentile(latencies, 0.50) if latencies else None,
+        "p95": percentile(latencies, 0.95) if latencies else None,
+        "p99": percentile(latencies, 0.99) if latencies else None,
+        "mean": statistics.mean(latencies) if latencies else None,
+        "errors": {k: v for k, v in outcomes.items() if k != "200"},
+    }
+
+
+def format_seconds(value: float | None) -> str:
+    return f"{value * 1000:8.0f}" if value is not None else f"{'-':>8}"
+
+
+async def run(args) -> None:
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=max(args.concurrency) * 2)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        print(
+            f"{'conc':>5} {'ok':>6} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} "
+            f"{'p99 ms':>8} {'mean ms':>8}  errors"
+        )
+        for concurrency in args.concurrency:
+            result = await run_level(
+                client,
+                args.url,
+                concurrency,
+                args.requests,
+                args.num_questions,
+                args.repeat_concepts,
+            )
+            print(
+                f"{result['concurrency']:>5} {result['ok']:>3}/{result['requests']:<2} "
+                f"{result['rps']:8.2f} {format_seconds(result['p50'])} "
+                f"{format_seconds(result['p95'])} {format_seconds(result['p99'])} "
+                f"{format_seconds(result['mean'])}  {result['errors'] or ''}"
+            )
+
+
+def wait_until_up(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+def spawn_servers(args) -> list[subprocess.Popen]:
+    """Start the fake OpenRouter server and the API with benchmark-friendly settings."""
+    fake = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.fake_openrouter",
+            "--port",
+            str(args.fake_port),
+            "--latency",
+            str(args.latency),
+            "--token-rate",
+            str(args.token_rate),
+            "--error-rate",
+            str(args.error_rate),
+            "--malformed-rate",
+            str(args.malformed_rate),
+        ]
+    )
+    db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    env = dict(
+        os.environ,
+        OPENROUTER_API_URL=f"http://127.0.0.1:{args.fake_port}/api/v1/chat/completions",
+        OPENROUTER_API_KEY="fake",
+        PERSISTENCE_BACKEND="postgres",
+        DATABASE_URL=f"sqlite:///{db_path}",
+        RATE_LIMIT_ENABLED="false",
+        QUESTION_POOL_ENABLED="false",
+        LOG_TO_FILE="false",
+        LOG_CONSOLE_LEVEL="ERROR",
+    )
+    api = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:app",
+            "--port",
+            str(args.api_port),
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+    )
+    servers = [fake, api]
+    try:
+        wait_until_up(f"http://127.0.0.1:{args.fake_port}/stats")
+        wait_until_up(f"http://127.0.0.1:{args.api_port}/api/health")
+    except RuntimeError:
+        for server in servers:
+            server.terminate()
+        raise
+    return servers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default=None, help="Base URL of a running API")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=40, help="Requests per level")
+    parser.add_argument("--num-questions", type=int, default=3)
+    parser.add_argument("--repeat-concepts", action="store_true")
+    parser.add_argument("--timeout", type=float, default=180.0)
+    parser.add_argument("--spawn", action="store_true", help="Start fake upstream and API")
+    parser.add_argument("--api-port", type=int, default=8000)
+    parser.add_argument("--fake-port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--token-rate", type=float, default=200)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    servers = []
+    if args.spawn:
+        servers = spawn_servers(args)
+        args.url = args.url or f"http://127.0.0.1:{args.api_port}"
+    elif not args.url:
+        parser.error("either --url or --spawn is required")
+
+    try:
+        asyncio.run(run(args))
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
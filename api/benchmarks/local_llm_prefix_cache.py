@@ -0,0 +1,85 @@
+"""
+Measure prompt-evaluation time saved by the LocalLLM prefix cache on CPU.
+
+Each request is timed with max_tokens=1, so the measurement is dominated by prompt
+evaluation. Without the cache the model state is reset before every request and
+the whole prompt is evaluated; with the cache only the request suffix is.
+
+Run from the api directory:
+    python -m benchmarks.local_llm_prefix_cache --requests 5 --quant q4_k_m
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+CONCEPTS = [
+    "Acids and Bases",
+    "Enzyme Kinetics",
+    "Classical Conditioning",
+    "Fluid Dynamics",
+    "Stereochemistry",
+    "Glycolysis",
+    "Thermodynamics",
+    "Social Stratification",
+]
+
+
+def time_requests(local_llm, mode: str, num_requests: int) -> list[float]:
+    local_llm.prefix_cache = mode
+    llm = local_llm._load_model()
+    local_llm._attach_prefix_cache(llm)
+
+    timings = []
+    for i in range(num_requests):
+        concept = CONCEPTS[i % len(CONCEPTS)]
+        messages = local_llm._build_messages(local_llm._build_prompt(concept, 3 + i))
+        if mode == "off":
+            llm.reset()
+        start = time.perf_counter()
+        local_llm._complete(llm, messages, max_tokens=1)
+        timings.append((time.perf_counter() - start) * 1000)
+    del llm
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=5)
+    parser.add_argument("--quant", default=None, help="Override LOCAL_LLM_QUANT")
+    args = parser.parse_args()
+
+    if args.quant:
+        os.environ["LOCAL_LLM_QUANT"] = args.quant
+
+    from services.local_llm import LocalLLM
+    from services.prompts import QUESTION_INSTRUCTIONS, build_question_request
+
+    local_llm = LocalLLM()
+    probe = local_llm._load_model()
+    prefix_tokens = len(probe.tokenize(QUESTION_INSTRUCTIONS.encode()))
+    suffix_tokens = len(probe.tokenize(build_question_request(CONCEPTS[0], 5).encode()))
+    del probe
+
+    print(f"Model: {local_llm.model_path or local_llm.filename}")
+    print(f"Prefix tokens: {prefix_tokens}, suffix tokens: ~{suffix_tokens}")
+
+    results = {}
+    for mode in ("off", "ram"):
+        timings = time_requests(local_llm, mode, args.requests)
+        results[mode] = statistics.mean(timings)
+        print(
+            f"prefix cache {mode:>3}: mean {statistics.mean(timings):8.1f} ms, "
+            f"median {statistics.median(timings):8.1f} ms over {len(timings)} requests"
+        )
+
+    saved = results["off"] - results["ram"]
+    print(
+        f"Prompt evaluation saved per request: {saved:.1f} ms "
+        f"({saved / results['off'] * 100:.0f}%)"
+    )
+
+
+if __name__ == "__main__":
+    main()
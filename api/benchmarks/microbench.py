@@ -0,0 +1,82 @@
+"""
+Microbenchmarks for the CPU-bound parts of a generation request.
+
+Times MCATQuestionMaker._parse_response (clean, fenced and truncated output),
+_build_questions, and serialization of Question lists the way FastAPI does it for
+response_model=List[Question] as well as through a TypeAdapter.
+
+Run from the api directory:
+    python -m benchmarks.microbench --questions 5 10 20
+"""
+
+import argparse
+import json
+import os
+import timeit
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from benchmarks.fake_openrouter import make_questions
+
+
+def report(name: str, func, number: int):
+    timings = timeit.repeat(func, number=number, repeat=5)
+    best = min(timings) / number * 1e6
+    print(f"  {name:<36} {best:10.1f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=int, nargs="+", default=[5, 10, 20])
+    parser.add_argument("--number", type=int, default=200, help="Calls per timing")
+    args = parser.parse_args()
+
+    os.environ.setdefault("LOG_TO_FILE", "false")
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    from models.question import Question
+    from services.mcat_question_maker import MCATQuestionMaker
+
+    maker = MCATQuestionMaker(api_key="unused")
+    adapter = TypeAdapter(List[Question])
+
+    for num_questions in args.questions:
+        questions_data = make_questions(num_questions)
+        text = json.dumps(questions_data)
+        fenced = f"```json\n{text}\n```"
+        truncated = text[: int(len(text) * 0.8)]
+        questions = maker._build_questions(questions_data, num_questions)
+
+        print(f"{num_questions} questions ({len(text)} chars):")
+        report("_parse_response", lambda: maker._parse_response(text), args.number)
+        report(
+            "_parse_response (fenced)",
+            lambda: maker._parse_response(fenced),
+            args.number,
+        )
+        report(
+            "_parse_response (truncated)",
+            lambda: maker._parse_response(truncated),
+            args.number,
+        )
+        report(
+            "_build_questions",
+            lambda: maker._build_questions(questions_data, num_questions),
+            args.number,
+        )
+        report(
+            "jsonable_encoder + json.dumps",
+            lambda: json.dumps(jsonable_encoder(questions)),
+            args.number,
+        )
+        report(
+            "model_dump_json per question",
+            lambda: [q.model_dump_json() for q in questions],
+            args.number,
+        )
+        report("TypeAdapter.dump_json", lambda: adapter.dump_json(questions), args.number)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark for response serialization and compression of question lists.
+
+Compares the path FastAPI takes for response_model=List[Question] (validate the
+return value, dump it to JSON-compatible Python, json.dumps) with the encoders in
+services.serialization, serving a pre-encoded cache entry, and the cost and size
+of gzip and brotli for each payload.
+
+Run from the api directory:
+    python -m benchmarks.serialization --questions 1 5 10 20 50
+"""
+
+import argparse
+import gzip
+import json
+import os
+import timeit
+from typing import List
+
+from pydantic import TypeAdapter
+
+from benchmarks.fake_openrouter import make_questions
+from benchmarks.microbench import report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=int, nargs="+", default=[1, 5, 10, 20, 50])
+    parser.add_argument("--number", type=int, default=200, help="Calls per timing")
+    args = parser.parse_args()
+
+    os.environ.setdefault("LOG_TO_FILE", "false")
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    from models.question import Question
+    from services.mcat_question_maker import MCATQuestionMaker
+    from services.serialization import (
+        EncodedPayload,
+        brotli,
+        dumps,
+        encode_questions,
+        json_response,
+        orjson,
+    )
+
+    maker = MCATQuestionMaker(api_key="unused")
+    adapter = TypeAdapter(List[Question])
+
+    for num_questions in args.questions:
+        questions = maker._build_questions(make_questions(num_questions), num_questions)
+        body = encode_questions(questions)
+        payload = EncodedPayload.build(body, precompress=True)
+
+        print(f"{num_questions} questions ({len(body)} bytes):")
+        report(
+            "response_model path",
+            lambda: json.dumps(
+                adapter.dump_python(adapter.validate_python(questions), mode="json")
+            ).encode(),
+            args.number,
+        )
+        report("encode_questions", lambda: encode_questions(questions), args.number)
+        if orjson is not None:
+            plain = adapter.dump_python(questions, mode="json")
+            report("orjson (plain dicts)", lambda: dumps(plain), args.number)
+        report("cache hit (pre-encoded)", lambda: json_response(payload), args.number)
+
+        gzipped = gzip.compress(body, compresslevel=6)
+        report("gzip level 6", lambda: gzip.compress(body, compresslevel=6), args.number)
+        print(f"  {'gzip size':<36} {len(gzipped):10d} B")
+        if brotli is not None:
+            compressed = brotli.compress(body)
+            report("brotli", lambda: brotli.compress(body), args.number)
+            print(f"  {'brotli size':<36} {len(compressed):10d} B")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+import os
+import sys
+
+# The API modules import each other as top-level packages (services, models, ...)
+sys.path.insert(0, os.path.dirname(__file__))
+
+# Keep test runs from writing logs/app.log
+os.environ.setdefault("LOG_TO_FILE", "false")
+
+# Benchmarks are scripts, not tests (load_test.py only matches pytest's pattern)
+collect_ignore = ["benchmarks"]
@@ -0,0 +1,41 @@
+import os
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import declarative_base
+from dotenv import load_dotenv
+
+load_dotenv()
+
+Base = declarative_base()
+
+_engine: Engine | None = None
+
+
+def get_database_url() -> str:
+    """Return DATABASE_URL, defaulting to a local SQLite stand-in."""
+    return os.getenv("DATABASE_URL", "sqlite:///./mcat_questions.db")
+
+
+def get_engine() -> Engine:
+    """Return the process-wide pooled engine, creating it on first use."""
+    global _engine
+    if _engine is None:
+        url = get_database_url()
+        if url.startswith("sqlite"):
+            _engine = create_engine(url, connect_args={"check_same_thread": False})
+        else:
+            _engine = create_engine(
+                url,
+                pool_size=int(os.getenv("DATABASE_POOL_SIZE", "5")),
+                max_overflow=int(os.getenv("DATABASE_MAX_OVERFLOW", "10")),
+                pool_recycle=int(os.getenv("DATABASE_POOL_RECYCLE", "1800")),
+                pool_pre_ping=True,
+            )
+    return _engine
+
+
+def init_db(engine: Engine | None = None):
+    """Create any missing tables for the models registered on Base."""
+    import models.db_models  # noqa: F401  (registers the tables on Base)
+
+    Base.metadata.create_all(engine or get_engine())
@@ -1,40 +1,169 @@
+"""
+Logging setup shared by every module.
+
+Records are handed to a bounded in-memory queue by the calling thread and written by
+a single background listener thread, so logging never blocks the event loop on disk
+I/O. File output is JSON lines with a request id for correlation; long messages are
+truncated before they are queued so a large LLM payload costs the same as a short
+line. Environment variables:
+
+- LOG_LEVEL: minimum level for the application loggers (default INFO)
+- LOG_CONSOLE_LEVEL: minimum level echoed to stderr (default WARNING)
+- LOG_TO_FILE: write logs/app.log (default true, false on Vercel where the
+  filesystem is read-only)
+- LOG_FORMAT: "json" (default) or "text" for the file output
+- LOG_MAX_BYTES / LOG_BACKUP_COUNT: rotate the log file (0 disables rotation)
+- LOG_MAX_MESSAGE_CHARS: truncate messages longer than this (default 2000)
+- LOG_QUEUE_SIZE: records buffered before new ones are dropped (default 10000)
+"""
+
+import atexit
+import json
 import logging
+import logging.handlers
 import os
+import queue
+from contextvars import ContextVar
+from datetime import datetime, timezone
 from pathlib import Path
 
+# Correlation id of the HTTP request being served, set by the middleware in main.py
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+_queue_handler: logging.Handler | None = None
+_listener: logging.handlers.QueueListener | None = None
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _TruncatingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that stamps the request id, truncates long messages and drops
+    records instead of blocking when the queue is full.
+    """
+
+    def __init__(self, log_queue: queue.Queue, max_message_chars: int):
+        super().__init__(log_queue)
+        self.max_message_chars = max_message_chars
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Runs on the caller's thread, where the request context is still visible
+        record.request_id = request_id_var.get()
+        message = record.getMessage()
+        if len(message) > self.max_message_chars:
+            message = (
+                f"{message[: self.max_message_chars]}"
+                f"... [truncated {len(message) - self.max_message_chars} chars]"
+            )
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = message
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _build_handlers() -> list:
+    handlers = []
+
+    write_file = _env_flag("LOG_TO_FILE", "false" if os.getenv("VERCEL") else "true")
+    if write_file:
+        log_dir = Path(__file__).parent / "logs"
+        log_dir.mkdir(exist_ok=True)
+        log_file = log_dir / "app.log"
+        max_bytes = int(os.getenv("LOG_MAX_BYTES", "0"))
+        if max_bytes > 0:
+            file_handler = logging.handlers.RotatingFileHandler(
+                log_file,
+                maxBytes=max_bytes,
+                backupCount=int(os.getenv("LOG_BACKUP_COUNT", "5")),
+            )
+        else:
+            file_handler = logging.FileHandler(log_file)
+        if os.getenv("LOG_FORMAT", "json").lower() == "text":
+            file_handler.setFormatter(
+                logging.Formatter(
+                    "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s",
+                    datefmt="%Y-%m-%d %H:%M:%S",
+                )
+            )
+        else:
+            file_handler.setFormatter(JSONFormatter())
+        handlers.append(file_handler)
+
+    # Console handler - only for errors and warnings by default
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(os.getenv("LOG_CONSOLE_LEVEL", "WARNING").upper())
+    console_handler.setFormatter(logging.Formatter("%(levelname)s - %(message)s"))
+    handlers.append(console_handler)
+
+    return handlers
+
+
+def _get_queue_handler() -> logging.Handler:
+    """Create the shared queue handler and start its listener thread once."""
+    global _queue_handler, _listener
+    if _queue_handler is None:
+        log_queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+        _queue_handler = _TruncatingQueueHandler(
+            log_queue, int(os.getenv("LOG_MAX_MESSAGE_CHARS", "2000"))
+        )
+        _listener = logging.handlers.QueueListener(
+            log_queue, *_build_handlers(), respect_handler_level=True
+        )
+        _listener.start()
+        atexit.register(shutdown_logging)
+    return _queue_handler
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def dropped_records() -> int:
+    """Records discarded because the logging queue was full."""
+    return getattr(_queue_handler, "dropped", 0)
+
+
 def setup_logger(name: str = "mcat_question_generator") -> logging.Logger:
-    """Set up logger with file and console handlers."""
-    
-    # Create logs directory if it doesn't exist
-    log_dir = Path(__file__).parent / "logs"
-    log_dir.mkdir(exist_ok=True)
-    
-    # Create logger
+    """Set up a logger that writes through the shared non-blocking queue."""
     logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
-    
+    logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
     # Remove existing handlers to avoid duplicates
     logger.handlers.clear()
-    
-    # File handler - write to log file
-    log_file = log_dir / "app.log"
-    file_handler = logging.FileHandler(log_file)
-    file_handler.setLevel(logging.INFO)
-    file_formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    file_handler.setFormatter(file_formatter)
-    logger.addHandler(file_handler)
-    
-    # Console handler - only for errors and warnings
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.WARNING)
-    console_formatter = logging.Formatter(
-        '%(levelname)s - %(message)s'
-    )
-    console_handler.setFormatter(console_formatter)
-    logger.addHandler(console_handler)
-    
-    return logger
+    logger.addHandler(_get_queue_handler())
+    logger.propagate = False
 
+    return logger
@@ -1,17 +1,75 @@
+import asyncio
 import os
-from fastapi import FastAPI, HTTPException
+import json
+import math
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, List
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from models.user_query import UserQuery
-from models.question import Question
-from models.feedback import FeedbackSubmission, QuestionFeedback
-from services.mcat_question_maker import MCATQuestionMaker
-from services.supabase_connector import SupabaseConnector
-from logger_config import setup_logger
+from models.question import Question, QuestionPage
+from models.feedback import FeedbackSubmission, QuestionFeedback, QuestionRating
+from models.job import Job
+from services.question_pool import QuestionPool
+from services.persistence_queue import PersistenceQueue, get_persistence_backend
+from services.question_bank import QuestionBank
+from services.concept_index import ConceptIndex
+from services.feedback_buffer import FeedbackBuffer
+from services.job_queue import IdempotencyConflictError, JobQueue, get_job_store
+from services.admission import ClientRateLimiter, OverloadedError, client_address
+from services.deadline import (
+    ClientDisconnectedError,
+    DeadlineExceededError,
+    deadline_scope,
+    request_budget,
+    run_within_deadline,
+)
+from services.serialization import (
+    dumps,
+    encode_job,
+    encode_question,
+    encode_questions,
+    json_response,
+)
+from services.metrics import REGISTRY, REQUEST_DURATION, num_questions_bucket
+from logger_config import request_id_var, setup_logger
+
+if TYPE_CHECKING:
+    from services.mcat_question_maker import MCATQuestionMaker
 
 logger = setup_logger("FastAPI")
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create shared resources on startup and release them on shutdown."""
+    from services.http_client import start_http_client, close_http_client
+
+    await start_http_client()
+    persistence_queue.start()
+    feedback_buffer.start()
+    await job_queue.start()
+    concept_index.start()
+    question_bank.start()
+    if QuestionPool.enabled_from_env():
+        get_question_pool().start()
+    try:
+        yield
+    finally:
+        if _question_pool is not None:
+            await _question_pool.stop()
+        await job_queue.stop()
+        await concept_index.stop()
+        await question_bank.stop()
+        await persistence_queue.stop()
+        await feedback_buffer.stop()
+        await close_http_client()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 # Enable CORS for frontend
@@ -33,10 +91,111 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
+)
+
+
+@app.middleware("http")
+async def request_id_middleware(request: Request, call_next):
+    """
+    Tag every log record written while serving a request with its request id.
+
+    The request also gets its deadline here (REQUEST_DEADLINE_SECONDS, or sooner
+    if the client sends X-Request-Timeout), which generation and persistence
+    below it respect.
+    """
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    try:
+        with deadline_scope(request_budget(request.headers)):
+            response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+
+# Initialize services. The question maker (and with it httpx and the generation
+# stack) is imported and built on first use, so serverless cold starts and requests
+# that never generate do not pay for it.
+persistence_queue = PersistenceQueue(get_persistence_backend)
+feedback_buffer = FeedbackBuffer(get_persistence_backend)
+rate_limiter = ClientRateLimiter()
+question_bank = QuestionBank(
+    lambda since, limit: get_persistence_backend().fetch_questions_since(since, limit)
 )
+concept_index = ConceptIndex(
+    lambda since, limit: get_persistence_backend().fetch_questions_since(since, limit)
+)
+job_queue = JobQueue(
+    lambda query: produce_questions(query), persistence_queue.enqueue, get_job_store()
+)
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "20"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+# Proxies in front of the app that append to X-Forwarded-For (e.g. 1 on Vercel);
+# with 0 the header is ignored and the peer address identifies the client
+TRUSTED_PROXY_COUNT = int(os.getenv("TRUSTED_PROXY_COUNT", "0"))
+_question_maker: "MCATQuestionMaker | None" = None
+_question_pool: QuestionPool | None = None
+
+
+def get_question_maker() -> "MCATQuestionMaker":
+    """Return the shared question maker, building it on first use."""
+    global _question_maker
+    if _question_maker is None:
+        from services.mcat_question_maker import MCATQuestionMaker
+
+        _question_maker = MCATQuestionMaker()
+        _question_maker.resolve_concept = concept_index.canonical_concept
+    return _question_maker
+
+
+def get_question_pool() -> QuestionPool:
+    """Return the shared pre-generation pool, building it on first use."""
+    global _question_pool
+    if _question_pool is None:
+        _question_pool = QuestionPool(
+            get_question_maker(),
+            demand_source=lambda since, limit: get_persistence_backend().fetch_popular_concepts(
+                since, limit
+            ),
+        )
+    return _question_pool
+
+
+def client_id(request: Request) -> str:
+    """Identify the caller for rate limiting and idempotency key scoping."""
+    return client_address(
+        request.client.host if request.client else None,
+        request.headers.get("X-Forwarded-For"),
+        TRUSTED_PROXY_COUNT,
+    )
+
+
+def too_many_requests(detail: str, retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+def gateway_timeout(detail: str) -> HTTPException:
+    return HTTPException(status_code=504, detail=detail)
 
-# Initialize service
-question_maker = MCATQuestionMaker()
+
+# Non-standard "client closed request" status; the client never sees it
+CLIENT_CLOSED_REQUEST = 499
+
+
+def admit(request: Request, cost: float = 1.0):
+    """Reject the request with 429 if its client has used up its rate limit."""
+    retry_after = rate_limiter.check(client_id(request), cost)
+    if retry_after is not None:
+        raise too_many_requests(
+            "Too many requests. Please wait a moment before generating more questions.",
+            retry_after,
+        )
 
 
 @app.get("/")
@@ -51,31 +210,174 @@ async def health():
     return {"status": "ok", "message": "API is healthy"}
 
 
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text-format metrics."""
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Generation cache hit/miss/eviction counters and occupancy."""
+    return get_question_maker().cache.stats()
+
+
+@app.get("/api/coalescing/stats")
+async def coalescing_stats():
+    """Single-flight request coalescing counters."""
+    return get_question_maker().single_flight.stats()
+
+
+@app.get("/api/micro-batching/stats")
+async def micro_batching_stats():
+    """Cross-request micro-batching counters."""
+    return get_question_maker().micro_batcher.stats()
+
+
+@app.get("/api/providers/stats")
+async def provider_stats():
+    """Per-provider latency, error rate and circuit state."""
+    return get_question_maker().router.stats()
+
+
+@app.get("/api/admission/stats")
+async def admission_stats():
+    """Per-client rate limiting and upstream concurrency limiter counters."""
+    return {
+        "rate_limit": rate_limiter.stats(),
+        "upstream": get_question_maker().upstream_limiter.stats(),
+    }
+
+
+@app.get("/api/question-bank/stats")
+async def question_bank_stats():
+    """Stored-question index size and refresh counters."""
+    return question_bank.stats()
+
+
+@app.get("/api/concept-index/stats")
+async def concept_index_stats():
+    """Concept canonicalization index size and lookup counters."""
+    return concept_index.stats()
+
+
+@app.get("/api/feedback/ingestion/stats")
+async def feedback_ingestion_stats():
+    """Buffered feedback ingestion counters."""
+    return feedback_buffer.stats()
+
+
+@app.get("/api/jobs/stats")
+async def job_stats():
+    """Asynchronous job queue counters."""
+    return job_queue.stats()
+
+
+@app.get("/api/persistence/stats")
+async def persistence_stats():
+    """Write-behind persistence queue counters."""
+    return persistence_queue.stats()
+
+
+@app.get("/api/pool/stats")
+async def pool_stats():
+    """Pre-generation pool inventory and budget."""
+    return get_question_pool().stats()
+
+
+def canonicalize(query: UserQuery) -> UserQuery:
+    """
+    Return the query with the canonical topic of its concept, for analytics.
+
+    Uses the concept index as currently loaded and never waits for the database;
+    if the lookup fails the query simply has no canonical topic.
+    """
+    concept_index.schedule_refresh()
+    try:
+        match = concept_index.lookup(query.concept)
+    except Exception as e:
+        logger.error(f"Concept lookup failed for '{query.concept}': {str(e)}")
+        match = None
+    return query.model_copy(
+        update={"canonical_topic": match.topic_id if match is not None else None}
+    )
+
+
+async def produce_questions(
+    query: UserQuery, pooled: List[Question] | None = None, check_cache: bool = True
+) -> List[Question]:
+    """
+    Serve a query from the warm inventory first, then generate only the remainder.
+
+    Pass ``pooled`` when the pool was already consulted, and ``check_cache=False``
+    when the generation cache was already checked for this query.
+    """
+    from services.mcat_question_maker import renumber_questions
+
+    if pooled is None:
+        pooled = get_question_pool().take(query.concept, query.num_questions)
+    questions = pooled
+    remaining = query.num_questions - len(questions)
+    if questions:
+        logger.info(f"Served {len(questions)} questions from the pool")
+    if remaining > 0:
+        questions += await get_question_maker().generate_questions(
+            concept=query.concept,
+            num_questions=remaining,
+            use_cache=check_cache and not query.fresh,
+        )
+    return renumber_questions(questions)
+
+
 @app.post(
     "/api/generate-questions",
     response_model=List[Question],
     response_model_exclude={"query_id", "db_id"},
 )
-async def generate_questions(query: UserQuery):
-    """Generate MCAT questions based on user query and save to Supabase."""
-    supabase_connector = SupabaseConnector()
-
+async def generate_questions(query: UserQuery, request: Request):
+    """Generate MCAT questions based on user query and save them to the database."""
+    admit(request)
+    start = time.perf_counter()
+    query = canonicalize(query)
     try:
         logger.info(
             f"Starting question generation for: {query.concept}, {query.num_questions} questions"
         )
-        # Generate questions first
-        questions = await question_maker.generate_questions(
-            concept=query.concept, num_questions=query.num_questions
+        pooled = get_question_pool().take(query.concept, query.num_questions)
+        if not pooled and not query.fresh:
+            # Repeat requests are answered with the cached, already encoded body
+            hit = get_question_maker().get_cached_response(
+                query.concept, query.num_questions
+            )
+            if hit is not None:
+                _, payload = hit
+                # Record the query only; its questions were stored when generated
+                await persistence_queue.enqueue(query, [])
+                return json_response(payload, request)
+
+        # Cancelled, upstream call included, if the client leaves or time runs out
+        questions = await run_within_deadline(
+            produce_questions(query, pooled, check_cache=bool(pooled)),
+            request.is_disconnected,
         )
         logger.info(f"Generated {len(questions)} questions")
 
-        # Only write to database if we have questions and Supabase is configured
+        # Only write to database if we have questions; the write happens in the background
         if questions:
-            supabase_connector.save_query_and_questions(query, questions)
-            return questions
-        else:
-            return []
+            await persistence_queue.enqueue(query, questions)
+        # The questions were validated when built, so skip response_model re-validation
+        return json_response(encode_questions(questions), request)
+    except OverloadedError as e:
+        logger.warning(f"Rejected generate_questions: {str(e)}")
+        raise too_many_requests(str(e), e.retry_after)
+    except ClientDisconnectedError:
+        logger.info("Client disconnected, generation cancelled")
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    except DeadlineExceededError as e:
+        logger.warning(f"Deadline exceeded in generate_questions: {str(e)}")
+        raise gateway_timeout(str(e))
     except ValueError as e:
         logger.error(f"ValueError in generate_questions: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -85,6 +387,264 @@ async def generate_questions(query: UserQuery):
             status_code=500,
             detail="An unexpected error occurred while generating questions. Please try again or contact support if the problem persists.",
         )
+    finally:
+        REQUEST_DURATION.observe(
+            time.perf_counter() - start,
+            endpoint="generate_questions",
+            num_questions_bucket=num_questions_bucket(query.num_questions),
+        )
+
+
+@app.post("/api/generate-questions/stream")
+async def generate_questions_stream(query: UserQuery, request: Request):
+    """
+    Stream generated MCAT questions as NDJSON, one question per line.
+
+    Each line is emitted as soon as its question is complete. If generation fails
+    part-way, a final {"error": ...} line is sent. Questions are saved to the
+    database once the stream has finished.
+    """
+    admit(request)
+    query = canonicalize(query)
+    logger.info(
+        f"Starting streamed question generation for: {query.concept}, {query.num_questions} questions"
+    )
+
+    async def ndjson_lines():
+        start = time.perf_counter()
+        questions = []
+        try:
+            async for question in get_question_maker().stream_questions(
+                concept=query.concept,
+                num_questions=query.num_questions,
+                use_cache=not query.fresh,
+            ):
+                questions.append(question)
+                yield encode_question(question) + b"\n"
+        except (OverloadedError, DeadlineExceededError, ValueError) as e:
+            logger.error(f"{type(e).__name__} in generate_questions_stream: {str(e)}")
+            yield json.dumps({"error": str(e)}) + "\n"
+        except Exception as e:
+            logger.error(
+                f"Exception in generate_questions_stream: {str(e)}", exc_info=True
+            )
+            yield json.dumps(
+                {
+                    "error": "An unexpected error occurred while generating questions. Please try again or contact support if the problem persists."
+                }
+            ) + "\n"
+
+        logger.info(f"Streamed {len(questions)} questions")
+        if questions:
+            await persistence_queue.enqueue(query, questions)
+        REQUEST_DURATION.observe(
+            time.perf_counter() - start,
+            endpoint="generate_questions_stream",
+            num_questions_bucket=num_questions_bucket(query.num_questions),
+        )
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+
+@app.post("/api/generate-questions/batch")
+async def generate_questions_batch(queries: List[UserQuery], request: Request):
+    """
+    Generate questions for several concepts and stream each result as NDJSON.
+
+    Queries for the same concept (including equivalent wordings matched by the
+    concept index) are merged into one generation of the largest requested
+    count. Concepts are generated concurrently, at most BATCH_MAX_CONCURRENCY at
+    a time, and as soon as a concept finishes one line is sent for each wording
+    that asked for it, with that wording's own count: {"concept": ...,
+    "questions": [...]} or {"concept": ..., "error": ...}. Everything generated
+    is saved in one batched write at the end.
+    """
+    if not queries:
+        raise HTTPException(status_code=400, detail="At least one query is required.")
+    if len(queries) > BATCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch can contain at most {BATCH_MAX_QUERIES} concepts.",
+        )
+
+    unique: dict[str, UserQuery] = {}
+    # Every wording that was merged into a generation, with its largest count
+    requested: dict[str, dict[str, int]] = {}
+    for query in queries:
+        query = canonicalize(query)
+        key = concept_index.canonical_concept(query.concept)
+        wordings = requested.setdefault(key, {})
+        wordings[query.concept] = max(
+            wordings.get(query.concept, 0), query.num_questions
+        )
+        if key in unique:
+            existing = unique[key]
+            unique[key] = existing.model_copy(
+                update={
+                    "num_questions": max(existing.num_questions, query.num_questions),
+                    "fresh": existing.fresh or query.fresh,
+                }
+            )
+        else:
+            unique[key] = query
+    admit(request, cost=len(unique))
+    logger.info(
+        f"Starting batch generation for {len(unique)} concepts ({len(queries)} queries)"
+    )
+
+    semaphore = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+
+    async def generate_one(key: str, query: UserQuery):
+        async with semaphore:
+            try:
+                questions = await run_within_deadline(produce_questions(query))
+                return key, query, questions, None
+            except (OverloadedError, DeadlineExceededError, ValueError) as e:
+                logger.error(f"Batch generation failed for '{query.concept}': {str(e)}")
+                return key, query, [], str(e)
+            except Exception as e:
+                logger.error(
+                    f"Batch generation failed for '{query.concept}': {str(e)}",
+                    exc_info=True,
+                )
+                error = "An unexpected error occurred while generating questions."
+                return key, query, [], error
+
+    async def ndjson_lines():
+        start = time.perf_counter()
+        tasks = [
+            asyncio.create_task(generate_one(key, query))
+            for key, query in unique.items()
+        ]
+        completed = []
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                key, query, questions, error = await next_done
+                if error is not None:
+                    for concept in requested[key]:
+                        yield json.dumps({"concept": concept, "error": error}) + "\n"
+                    continue
+                completed.append((query, questions))
+                for concept, num_questions in requested[key].items():
+                    yield (
+                        b'{"concept":'
+                        + dumps(concept)
+                        + b',"questions":'
+                        + encode_questions(questions[:num_questions])
+                        + b"}\n"
+                    )
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        # One multi-row write for the whole batch instead of one per concept
+        completed = [(query, questions) for query, questions in completed if questions]
+        if completed:
+            await persistence_queue.write_batch(completed)
+        REQUEST_DURATION.observe(
+            time.perf_counter() - start,
+            endpoint="generate_questions_batch",
+            num_questions_bucket=num_questions_bucket(
+                sum(query.num_questions for query in unique.values())
+            ),
+        )
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+
+@app.post(
+    "/api/jobs",
+    status_code=202,
+    response_model=Job,
+    response_model_exclude={"questions": {"__all__": {"query_id"}}},
+)
+async def create_job(query: UserQuery, request: Request):
+    """
+    Queue a generation and return its job id immediately.
+
+    Meant for generations too long to wait for in one request. Poll
+    GET /api/jobs/{job_id} for progress. Resending a request with the same
+    Idempotency-Key header returns the existing job (200) instead of queueing
+    another.
+    """
+    idempotency_key = request.headers.get("Idempotency-Key")
+    if idempotency_key:
+        # Keys are scoped to the client, so clients cannot see each other's jobs
+        idempotency_key = f"{client_id(request)}:{idempotency_key}"
+    admit(request)
+    query = canonicalize(query)
+    try:
+        job, created = await job_queue.submit(query, idempotency_key)
+    except IdempotencyConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except OverloadedError as e:
+        logger.warning(f"Rejected create_job: {str(e)}")
+        raise too_many_requests(str(e), e.retry_after)
+    return json_response(encode_job(job), request, status_code=202 if created else 200)
+
+
+@app.get(
+    "/api/jobs/{job_id}",
+    response_model=Job,
+    response_model_exclude={"questions": {"__all__": {"query_id"}}},
+)
+async def get_job(job_id: str, request: Request):
+    """A job's status and the questions completed so far (all of them once it succeeded)."""
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired.")
+    return json_response(encode_job(job), request)
+
+
+@app.get(
+    "/api/questions",
+    response_model=QuestionPage,
+    response_model_exclude={"questions": {"__all__": {"query_id"}}},
+)
+async def get_bank_questions(
+    request: Request,
+    subject: str | None = None,
+    subtopic: str | None = None,
+    tag: List[str] | None = Query(default=None),
+    concept: str | None = None,
+    limit: int = Query(default=10, ge=1),
+    cursor: str | None = None,
+    random: bool = False,
+):
+    """
+    Serve a quiz from previously generated questions, without calling the LLM.
+
+    Filters are combined with AND (any of several tags matches). With random=true
+    a random sample of the matches is returned; otherwise results are paged with
+    the returned next_cursor.
+    """
+    if not question_bank.enabled:
+        raise HTTPException(status_code=404, detail="The question bank is disabled.")
+    start = time.perf_counter()
+    # Served from what is loaded so far; new questions appear once the refresh lands
+    question_bank.schedule_refresh()
+    if concept:
+        # Match equivalent wordings of the concept to the stored one
+        concept_index.schedule_refresh()
+        concept = concept_index.canonical_concept(concept)
+    try:
+        questions, next_cursor, total = question_bank.search(
+            subject=subject,
+            subtopic=subtopic,
+            tags=tag,
+            concept=concept,
+            limit=limit,
+            cursor=cursor,
+            sample=random,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    REQUEST_DURATION.observe(
+        time.perf_counter() - start,
+        endpoint="question_bank",
+        num_questions_bucket=num_questions_bucket(limit),
+    )
+    return json_response(question_bank.encode_page(questions, next_cursor, total), request)
 
 
 @app.post("/api/feedback", response_model=QuestionFeedback)
@@ -93,10 +653,12 @@ async def submit_feedback(feedback: FeedbackSubmission):
     try:
         # Create feedback object with timestamp
         question_feedback = QuestionFeedback(
-            question_id=feedback.question_id,
+            question_hash=feedback.question_hash,
             rating=feedback.rating,
             comment=feedback.comment,
         )
+        # Aggregated in memory and written in batches
+        await feedback_buffer.add(question_feedback)
         return question_feedback
     except Exception as e:
         raise HTTPException(
@@ -104,6 +666,16 @@ async def submit_feedback(feedback: FeedbackSubmission):
         )
 
 
+@app.get("/api/feedback/ratings", response_model=List[QuestionRating])
+async def get_feedback_ratings(question_hash: List[str] = Query(..., max_length=100)):
+    """Aggregated rating count, sum, average and recent comments per question_hash."""
+    try:
+        return await feedback_buffer.ratings(list(dict.fromkeys(question_hash)))
+    except Exception as e:
+        logger.error(f"Failed to fetch feedback ratings: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to fetch feedback ratings.")
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -0,0 +1,14 @@
+-- Aggregated feedback per question (models.db_models.QuestionFeedbackStatsDB).
+-- Apply in the Supabase SQL editor; the postgres backend creates it with
+-- DATABASE_CREATE_TABLES=true.
+--
+-- Rows are keyed by question_hash, the stable content id served with every
+-- question.
+
+CREATE TABLE IF NOT EXISTS question_feedback_stats (
+    question_hash   VARCHAR(64) PRIMARY KEY,
+    rating_count    INTEGER NOT NULL DEFAULT 0,
+    rating_sum      INTEGER NOT NULL DEFAULT 0,
+    recent_comments TEXT NOT NULL DEFAULT '[]',
+    updated_at      TIMESTAMP NOT NULL DEFAULT now()
+);
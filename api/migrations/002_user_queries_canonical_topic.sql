@@ -0,0 +1,9 @@
+-- Canonical topic id from the concept index on each query
+-- (models.db_models.UserQueryDB.canonical_topic), e.g. "general-chemistry/acid-base".
+-- Apply in the Supabase SQL editor, and to existing postgres databases:
+-- DATABASE_CREATE_TABLES only creates missing tables, it does not add columns.
+
+ALTER TABLE user_queries ADD COLUMN IF NOT EXISTS canonical_topic TEXT;
+
+CREATE INDEX IF NOT EXISTS ix_user_queries_canonical_topic
+    ON user_queries (canonical_topic);
@@ -12,6 +12,8 @@ class UserQueryDB(Base):
 
     id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
     concept = Column(String, nullable=False, index=True)
+    # Canonical topic id from the concept index, e.g. "general-chemistry/acid-base"
+    canonical_topic = Column(String, nullable=True, index=True)
     num_questions = Column(Integer, nullable=False)
     created_at = Column(DateTime, default=datetime.now, nullable=False)
     
@@ -38,3 +40,13 @@ class QuestionDB(Base):
     # Relationship to query
     query = relationship("UserQueryDB", back_populates="questions")
 
+
+class QuestionFeedbackStatsDB(Base):
+    """Aggregated feedback per question: rating count and sum plus recent comments."""
+    __tablename__ = "question_feedback_stats"
+
+    question_hash = Column(String(64), primary_key=True)  # Question.question_hash
+    rating_count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Integer, nullable=False, default=0)
+    recent_comments = Column(Text, nullable=False, default="[]")  # Stored as JSON string
+    updated_at = Column(DateTime, default=datetime.now, nullable=False)
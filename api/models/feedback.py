@@ -1,16 +1,32 @@
 from datetime import datetime
+from typing import Annotated
 from pydantic import BaseModel, Field
 
 
+# Questions are identified by their question_hash; question_id is only a position
+QuestionHash = Annotated[str, Field(min_length=1, max_length=64)]
+
+
 class QuestionFeedback(BaseModel):
-    question_id: int
+    question_hash: QuestionHash
     rating: int = Field(ge=1, le=5, description="Rating from 1 to 5 stars")
     comment: str = Field(default="", max_length=1000, description="Optional comment")
     created_at: datetime = Field(default_factory=datetime.now)
 
 
 class FeedbackSubmission(BaseModel):
-    question_id: int
+    question_hash: QuestionHash
     rating: int = Field(ge=1, le=5, description="Rating from 1 to 5 stars")
     comment: str = Field(default="", max_length=1000, description="Optional comment")
 
+
+class QuestionRating(BaseModel):
+    question_hash: str
+    rating_count: int = 0
+    rating_sum: int = 0
+    average_rating: float | None = Field(
+        default=None, description="Mean rating, or null if the question has no ratings"
+    )
+    recent_comments: list[str] = Field(
+        default_factory=list, description="Most recent non-empty comments, newest last"
+    )
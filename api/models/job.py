@@ -0,0 +1,30 @@
+from datetime import datetime
+from typing import Literal
+from pydantic import BaseModel, Field
+from models.question import Question
+from models.user_query import UserQuery
+
+
+JobState = Literal["queued", "running", "succeeded", "failed"]
+
+
+class Job(BaseModel):
+    job_id: str
+    status: JobState = "queued"
+    query: UserQuery
+    questions: list[Question] = Field(
+        default_factory=list,
+        description="Questions completed so far; the full set once the job succeeded",
+    )
+    completed: int = Field(default=0, description="Number of questions completed so far")
+    error: str | None = None
+    created_at: datetime = Field(default_factory=datetime.now)
+    updated_at: datetime = Field(default_factory=datetime.now)
+    expires_at: datetime | None = Field(
+        default=None, description="When a finished job's result is discarded"
+    )
+    idempotency_key: str | None = Field(default=None, exclude=True)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("succeeded", "failed")
@@ -1,6 +1,7 @@
+import hashlib
 from datetime import datetime
 from typing import Literal
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, computed_field
 
 
 MCATSubject = Literal[
@@ -29,3 +30,27 @@ class Question(BaseModel):
     )
     # db_id: str | None = Field(default=None, description="UUID from database")
     query_id: str | None = Field(default=None, description="UUID of the query")
+
+    @computed_field(
+        description="Stable id of the question's content; question_id is only its position in a response"
+    )
+    @property
+    def question_hash(self) -> str:
+        return content_hash(self)
+
+
+def content_hash(question: Question) -> str:
+    """Stable id of a question's content, the same wherever and however often it is stored."""
+    content = "\x1f".join(
+        [" ".join(question.question_text.split()).lower()]
+        + [" ".join(choice.split()).lower() for choice in question.answer_choices]
+    )
+    return hashlib.sha256(content.encode()).hexdigest()[:16]
+
+
+class QuestionPage(BaseModel):
+    questions: list[Question]
+    next_cursor: str | None = Field(
+        default=None, description="Pass back as cursor to fetch the next page"
+    )
+    total: int = Field(..., description="Number of stored questions matching the filters")
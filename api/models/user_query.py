@@ -1,6 +1,13 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class UserQuery(BaseModel):
     concept: str
     num_questions: int
+    fresh: bool = Field(
+        default=False, description="Skip cached results and generate new questions"
+    )
+    canonical_topic: str | None = Field(
+        default=None,
+        description="Canonical topic id of the concept; assigned by the server",
+    )
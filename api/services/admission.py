@@ -0,0 +1,252 @@
+import asyncio
+import os
+import random
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from logger_config import setup_logger
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = setup_logger("Admission")
+
+
+class OverloadedError(Exception):
+    """Raised when a request is rejected by admission control; maps to HTTP 429."""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def client_address(
+    peer: str | None, forwarded_for: str | None, trusted_proxies: int = 0
+) -> str:
+    """
+    The caller's address, as far as it can be trusted.
+
+    X-Forwarded-For is only honoured when ``trusted_proxies`` proxies sit in front
+    of the app: each appends the address it received the request from, so the
+    client is the ``trusted_proxies``-th hop from the right. Anything to the left
+    of that was sent by the client itself and is ignored.
+    """
+    if trusted_proxies > 0 and forwarded_for:
+        hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+        if len(hops) >= trusted_proxies:
+            return hops[-trusted_proxies]
+    return peer or "unknown"
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, at most ``capacity`` banked."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def try_acquire(self, cost: float = 1.0) -> float | None:
+        """Take ``cost`` tokens; return None on success or the seconds until they are available."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return None
+        return (cost - self.tokens) / self.rate
+
+
+class ClientRateLimiter:
+    """
+    Per-client token buckets for the generation endpoints.
+
+    Each client gets RATE_LIMIT_BURST requests up front, refilled at
+    RATE_LIMIT_PER_MINUTE. Buckets for the least recently seen clients are dropped
+    once RATE_LIMIT_MAX_CLIENTS are tracked; a dropped client simply starts again
+    with a full bucket.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in (
+            "1",
+            "true",
+            "yes",
+        )
+        self.rate = float(os.getenv("RATE_LIMIT_PER_MINUTE", "20")) / 60
+        self.burst = float(os.getenv("RATE_LIMIT_BURST", "5"))
+        self.max_clients = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "10000"))
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.allowed = 0
+        self.rejected = 0
+
+    def check(self, client_id: str, cost: float = 1.0) -> float | None:
+        """
+        Admit a request costing ``cost`` tokens from client_id.
+
+        Returns None if admitted, otherwise the Retry-After in seconds. Costs above
+        the burst size are capped so that large requests remain possible.
+        """
+        if not self.enabled:
+            return None
+        bucket = self._buckets.get(client_id)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst)
+            self._buckets[client_id] = bucket
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client_id)
+
+        retry_after = bucket.try_acquire(min(cost, self.burst))
+        if retry_after is None:
+            self.allowed += 1
+        else:
+            self.rejected += 1
+        return retry_after
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "requests_per_minute": self.rate * 60,
+            "burst": self.burst,
+            "tracked_clients": len(self._buckets),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+        }
+
+
+class UpstreamLimiter:
+    """
+    Global cap on concurrent upstream LLM calls with a bounded wait queue.
+
+    The effective limit adapts between UPSTREAM_MIN_IN_FLIGHT and
+    UPSTREAM_MAX_IN_FLIGHT: it is halved whenever the upstream throttles us (429)
+    and grows by one slot per ``limit`` successful calls, so concurrency settles
+    just below the rate the upstream accepts instead of repeatedly overshooting it.
+    Callers beyond the limit wait in a queue of at most UPSTREAM_MAX_QUEUE; when
+    that is full, or the wait exceeds UPSTREAM_QUEUE_TIMEOUT_SECONDS, the call
+    fails fast with OverloadedError.
+    """
+
+    def __init__(self):
+        self.max_limit = int(os.getenv("UPSTREAM_MAX_IN_FLIGHT", "8"))
+        self.min_limit = min(self.max_limit, int(os.getenv("UPSTREAM_MIN_IN_FLIGHT", "1")))
+        self.max_queue = int(os.getenv("UPSTREAM_MAX_QUEUE", "32"))
+        self.queue_timeout = float(os.getenv("UPSTREAM_QUEUE_TIMEOUT_SECONDS", "30"))
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self._waiters: "OrderedDict[asyncio.Future, None]" = OrderedDict()
+        self.rejected = 0
+        self.throttled = 0
+
+    def _has_capacity(self) -> bool:
+        return self.in_flight < max(self.min_limit, int(self.limit))
+
+    def _wake(self):
+        while self._waiters and self._has_capacity():
+            waiter, _ = self._waiters.popitem(last=False)
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    async def acquire(self):
+        if not self._waiters and self._has_capacity():
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise OverloadedError(
+                "The service is busy generating questions for other users. Please try again in a moment."
+            )
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[waiter] = None
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._waiters.pop(waiter, None)
+            if waiter.done() and not waiter.cancelled():
+                # Granted just as the wait timed out
+                return
+            waiter.cancel()
+            self.rejected += 1
+            raise OverloadedError(
+                "The service is busy generating questions for other users. Please try again in a moment."
+            )
+        except asyncio.CancelledError:
+            self._waiters.pop(waiter, None)
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                waiter.cancel()
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def record_throttled(self):
+        """Multiplicative decrease after an upstream 429."""
+        self.throttled += 1
+        self.limit = max(float(self.min_limit), self.limit / 2)
+        logger.warning(f"Upstream throttled, in-flight limit now {int(self.limit)}")
+
+    def record_success(self):
+        """Additive increase: roughly one extra slot per window of successful calls."""
+        if self.limit < self.max_limit:
+            self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            self._wake()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "limit": int(self.limit),
+            "max_limit": self.max_limit,
+            "queued": len(self._waiters),
+            "max_queue": self.max_queue,
+            "rejected": self.rejected,
+            "throttled": self.throttled,
+        }
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff_delay(
+    attempt: int, retry_after: float | None = None, base: float = 0.5, cap: float = 20.0
+) -> float:
+    """
+    Full-jitter exponential backoff for retry ``attempt`` (0-based).
+
+    If the upstream sent Retry-After, wait that long plus a little jitter so that
+    throttled callers do not all return at the same instant.
+    """
+    if retry_after is not None:
+        return retry_after + random.uniform(0, base)
+    return random.uniform(0, min(cap, base * 2**attempt))
@@ -0,0 +1,329 @@
+import asyncio
+import contextvars
+import os
+import re
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, FrozenSet, List, Set
+from logger_config import setup_logger
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = setup_logger("ConceptIndex")
+
+# (since, limit) -> rows as returned by the persistence backend's fetch_questions_since
+ConceptSource = Callable[[datetime | None, int], List[dict]]
+
+STOPWORDS = {"a", "an", "and", "the", "of", "in", "on", "for", "to", "with", "vs"}
+# Words that name a field rather than a topic; dropped unless nothing else is left
+GENERIC_WORDS = {
+    "chemistry",
+    "biology",
+    "physics",
+    "concept",
+    "concepts",
+    "topic",
+    "topics",
+    "mcat",
+    "basics",
+    "introduction",
+    "intro",
+    "overview",
+}
+
+
+def _singular(token: str) -> str:
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def concept_tokens(concept: str) -> List[str]:
+    """Normalized, singular, order-independent content words of a concept."""
+    words = re.findall(r"[a-z0-9]+", concept.lower().replace("&", " and "))
+    tokens = [_singular(word) for word in words if word not in STOPWORDS]
+    specific = [token for token in tokens if token not in GENERIC_WORDS]
+    return sorted(set(specific or tokens))
+
+
+def concept_key(concept: str) -> str:
+    """
+    Key under which spellings of the same concept are shared.
+
+    "Acids and Bases", "acid-base chemistry" and "Acids & bases" all become
+    "acid base".
+    """
+    tokens = concept_tokens(concept)
+    return " ".join(tokens) if tokens else concept.strip().lower()
+
+
+def topic_id(subject: str, subtopic: str) -> str:
+    """Canonical id of a stored subject/subtopic pair, e.g. general-chemistry/acid-base."""
+    subject_slug = "-".join(re.findall(r"[a-z0-9]+", subject.lower()))
+    return f"{subject_slug}/{concept_key(subtopic).replace(' ', '-')}"
+
+
+def _trigrams(key: str) -> FrozenSet[str]:
+    padded = f" {key} "
+    return frozenset(padded[i : i + 3] for i in range(len(padded) - 2))
+
+
+def _jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+@dataclass
+class _Alias:
+    """A stored spelling (subtopic, tag or query concept) and the topics it occurs with."""
+
+    key: str
+    tokens: FrozenSet[str]
+    trigrams: FrozenSet[str]
+    topics: Counter
+
+    @property
+    def topic(self) -> str:
+        return self.topics.most_common(1)[0][0]
+
+
+@dataclass(frozen=True)
+class ConceptMatch:
+    key: str
+    topic_id: str
+    score: float
+
+
+class ConceptIndex:
+    """
+    Maps free-text concepts to canonical topics learnt from the stored questions.
+
+    Every stored subtopic, concept tag and originating query concept becomes an
+    alias, normalized with ``concept_key`` and attached to the topic ids
+    (subject/subtopic) of the questions it occurs with. A lookup first tries the
+    exact normalized key, then scores the aliases that share a token (or, failing
+    that, a character trigram) with the query by token and trigram Jaccard
+    similarity, accepting the best one at or above CONCEPT_MATCH_THRESHOLD.
+    Results are memoized until the index changes, so repeated lookups are
+    dictionary hits. The index refreshes incrementally like the question bank:
+    only questions saved since the newest one seen are fetched, once
+    CONCEPT_INDEX_REFRESH_SECONDS have passed. Requests never wait for a refresh:
+    ``schedule_refresh`` runs it in the background and lookups use whatever has
+    been indexed so far.
+    """
+
+    def __init__(self, source: ConceptSource):
+        self.source = source
+        self.enabled = os.getenv("CONCEPT_INDEX_ENABLED", "true").lower() in (
+            "1",
+            "true",
+            "yes",
+        )
+        self.refresh_seconds = float(os.getenv("CONCEPT_INDEX_REFRESH_SECONDS", "60"))
+        self.fetch_batch = int(os.getenv("CONCEPT_INDEX_FETCH_BATCH", "500"))
+        self.threshold = float(os.getenv("CONCEPT_MATCH_THRESHOLD", "0.6"))
+        # Sharing questions needs a closer match than assigning a topic
+        self.share_threshold = float(os.getenv("CONCEPT_SHARE_THRESHOLD", "0.8"))
+        self.max_candidates = int(os.getenv("CONCEPT_MAX_CANDIDATES", "200"))
+        self.memo_size = int(os.getenv("CONCEPT_MEMO_SIZE", "10000"))
+
+        self._aliases: Dict[str, _Alias] = {}
+        self._by_token: Dict[str, Set[str]] = {}
+        self._by_trigram: Dict[str, Set[str]] = {}
+        self._memo: OrderedDict[str, ConceptMatch | None] = OrderedDict()
+        self._watermark: datetime | None = None
+        # Rows saved at the watermark, which the next fetch returns again
+        self._boundary_ids: Set[str] = set()
+        self._last_refresh = 0.0
+        self._refresh_lock: asyncio.Lock | None = None
+        self._refresh_task: asyncio.Task | None = None
+        self.refreshes = 0
+        self.lookups = 0
+        self.matches = 0
+
+    def _add_alias(self, text: str, topic: str):
+        key = concept_key(text)
+        alias = self._aliases.get(key)
+        if alias is None:
+            alias = _Alias(key, frozenset(key.split()), _trigrams(key), Counter())
+            self._aliases[key] = alias
+            for token in alias.tokens:
+                self._by_token.setdefault(token, set()).add(key)
+            for trigram in alias.trigrams:
+                self._by_trigram.setdefault(trigram, set()).add(key)
+        alias.topics[topic] += 1
+
+    def add_rows(self, rows: List[dict]) -> int:
+        """Index stored question rows not seen yet; return how many were added."""
+        added = 0
+        for row in rows:
+            row_id = str(row.get("id"))
+            inserted_at = row.get("inserted_at")
+            if inserted_at is not None and self._watermark is not None:
+                if inserted_at < self._watermark or (
+                    inserted_at == self._watermark and row_id in self._boundary_ids
+                ):
+                    continue
+            if not row.get("subject") or not row.get("subject_subtopic"):
+                continue
+            if inserted_at is not None:
+                if self._watermark is None or inserted_at > self._watermark:
+                    self._watermark = inserted_at
+                    self._boundary_ids = set()
+                self._boundary_ids.add(row_id)
+
+            topic = topic_id(row["subject"], row["subject_subtopic"])
+            self._add_alias(row["subject_subtopic"], topic)
+            for tag in row.get("concept_tags") or []:
+                self._add_alias(tag, topic)
+            if row.get("concept"):
+                self._add_alias(row["concept"], topic)
+            added += 1
+
+        if added:
+            self._memo.clear()
+        return added
+
+    async def _fetch_new(self) -> int:
+        """Page through rows saved since the watermark."""
+        added = 0
+        while True:
+            rows = await asyncio.to_thread(
+                self.source, self._watermark, self.fetch_batch
+            )
+            new = self.add_rows(rows)
+            added += new
+            if not rows or new == 0:
+                return added
+
+    async def refresh(self, force: bool = False) -> int:
+        """Index newly stored questions if the refresh interval has elapsed."""
+        if not self.enabled:
+            return 0
+        if not force and time.monotonic() - self._last_refresh < self.refresh_seconds:
+            return 0
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+        async with self._refresh_lock:
+            if not force and time.monotonic() - self._last_refresh < self.refresh_seconds:
+                return 0
+            try:
+                added = await self._fetch_new()
+            except Exception as e:
+                logger.error(f"Concept index refresh failed: {str(e)}")
+                return 0
+            finally:
+                self._last_refresh = time.monotonic()
+            self.refreshes += 1
+            if added:
+                logger.info(
+                    f"Concept index learnt from {added} questions ({len(self._aliases)} aliases)"
+                )
+            return added
+
+    def schedule_refresh(self):
+        """Start a refresh in the background if one is due and none is running."""
+        if not self.enabled:
+            return
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        if time.monotonic() - self._last_refresh < self.refresh_seconds:
+            return
+        # Not tied to the request that noticed the refresh was due
+        self._refresh_task = contextvars.Context().run(
+            asyncio.create_task, self.refresh()
+        )
+
+    def start(self):
+        """Warm the index in the background on startup."""
+        self.schedule_refresh()
+
+    async def stop(self):
+        """Cancel a background refresh that is still running."""
+        task, self._refresh_task = self._refresh_task, None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def _best_match(self, key: str) -> ConceptMatch | None:
+        alias = self._aliases.get(key)
+        if alias is not None:
+            return ConceptMatch(key, alias.topic, 1.0)
+
+        tokens = frozenset(key.split())
+        trigrams = _trigrams(key)
+        candidates: Set[str] = set()
+        for token in tokens:
+            candidates |= self._by_token.get(token, set())
+        if not candidates:
+            # No shared word; fall back to spelling similarity
+            counts = Counter()
+            for trigram in trigrams:
+                counts.update(self._by_trigram.get(trigram, ()))
+            candidates = {k for k, _ in counts.most_common(self.max_candidates)}
+
+        best: ConceptMatch | None = None
+        for candidate in candidates:
+            alias = self._aliases[candidate]
+            score = 0.5 * _jaccard(tokens, alias.tokens) + 0.5 * _jaccard(
+                trigrams, alias.trigrams
+            )
+            if score >= self.threshold and (best is None or score > best.score):
+                best = ConceptMatch(candidate, alias.topic, score)
+        return best
+
+    def lookup(self, concept: str) -> ConceptMatch | None:
+        """Closest stored concept and its topic, or None if nothing is close enough."""
+        self.lookups += 1
+        if not self.enabled:
+            return None
+        key = concept_key(concept)
+        if key in self._memo:
+            self._memo.move_to_end(key)
+            match = self._memo[key]
+        else:
+            match = self._best_match(key)
+            self._memo[key] = match
+            if len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        if match is not None:
+            self.matches += 1
+        return match
+
+    def canonical_concept(self, concept: str) -> str:
+        """
+        Key that cached and stored questions for ``concept`` are shared under.
+
+        This is the matched stored concept if it scores at least
+        CONCEPT_SHARE_THRESHOLD, otherwise the concept's own normalized key (also
+        used if the lookup fails, so generation never depends on the index).
+        """
+        try:
+            match = self.lookup(concept)
+        except Exception as e:
+            logger.error(f"Concept lookup failed for '{concept}': {str(e)}")
+            return concept_key(concept)
+        if match is not None and match.score >= self.share_threshold:
+            return match.key
+        return concept_key(concept)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "aliases": len(self._aliases),
+            "topics": len({alias.topic for alias in self._aliases.values()}),
+            "watermark": self._watermark.isoformat() if self._watermark else None,
+            "refreshes": self.refreshes,
+            "lookups": self.lookups,
+            "matches": self.matches,
+        }
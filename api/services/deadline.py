@@ -0,0 +1,192 @@
+import asyncio
+import math
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Awaitable, Callable, Iterator, Mapping, TypeVar
+from logger_config import setup_logger
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = setup_logger("Deadline")
+
+T = TypeVar("T")
+
+# Header a client can send to ask for a shorter deadline, in seconds
+DEADLINE_HEADER = "X-Request-Timeout"
+
+# time.monotonic() by which the current request must be answered, or None
+current_deadline: ContextVar[float | None] = ContextVar("current_deadline", default=None)
+
+
+class DeadlineExceededError(Exception):
+    """Raised when a request runs out of time; maps to HTTP 504."""
+
+
+class ClientDisconnectedError(Exception):
+    """Raised when the client went away before its response was ready."""
+
+
+def _env_float(name: str, default: str) -> float:
+    return float(os.getenv(name, default))
+
+
+def default_budget() -> float | None:
+    """Seconds a request may take unless it asks for less: REQUEST_DEADLINE_SECONDS (0 for none)."""
+    configured = _env_float("REQUEST_DEADLINE_SECONDS", "120")
+    return configured if configured > 0 else None
+
+
+def request_budget(headers: Mapping[str, str]) -> float | None:
+    """
+    Seconds a request may take: REQUEST_DEADLINE_SECONDS, shortened by the header.
+
+    The header can only lower the configured deadline. Returns None when neither
+    sets one (REQUEST_DEADLINE_SECONDS=0 and no valid header).
+    """
+    budget = default_budget()
+    value = headers.get(DEADLINE_HEADER)
+    if value:
+        try:
+            requested = float(value)
+        except ValueError:
+            requested = 0.0
+        if requested > 0 and math.isfinite(requested):
+            budget = requested if budget is None else min(budget, requested)
+        else:
+            logger.warning(f"Ignoring invalid {DEADLINE_HEADER} header: {value!r}")
+    return budget
+
+
+@contextmanager
+def deadline_scope(seconds: float | None) -> Iterator[None]:
+    """Run the enclosed code under a deadline ``seconds`` from now (None for no deadline)."""
+    deadline = time.monotonic() + seconds if seconds is not None else None
+    # A nested scope can only tighten the deadline it runs under
+    outer = current_deadline.get()
+    if outer is not None and (deadline is None or outer < deadline):
+        deadline = outer
+    token = current_deadline.set(deadline)
+    try:
+        yield
+    finally:
+        current_deadline.reset(token)
+
+
+def time_remaining() -> float | None:
+    """Seconds left before the current deadline, or None if there is none."""
+    deadline = current_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check_deadline(stage: str):
+    """Raise DeadlineExceededError if the current deadline has passed."""
+    left = time_remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceededError(
+            f"The request ran out of time during {stage}. Please try again with fewer questions."
+        )
+
+
+def capped_timeout(default: float) -> float:
+    """A timeout for one operation: ``default``, capped by the time remaining."""
+    check_deadline("an upstream call")
+    left = time_remaining()
+    return default if left is None else min(default, left)
+
+
+def fit_generation(num_questions: int, max_tokens: int) -> tuple[int, int]:
+    """
+    Shrink a generation to what can finish before the deadline.
+
+    The output rate is estimated from DEADLINE_FIRST_TOKEN_SECONDS,
+    DEADLINE_TOKENS_PER_SECOND and DEADLINE_TOKENS_PER_QUESTION, keeping
+    DEADLINE_RESERVE_SECONDS for parsing and the response. Returns the question
+    count and max_tokens to request; raises DeadlineExceededError if not even one
+    question fits.
+    """
+    left = time_remaining()
+    if left is None:
+        return num_questions, max_tokens
+    available = (
+        left
+        - _env_float("DEADLINE_RESERVE_SECONDS", "1")
+        - _env_float("DEADLINE_FIRST_TOKEN_SECONDS", "1")
+    )
+    tokens = int(available * _env_float("DEADLINE_TOKENS_PER_SECOND", "60"))
+    per_question = _env_float("DEADLINE_TOKENS_PER_QUESTION", "250")
+    fits = min(num_questions, int(tokens // per_question))
+    if fits < 1:
+        raise DeadlineExceededError(
+            "Not enough time left to generate questions. Please try again."
+        )
+    if fits < num_questions:
+        logger.warning(
+            f"Deadline in {left:.1f}s: generating {fits}/{num_questions} questions"
+        )
+    return fits, min(max_tokens, tokens)
+
+
+async def run_within_deadline(
+    awaitable: Awaitable[T],
+    is_disconnected: Callable[[], Awaitable[bool]] | None = None,
+) -> T:
+    """
+    Await ``awaitable``, cancelling it if the deadline passes or the client leaves.
+
+    The client is polled every DISCONNECT_POLL_SECONDS. Cancellation reaches the
+    in-flight upstream call, so its connection is closed instead of generating
+    tokens nobody will read.
+    """
+    poll = _env_float("DISCONNECT_POLL_SECONDS", "0.5")
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            left = time_remaining()
+            wait = poll if is_disconnected is not None else None
+            if left is not None:
+                wait = max(0.0, left) if wait is None else max(0.0, min(wait, left))
+            done, _ = await asyncio.wait({task}, timeout=wait)
+            if done:
+                return task.result()
+            left = time_remaining()
+            if left is not None and left <= 0:
+                raise DeadlineExceededError(
+                    "The request ran out of time. Please try again with fewer questions."
+                )
+            if is_disconnected is not None and await is_disconnected():
+                raise ClientDisconnectedError("Client disconnected")
+    finally:
+        if not task.done():
+            task.cancel()
+            try:
+                await task
+            except BaseException:
+                pass
+
+
+async def iterate_within_deadline(iterator: AsyncIterator[T]) -> AsyncIterator[T]:
+    """Yield from ``iterator``, closing it and raising once the deadline passes."""
+    it = iterator.__aiter__()
+    try:
+        while True:
+            left = time_remaining()
+            try:
+                item = await asyncio.wait_for(
+                    it.__anext__(), None if left is None else max(0.0, left)
+                )
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                raise DeadlineExceededError(
+                    "The request ran out of time while streaming questions."
+                )
+            yield item
+    finally:
+        aclose = getattr(it, "aclose", None)
+        if aclose is not None:
+            await aclose()
@@ -0,0 +1,198 @@
+import asyncio
+import os
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List
+from models.feedback import QuestionFeedback, QuestionRating
+from logger_config import setup_logger
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = setup_logger("FeedbackBuffer")
+
+
+@dataclass
+class FeedbackAggregate:
+    """Feedback for one question accumulated since the last flush."""
+
+    question_hash: str
+    count: int = 0
+    rating_sum: int = 0
+    comments: List[str] = field(default_factory=list)
+
+    def add(self, rating: int, comment: str, max_comments: int):
+        self.count += 1
+        self.rating_sum += rating
+        if comment.strip():
+            self.comments.append(comment.strip())
+            del self.comments[:-max_comments]
+
+    def merge_newer(self, newer: "FeedbackAggregate", max_comments: int):
+        """Fold in feedback received after this aggregate's, keeping comments in time order."""
+        self.count += newer.count
+        self.rating_sum += newer.rating_sum
+        self.comments = (self.comments + newer.comments)[-max_comments:]
+
+
+def merge_comments(stored: List[str], new: List[str], max_comments: int) -> List[str]:
+    """Keep the most recent comments across stored and newly flushed ones, newest last."""
+    return (stored + new)[-max_comments:]
+
+
+class FeedbackBuffer:
+    """
+    Buffered feedback ingestion aggregated per question.
+
+    Submissions only update an in-memory aggregate (count, rating sum and recent
+    comments) for their question_hash, which identifies a question's content
+    wherever it is served (question_id is only its position in a response). A
+    background worker flushes all pending aggregates as one batched upsert every
+    FEEDBACK_FLUSH_SECONDS, or sooner once FEEDBACK_FLUSH_THRESHOLD submissions are
+    pending, so a burst of star clicks costs one database round trip instead of one
+    write each. Aggregates from a failed flush are merged back and retried on the
+    next one. Without the worker (no lifespan on the serverless entry point) each
+    submission is flushed right away.
+    """
+
+    def __init__(self, backend_factory: Callable):
+        """
+        Initialize the buffer.
+
+        Args:
+            backend_factory: Callable returning a connector that implements
+                save_feedback_aggregates and fetch_feedback_stats (blocking).
+        """
+        self.backend_factory = backend_factory
+        self.flush_seconds = float(os.getenv("FEEDBACK_FLUSH_SECONDS", "5"))
+        self.flush_threshold = int(os.getenv("FEEDBACK_FLUSH_THRESHOLD", "200"))
+        self.max_comments = int(os.getenv("FEEDBACK_RECENT_COMMENTS", "5"))
+        self._pending: Dict[str, FeedbackAggregate] = {}
+        self._pending_submissions = 0
+        self._task: asyncio.Task | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._flush_lock: asyncio.Lock | None = None
+        self.submissions = 0
+        self.flushes = 0
+        self.flushed_submissions = 0
+        self.failed_flushes = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def add(self, feedback: QuestionFeedback):
+        """Record one submission in its question's pending aggregate."""
+        aggregate = self._pending.get(feedback.question_hash)
+        if aggregate is None:
+            aggregate = FeedbackAggregate(feedback.question_hash)
+            self._pending[feedback.question_hash] = aggregate
+        aggregate.add(feedback.rating, feedback.comment, self.max_comments)
+        self._pending_submissions += 1
+        self.submissions += 1
+
+        if not self.running:
+            await self.flush()
+        elif self._pending_submissions >= self.flush_threshold:
+            self._wakeup.set()
+
+    async def flush(self):
+        """Write every pending aggregate with one batched upsert."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            submissions, self._pending_submissions = self._pending_submissions, 0
+            try:
+                backend = self.backend_factory()
+                await asyncio.to_thread(
+                    backend.save_feedback_aggregates,
+                    list(batch.values()),
+                    self.max_comments,
+                )
+            except Exception as e:
+                self.failed_flushes += 1
+                logger.error(
+                    f"Failed to flush feedback for {len(batch)} questions: {str(e)}"
+                )
+                # Keep the data for the next attempt: the failed batch is older than
+                # anything submitted while it was being written
+                for question_hash, older in batch.items():
+                    newer = self._pending.get(question_hash)
+                    if newer is not None:
+                        older.merge_newer(newer, self.max_comments)
+                    self._pending[question_hash] = older
+                self._pending_submissions += submissions
+                return
+            self.flushes += 1
+            self.flushed_submissions += submissions
+            logger.info(f"Flushed feedback for {len(batch)} questions ({submissions} ratings)")
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        """Start the background flush worker on the running event loop."""
+        if not self.running:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+            logger.info("Feedback buffer started")
+
+    async def stop(self):
+        """Stop the worker and flush whatever is still pending."""
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        await self.flush()
+        logger.info("Feedback buffer stopped")
+
+    async def ratings(self, question_hashes: List[str]) -> List[QuestionRating]:
+        """Stored aggregates for question_hashes, including feedback not yet flushed."""
+        backend = self.backend_factory()
+        stored = await asyncio.to_thread(backend.fetch_feedback_stats, question_hashes)
+        by_hash = {row["question_hash"]: row for row in stored}
+
+        ratings = []
+        for question_hash in question_hashes:
+            row = by_hash.get(question_hash, {})
+            count = row.get("rating_count", 0)
+            rating_sum = row.get("rating_sum", 0)
+            comments = row.get("recent_comments", [])
+            pending = self._pending.get(question_hash)
+            if pending is not None:
+                count += pending.count
+                rating_sum += pending.rating_sum
+                comments = merge_comments(comments, pending.comments, self.max_comments)
+            ratings.append(
+                QuestionRating(
+                    question_hash=question_hash,
+                    rating_count=count,
+                    rating_sum=rating_sum,
+                    average_rating=rating_sum / count if count else None,
+                    recent_comments=comments,
+                )
+            )
+        return ratings
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "pending_questions": len(self._pending),
+            "pending_submissions": self._pending_submissions,
+            "submissions": self.submissions,
+            "flushes": self.flushes,
+            "flushed_submissions": self.flushed_submissions,
+            "failed_flushes": self.failed_flushes,
+        }
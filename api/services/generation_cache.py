@@ -0,0 +1,169 @@
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Tuple
+from models.question import Question
+from services.serialization import EncodedPayload, encode_questions
+from logger_config import setup_logger
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = setup_logger("GenerationCache")
+
+
+def normalize_concept(concept: str) -> str:
+    """Normalize a free-text concept so trivially different spellings share a key."""
+    return re.sub(r"\s+", " ", concept).strip().lower()
+
+
+@dataclass
+class _CacheEntry:
+    questions: List[Question]
+    payload: EncodedPayload
+    size_bytes: int
+    expires_at: float
+
+
+class GenerationCache:
+    """
+    Bounded in-process cache of generated question sets.
+
+    Entries are evicted least-recently-used first whenever either the entry count or
+    the total serialized size exceeds its limit, and are dropped once their TTL has
+    passed. Keys are built with ``make_key`` from the normalized concept, question
+    count, model and prompt version, so changing the prompt template or model never
+    serves stale questions. Each entry also keeps its response body pre-encoded (and
+    pre-compressed), so ``get_encoded`` hits need no serialization work at all.
+    """
+
+    def __init__(
+        self,
+        max_entries: int | None = None,
+        max_bytes: int | None = None,
+        ttl_seconds: float | None = None,
+    ):
+        self.max_entries = (
+            max_entries
+            if max_entries is not None
+            else int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "256"))
+        )
+        self.max_bytes = (
+            max_bytes
+            if max_bytes is not None
+            else int(os.getenv("GENERATION_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+        )
+        self.ttl_seconds = (
+            ttl_seconds
+            if ttl_seconds is not None
+            else float(os.getenv("GENERATION_CACHE_TTL_SECONDS", "3600"))
+        )
+        self._entries: OrderedDict[str, _CacheEntry] = OrderedDict()
+        self._size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0 and self.ttl_seconds > 0
+
+    @staticmethod
+    def make_key(
+        concept: str, num_questions: int, model: str, prompt_version: str
+    ) -> str:
+        """Build a cache key from the request and generation parameters."""
+        return f"{normalize_concept(concept)}|{num_questions}|{model}|{prompt_version}"
+
+    def _lookup(self, key: str) -> _CacheEntry | None:
+        if not self.enabled:
+            return None
+
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def get(self, key: str) -> List[Question] | None:
+        """Return a copy of the cached questions for key, or None on a miss."""
+        entry = self._lookup(key)
+        if entry is None:
+            return None
+        # Hand out copies so callers can renumber or annotate without touching the cache
+        return [question.model_copy(deep=True) for question in entry.questions]
+
+    def get_encoded(self, key: str) -> Tuple[List[Question], EncodedPayload] | None:
+        """
+        Return the cached questions and their pre-encoded response body, or None.
+
+        The questions are the cached objects themselves, not copies; callers must
+        treat them as read-only.
+        """
+        entry = self._lookup(key)
+        if entry is None:
+            return None
+        return entry.questions, entry.payload
+
+    def put(self, key: str, questions: List[Question]):
+        """Store a question set, evicting older entries to stay within limits."""
+        if not self.enabled or not questions:
+            return
+
+        questions = [question.model_copy(deep=True) for question in questions]
+        payload = EncodedPayload.build(encode_questions(questions))
+        size_bytes = payload.size_bytes
+        if size_bytes > self.max_bytes:
+            logger.info(f"Not caching {key}: {size_bytes} bytes exceeds cache limit")
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = _CacheEntry(
+            questions=questions,
+            payload=payload,
+            size_bytes=size_bytes,
+            expires_at=time.monotonic() + self.ttl_seconds,
+        )
+        self._size_bytes += size_bytes
+
+        while len(self._entries) > self.max_entries or self._size_bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._size_bytes -= entry.size_bytes
+
+    def clear(self):
+        self._entries.clear()
+        self._size_bytes = 0
+
+    def stats(self) -> dict:
+        """Return counters and current occupancy."""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "size_bytes": self._size_bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
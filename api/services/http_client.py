@@ -0,0 +1,80 @@
+import asyncio
+import os
+import httpx
+from logger_config import setup_logger
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = setup_logger("HTTPClient")
+
+_client: httpx.AsyncClient | None = None
+_client_loop: asyncio.AbstractEventLoop | None = None
+
+
+def _http2_enabled() -> bool:
+    """Return True if HTTP/2 is requested and the h2 package is available."""
+    if os.getenv("OPENROUTER_HTTP2", "false").lower() not in ("1", "true", "yes"):
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("OPENROUTER_HTTP2 is set but 'h2' is not installed, using HTTP/1.1")
+        return False
+    return True
+
+
+def _build_client() -> httpx.AsyncClient:
+    """Build a connection-pooled AsyncClient from environment configuration."""
+    limits = httpx.Limits(
+        max_connections=int(os.getenv("OPENROUTER_MAX_CONNECTIONS", "20")),
+        max_keepalive_connections=int(os.getenv("OPENROUTER_MAX_KEEPALIVE", "10")),
+        keepalive_expiry=float(os.getenv("OPENROUTER_KEEPALIVE_EXPIRY", "60")),
+    )
+    timeout = httpx.Timeout(
+        float(os.getenv("OPENROUTER_TIMEOUT", "120")),
+        connect=float(os.getenv("OPENROUTER_CONNECT_TIMEOUT", "10")),
+    )
+    http2 = _http2_enabled()
+    logger.info(
+        f"Creating shared HTTP client (http2={http2}, max_connections={limits.max_connections}, "
+        f"max_keepalive={limits.max_keepalive_connections})"
+    )
+    return httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2)
+
+
+async def start_http_client() -> httpx.AsyncClient:
+    """Create the shared client. Called from the FastAPI lifespan on startup."""
+    global _client, _client_loop
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+        _client_loop = asyncio.get_running_loop()
+    return _client
+
+
+async def close_http_client():
+    """Close the shared client. Called from the FastAPI lifespan on shutdown."""
+    global _client, _client_loop
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+        logger.info("Closed shared HTTP client")
+    _client = None
+    _client_loop = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the shared AsyncClient, creating it lazily if needed.
+
+    The serverless entry point runs Mangum with lifespan="off", so the client may
+    never have been started. It is also rebuilt if the event loop it was created on
+    is no longer the running one, since pooled connections are bound to their loop.
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        if _client is not None and not _client.is_closed:
+            logger.warning("Event loop changed, rebuilding shared HTTP client")
+        _client = _build_client()
+        _client_loop = loop
+    return _client
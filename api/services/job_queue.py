@@ -0,0 +1,388 @@
+import asyncio
+import contextvars
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Protocol
+from models.job import Job
+from models.question import Question
+from models.user_query import UserQuery
+from logger_config import setup_logger
+from services.admission import OverloadedError
+from services.deadline import deadline_scope
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = setup_logger("JobQueue")
+
+GenerateFn = Callable[[UserQuery], Awaitable[List[Question]]]
+PersistFn = Callable[[UserQuery, List[Question]], Awaitable[None]]
+
+
+class JobStore(Protocol):
+    """Backing store for job records. Implementations are blocking and thread-safe."""
+
+    def get(self, job_id: str) -> Job | None: ...
+
+    def get_by_idempotency_key(self, key: str) -> Job | None: ...
+
+    def put(self, job: Job): ...
+
+    def unfinished(self) -> List[Job]: ...
+
+    def delete_expired(self, now: datetime) -> int: ...
+
+
+class MemoryJobStore:
+    """Jobs kept in process memory; lost on restart."""
+
+    def __init__(self):
+        self._jobs: Dict[str, Job] = {}
+        self._keys: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.model_copy(deep=True) if job is not None else None
+
+    def get_by_idempotency_key(self, key: str) -> Job | None:
+        with self._lock:
+            job_id = self._keys.get(key)
+        return self.get(job_id) if job_id is not None else None
+
+    def put(self, job: Job):
+        with self._lock:
+            self._jobs[job.job_id] = job.model_copy(deep=True)
+            if job.idempotency_key:
+                self._keys[job.idempotency_key] = job.job_id
+
+    def unfinished(self) -> List[Job]:
+        with self._lock:
+            return [
+                job.model_copy(deep=True)
+                for job in self._jobs.values()
+                if not job.finished
+            ]
+
+    def delete_expired(self, now: datetime) -> int:
+        with self._lock:
+            expired = [
+                job
+                for job in self._jobs.values()
+                if job.expires_at is not None and job.expires_at <= now
+            ]
+            for job in expired:
+                del self._jobs[job.job_id]
+                if job.idempotency_key:
+                    self._keys.pop(job.idempotency_key, None)
+            return len(expired)
+
+
+class SQLiteJobStore:
+    """Jobs in a local SQLite file, so queued work and results survive a restart."""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    idempotency_key TEXT UNIQUE,
+                    status TEXT NOT NULL,
+                    expires_at TEXT,
+                    data TEXT NOT NULL
+                )
+                """
+            )
+
+    def _load(self, row) -> Job | None:
+        if row is None:
+            return None
+        job = Job.model_validate_json(row[1])
+        job.idempotency_key = row[0]
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT idempotency_key, data FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return self._load(row)
+
+    def get_by_idempotency_key(self, key: str) -> Job | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT idempotency_key, data FROM jobs WHERE idempotency_key = ?", (key,)
+            ).fetchone()
+        return self._load(row)
+
+    def put(self, job: Job):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs "
+                "(job_id, idempotency_key, status, expires_at, data) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    job.job_id,
+                    job.idempotency_key,
+                    job.status,
+                    job.expires_at.isoformat() if job.expires_at else None,
+                    job.model_dump_json(),
+                ),
+            )
+
+    def unfinished(self) -> List[Job]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT idempotency_key, data FROM jobs "
+                "WHERE status IN ('queued', 'running') ORDER BY rowid"
+            ).fetchall()
+        return [self._load(row) for row in rows]
+
+    def delete_expired(self, now: datetime) -> int:
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                (now.isoformat(),),
+            )
+            return cursor.rowcount
+
+
+def get_job_store() -> JobStore:
+    """
+    Build the job store selected by JOB_STORE.
+
+    "memory" (default) keeps jobs in the process; "sqlite" keeps them in the local
+    file JOB_STORE_PATH (default jobs.db).
+    """
+    store = os.getenv("JOB_STORE", "memory").lower()
+    if store == "sqlite":
+        return SQLiteJobStore(os.getenv("JOB_STORE_PATH", "jobs.db"))
+    if store == "memory":
+        return MemoryJobStore()
+    raise ValueError(f"Unknown JOB_STORE '{store}'")
+
+
+class IdempotencyConflictError(Exception):
+    """Raised when an idempotency key is reused for another request; maps to HTTP 409."""
+
+
+class JobQueue:
+    """
+    Asynchronous generation jobs run by an in-process worker pool.
+
+    ``submit`` records a queued job and returns at once; JOB_WORKERS worker tasks
+    take job ids from a bounded in-process queue (JOB_MAX_PENDING, beyond which
+    submissions are rejected with OverloadedError) and run the generation under
+    its own deadline of JOB_TIMEOUT_SECONDS. While a job runs, the questions of
+    each finished fan-out chunk are visible through ``get``. Finished jobs are kept
+    for JOB_RESULT_TTL_SECONDS and then purged. A submission carrying an
+    idempotency key that is already known returns the existing job instead of
+    starting another. Without a lifespan the workers are started by the first
+    submission.
+    """
+
+    def __init__(self, generate: GenerateFn, persist: PersistFn, store: JobStore):
+        """
+        Initialize the queue.
+
+        Args:
+            generate: Coroutine producing the questions for a query.
+            persist: Coroutine saving a finished job's query and questions.
+            store: Backing store for job records.
+        """
+        self.generate = generate
+        self.persist = persist
+        self.store = store
+        self.num_workers = max(1, int(os.getenv("JOB_WORKERS", "2")))
+        self.max_pending = int(os.getenv("JOB_MAX_PENDING", "100"))
+        self.timeout_seconds = float(os.getenv("JOB_TIMEOUT_SECONDS", "600"))
+        self.ttl = timedelta(seconds=float(os.getenv("JOB_RESULT_TTL_SECONDS", "3600")))
+        self._queue: asyncio.Queue[str] | None = None
+        self._submit_lock: asyncio.Lock | None = None
+        self._workers: List[asyncio.Task] = []
+        # Jobs being run, with their partial results; only transitions hit the store
+        self._running: Dict[str, Job] = {}
+        self.submitted = 0
+        self.deduplicated = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.expired = 0
+
+    @property
+    def running(self) -> bool:
+        return any(not worker.done() for worker in self._workers)
+
+    async def submit(
+        self, query: UserQuery, idempotency_key: str | None = None
+    ) -> tuple[Job, bool]:
+        """
+        Queue a generation job; return the job and whether it was newly created.
+
+        Raises:
+            IdempotencyConflictError: If the key was used for a different query
+            OverloadedError: If JOB_MAX_PENDING jobs are already waiting
+        """
+        if not self.running:
+            await self.start()
+        # Checking the key and recording the job must not interleave for one key
+        async with self._submit_lock:
+            if idempotency_key:
+                existing = await asyncio.to_thread(
+                    self.store.get_by_idempotency_key, idempotency_key
+                )
+                if existing is not None:
+                    # The topic is assigned by the server and may have been refined since
+                    if existing.query.model_dump(
+                        exclude={"canonical_topic"}
+                    ) != query.model_dump(exclude={"canonical_topic"}):
+                        raise IdempotencyConflictError(
+                            "This Idempotency-Key was already used for a different request."
+                        )
+                    self.deduplicated += 1
+                    return self._running.get(existing.job_id, existing), False
+
+            if self._queue.full():
+                raise OverloadedError(
+                    "Too many generation jobs are waiting. Please try again shortly.",
+                    retry_after=5.0,
+                )
+            job = Job(
+                job_id=uuid.uuid4().hex, query=query, idempotency_key=idempotency_key
+            )
+            await asyncio.to_thread(self.store.put, job)
+            self._queue.put_nowait(job.job_id)
+        self.submitted += 1
+        logger.info(
+            f"Queued job {job.job_id}: {query.num_questions} questions on {query.concept}"
+        )
+        return job, True
+
+    async def get(self, job_id: str) -> Job | None:
+        """The job with its progress so far, or None if unknown or expired."""
+        job = self._running.get(job_id)
+        if job is not None:
+            return job
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job is None or (
+            job.expires_at is not None and job.expires_at <= datetime.now()
+        ):
+            return None
+        return job
+
+    def _report_progress(self, job: Job, questions: List[Question]):
+        for question in questions:
+            question = question.model_copy()
+            question.question_id = len(job.questions) + 1
+            job.questions.append(question)
+        job.completed = len(job.questions)
+        job.updated_at = datetime.now()
+
+    async def _run_job(self, job_id: str):
+        from services.mcat_question_maker import generation_progress
+
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job is None or job.finished:
+            return
+        job.status = "running"
+        job.updated_at = datetime.now()
+        await asyncio.to_thread(self.store.put, job)
+        self._running[job_id] = job
+
+        token = generation_progress.set(
+            lambda questions: self._report_progress(job, questions)
+        )
+        try:
+            with deadline_scope(self.timeout_seconds):
+                questions = await self.generate(job.query)
+            job.questions = questions
+            job.completed = len(questions)
+            job.status = "succeeded"
+            self.succeeded += 1
+        except asyncio.CancelledError:
+            # Shutting down: leave the job queued to be resumed by a persistent store
+            job.status = "queued"
+            job.questions, job.completed = [], 0
+            await asyncio.to_thread(self.store.put, job)
+            raise
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            job.status = "failed"
+            job.error = str(e)
+            self.failed += 1
+        finally:
+            generation_progress.reset(token)
+            self._running.pop(job_id, None)
+
+        now = datetime.now()
+        job.updated_at = now
+        job.expires_at = now + self.ttl
+        await asyncio.to_thread(self.store.put, job)
+        if job.status == "succeeded" and job.questions:
+            await self.persist(job.query, job.questions)
+        logger.info(f"Job {job_id} {job.status} with {job.completed} questions")
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run_job(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job worker error on {job_id}: {str(e)}", exc_info=True)
+            try:
+                self.expired += await asyncio.to_thread(
+                    self.store.delete_expired, datetime.now()
+                )
+            except Exception as e:
+                logger.warning(f"Failed to purge expired jobs: {str(e)}")
+
+    async def start(self):
+        """Start the workers and re-queue unfinished jobs left in the store."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._submit_lock = asyncio.Lock()
+        # Workers must not inherit the deadline or request id of whoever started them
+        self._workers = [
+            asyncio.create_task(self._worker(), context=contextvars.Context())
+            for _ in range(self.num_workers)
+        ]
+        for job in await asyncio.to_thread(self.store.unfinished):
+            if self._queue.full():
+                break
+            self._queue.put_nowait(job.job_id)
+        logger.info(f"Job queue started with {self.num_workers} workers")
+
+    async def stop(self):
+        """Cancel the workers; jobs they were running are left queued."""
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        for worker in workers:
+            try:
+                await worker
+            except asyncio.CancelledError:
+                pass
+        if workers:
+            logger.info("Job queue stopped")
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "workers": self.num_workers,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "in_progress": len(self._running),
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "expired": self.expired,
+        }
@@ -0,0 +1,74 @@
+import json
+from typing import List
+from logger_config import setup_logger
+
+logger = setup_logger("JSONStream")
+
+
+class JSONArrayStreamParser:
+    """
+    Incrementally extract top-level objects from a JSON array as text arrives.
+
+    Text is fed in arbitrary chunks (e.g. streamed completion deltas). Every time a
+    top-level ``{...}`` object closes it is decoded and returned, so callers can act
+    on each element without waiting for the closing ``]``. Anything outside of
+    objects (markdown fences, the array brackets, commas) is ignored.
+    """
+
+    def __init__(self):
+        self._buffer: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.errors = 0
+
+    def feed(self, text: str) -> List[dict]:
+        """Consume a chunk of text and return any objects completed by it."""
+        completed = []
+        for char in text:
+            if self._depth == 0:
+                # Skip everything between top-level objects
+                if char == "{":
+                    self._depth = 1
+                    self._buffer = [char]
+                continue
+
+            self._buffer.append(char)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    obj = self._decode("".join(self._buffer))
+                    self._buffer = []
+                    if obj is not None:
+                        completed.append(obj)
+        return completed
+
+    def _decode(self, raw: str) -> dict | None:
+        """Decode one balanced object, returning None if it is not valid JSON."""
+        try:
+            obj = json.loads(raw)
+        except json.JSONDecodeError as e:
+            self.errors += 1
+            logger.warning(f"Skipping malformed object in stream: {str(e)}")
+            return None
+        if not isinstance(obj, dict):
+            return None
+        return obj
+
+    @property
+    def pending(self) -> bool:
+        """True if an object has been opened but not yet closed."""
+        return self._depth > 0
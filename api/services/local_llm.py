@@ -1,51 +1,171 @@
-from llama_cpp import Llama
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from logger_config import setup_logger
+from services.prompts import QUESTION_INSTRUCTIONS, build_question_prompt, split_prompt
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = setup_logger("LocalLLM")
 
 
 class LocalLLM:
+    """
+    Resident llama.cpp backend for offline question generation.
+
+    The GGUF model is loaded lazily on first use and memory-mapped, so worker
+    instances share the same weight pages. Inference runs on a dedicated thread
+    pool behind an async queue: at most ``workers`` completions run at once (each
+    on its own model instance, since a Llama object is not thread-safe) and at most
+    ``max_queue`` requests may wait for a free worker.
+
+    Prompts that start with the shared question instructions are sent as a fixed
+    system message plus a short user message. With the prefix cache enabled,
+    llama.cpp restores the evaluated state of that prefix and only evaluates the
+    request-specific suffix tokens.
+    """
 
     def __init__(self):
-        self.llm = Llama.from_pretrained(
-            repo_id="Qwen/Qwen2.5-0.5B-Instruct-GGUF",
-            filename="qwen2.5-0.5b-instruct-fp16.gguf",
+        self.repo_id = os.getenv("LOCAL_LLM_REPO_ID", "Qwen/Qwen2.5-0.5B-Instruct-GGUF")
+        # Pick a quantized variant with LOCAL_LLM_QUANT (e.g. q4_k_m, q8_0) or set
+        # LOCAL_LLM_FILENAME / LOCAL_LLM_MODEL_PATH explicitly
+        self.quant = os.getenv("LOCAL_LLM_QUANT", "fp16")
+        self.filename = os.getenv(
+            "LOCAL_LLM_FILENAME", f"qwen2.5-0.5b-instruct-{self.quant}.gguf"
+        )
+        self.model_path = os.getenv("LOCAL_LLM_MODEL_PATH", "")
+        self.n_ctx = int(os.getenv("LOCAL_LLM_N_CTX", "8192"))
+        self.n_threads = int(os.getenv("LOCAL_LLM_N_THREADS", "0")) or None
+        self.workers = max(1, int(os.getenv("LOCAL_LLM_WORKERS", "1")))
+        self.max_queue = int(os.getenv("LOCAL_LLM_MAX_QUEUE", "16"))
+        # "ram" (default), "disk" (persists across restarts) or "off"
+        self.prefix_cache = os.getenv("LOCAL_LLM_PREFIX_CACHE", "ram").lower()
+        self.prefix_cache_bytes = int(
+            os.getenv("LOCAL_LLM_PREFIX_CACHE_BYTES", str(512 * 1024 * 1024))
+        )
+        self.prefix_cache_dir = os.getenv("LOCAL_LLM_PREFIX_CACHE_DIR", ".cache/llama")
+
+        self._instances: list = [None] * self.workers
+        self._load_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="local-llm"
         )
+        self._idle_slots: asyncio.Queue[int] | None = None
+        self._waiting = 0
+
+    @property
+    def llm(self):
+        """The first model instance, loaded on first access."""
+        return self._get_instance(0)
+
+    def _load_model(self):
+        try:
+            from llama_cpp import Llama
+        except ImportError:
+            raise ValueError(
+                "The local LLM backend requires llama-cpp-python to be installed."
+            )
+
+        options = dict(
+            n_ctx=self.n_ctx, n_threads=self.n_threads, use_mmap=True, verbose=False
+        )
+        if self.model_path:
+            logger.info(f"Loading local model from {self.model_path}")
+            return Llama(model_path=self.model_path, **options)
+        logger.info(f"Loading local model {self.repo_id}/{self.filename}")
+        return Llama.from_pretrained(
+            repo_id=self.repo_id, filename=self.filename, **options
+        )
+
+    def _attach_prefix_cache(self, llm):
+        if self.prefix_cache == "off":
+            return
+        from llama_cpp import LlamaDiskCache, LlamaRAMCache
 
-    def _query(self, prompt: str):
-        output = self.llm.create_chat_completion(
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=4000,  # Match OpenRouter API setting
+        if self.prefix_cache == "disk":
+            llm.set_cache(LlamaDiskCache(cache_dir=self.prefix_cache_dir))
+        else:
+            llm.set_cache(LlamaRAMCache(capacity_bytes=self.prefix_cache_bytes))
+        # Evaluate the shared instructions once so the first real request already hits
+        self._complete(llm, self._build_messages(QUESTION_INSTRUCTIONS), max_tokens=1)
+        logger.info(f"Warmed {self.prefix_cache} prefix cache for question instructions")
+
+    def _get_instance(self, slot: int):
+        if self._instances[slot] is None:
+            with self._load_lock:
+                if self._instances[slot] is None:
+                    llm = self._load_model()
+                    self._attach_prefix_cache(llm)
+                    self._instances[slot] = llm
+        return self._instances[slot]
+
+    def _build_messages(self, prompt: str) -> list[dict]:
+        """Put the static instructions in a system message so they form a fixed prefix."""
+        parts = split_prompt(prompt)
+        if parts is None:
+            return [{"role": "user", "content": prompt}]
+        instructions, request = parts
+        return [
+            {"role": "system", "content": instructions},
+            {"role": "user", "content": request},
+        ]
+
+    def _complete(self, llm, messages: list[dict], max_tokens: int) -> dict:
+        return llm.create_chat_completion(
+            messages=messages,
+            max_tokens=max_tokens,  # Match OpenRouter API setting
             temperature=0.7,  # Match OpenRouter API setting
         )
+
+    def _query(self, prompt: str, max_tokens: int = 4000, slot: int = 0):
+        output = self._complete(
+            self._get_instance(slot),
+            self._build_messages(prompt),
+            max_tokens,
+        )
         # Extract the text content from the response, similar to OpenRouter API format
         return output["choices"][0]["message"]["content"]
 
     def _build_prompt(self, concept: str, num_questions: int) -> str:
         """Build the prompt for generating MCAT questions."""
-        return f"""Generate {num_questions} discrete MCAT-style multiple choice questions about {concept}.
-            Each question should be:
-            - Discrete (standalone, not passage-based)
-            - At the difficulty level appropriate for the MCAT
-            - The question stem and answer choices should be unambiguous and clear.  
-            - Have exactly 4 answer choices
-            - Include a clear explanation for the correct answer. the explanation shuold be from first principles.
-            - Tagged with relevant concept tags
-            - Categorized by MCAT subject and subtopic
-
-            IMPORTANT FORMATTING RULES:
-            - answer_choices: Array of exactly 4 strings WITHOUT letter prefixes (A), B), etc.). Just the answer text.
-            - correct_answer: Integer 0, 1, 2, or 3 representing the index of the correct answer in the answer_choices array (0 = first choice, 1 = second choice, etc.)
-
-            Return the questions as a JSON array where each question has the following structure:
-            {{
-            "question_text": "The question text here",
-            "answer_choices": ["First answer choice text", "Second answer choice text", "Third answer choice text", "Fourth answer choice text"],
-            "correct_answer": 0,
-            "explanation": "Detailed explanation of why this is correct",
-            "concept_tags": ["tag1", "tag2"],
-            "subject": "One of: Biology, Biochemistry, Psych/Soc, General Chemistry, Organic Chemistry, Physics",
-            "subject_subtopic": "Specific subtopic within the subject (e.g., 'Cell Biology', 'Enzyme Kinetics', 'Cognition', 'Acid-Base Chemistry', 'Reactions', 'Mechanics')"
-            }}
-
-            Return ONLY valid JSON, no markdown formatting or additional text."""
+        return build_question_prompt(concept, num_questions)
 
     def generate_questions(self, prompt: str):
         return self._query(prompt)
+
+    async def agenerate(self, prompt: str, max_tokens: int = 4000) -> str:
+        """Run a completion on the inference pool without blocking the event loop."""
+        if self._idle_slots is None:
+            self._idle_slots = asyncio.Queue()
+            for slot in range(self.workers):
+                self._idle_slots.put_nowait(slot)
+
+        if self._waiting >= self.max_queue:
+            raise ValueError("The local model is busy. Please try again in a moment.")
+        self._waiting += 1
+        try:
+            slot = await self._idle_slots.get()
+        finally:
+            self._waiting -= 1
+
+        loop = asyncio.get_running_loop()
+        future = self._executor.submit(self._query, prompt, max_tokens, slot)
+        # Release the slot when the thread finishes, not when the caller stops waiting,
+        # so a cancelled request never lets two completions share a model instance
+        future.add_done_callback(
+            lambda _: loop.call_soon_threadsafe(self._idle_slots.put_nowait, slot)
+        )
+        return await asyncio.wrap_future(future)
+
+
+_local_llm: LocalLLM | None = None
+
+
+def get_local_llm() -> LocalLLM:
+    """Return the process-wide LocalLLM; the model itself loads on first request."""
+    global _local_llm
+    if _local_llm is None:
+        _local_llm = LocalLLM()
+    return _local_llm
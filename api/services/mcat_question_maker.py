@@ -1,12 +1,41 @@
 import os
 import json
+import hashlib
+import math
 import re
+import asyncio
+from contextvars import ContextVar
 from datetime import datetime
-from typing import List
+from typing import AsyncIterator, Callable, List
 import httpx
 from models.question import Question
 from logger_config import setup_logger
-from services.local_llm import LocalLLM
+from services.http_client import get_http_client
+from services.json_stream import JSONArrayStreamParser
+from services.generation_cache import GenerationCache
+from services.concept_index import concept_key
+from services.serialization import EncodedPayload
+from services.prompts import build_batch_prompt, build_question_prompt
+from services.micro_batcher import BatchItem, MicroBatcher
+from services.single_flight import SingleFlight
+from services.provider_router import Provider, ProviderRouter
+from services.admission import UpstreamLimiter, backoff_delay, parse_retry_after
+from services.deadline import (
+    DeadlineExceededError,
+    capped_timeout,
+    check_deadline,
+    fit_generation,
+    iterate_within_deadline,
+    time_remaining,
+)
+from services.metrics import (
+    PARSE_FAILURES,
+    RETRIES,
+    UPSTREAM_RESPONSES,
+    current_num_questions,
+    record_usage,
+    stage_timer,
+)
 
 logger = setup_logger("MCATQuestionMaker")
 from dotenv import load_dotenv
@@ -14,6 +43,20 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+# Called with each chunk's questions as a fan-out generation progresses, for
+# callers such as the job workers that report partial results
+generation_progress: ContextVar[Callable[[List[Question]], None] | None] = ContextVar(
+    "generation_progress", default=None
+)
+
+
+def renumber_questions(questions: List[Question]) -> List[Question]:
+    """Renumber question_id sequentially from 1, in place."""
+    for idx, question in enumerate(questions, 1):
+        question.question_id = idx
+    return questions
+
+
 class MCATQuestionMaker:
     """Service class for generating MCAT questions using OpenRouter API."""
 
@@ -25,42 +68,62 @@ class MCATQuestionMaker:
             api_key: OpenRouter API key. If None, will read from OPENROUTER_API_KEY env var.
         """
         self.api_key = api_key or os.getenv("OPENROUTER_API_KEY", "")
-        self.api_url = "https://openrouter.ai/api/v1/chat/completions"
+        self.api_url = os.getenv(
+            "OPENROUTER_API_URL", "https://openrouter.ai/api/v1/chat/completions"
+        )
         self.model = os.getenv("OPENROUTER_MODEL", "openai/gpt-4o-mini")
-        self.timeout = 120.0  # Increased timeout to 2 minutes
+        # Additional models to route between, in priority order (comma-separated)
+        self.models = [
+            m.strip()
+            for m in os.getenv("OPENROUTER_MODELS", self.model).split(",")
+            if m.strip()
+        ] or [self.model]
+        # Upper bound per upstream call; shortened to the request's remaining deadline
+        self.timeout = 120.0
+        self.max_tokens = 4000
+        # "openrouter" (default) or "local" for the resident llama.cpp model
+        self.backend = os.getenv("LLM_BACKEND", "openrouter").lower()
+        # Fan-out: requests larger than chunk_size are split into concurrent calls
+        self.fan_out_enabled = os.getenv("GENERATION_FAN_OUT", "true").lower() in (
+            "1",
+            "true",
+            "yes",
+        )
+        self.chunk_size = max(1, int(os.getenv("GENERATION_CHUNK_SIZE", "3")))
+        self.max_concurrency = max(1, int(os.getenv("GENERATION_MAX_CONCURRENCY", "4")))
+        self.chunk_retries = max(0, int(os.getenv("GENERATION_CHUNK_RETRIES", "1")))
+        # Follow-up calls allowed to replace questions lost to malformed output
+        self.topup_retries = max(0, int(os.getenv("GENERATION_TOPUP_RETRIES", "1")))
+        # Backoff retries for upstream 429/5xx, skipped if Retry-After asks for longer
+        self.upstream_retries = max(0, int(os.getenv("UPSTREAM_RETRIES", "2")))
+        self.upstream_max_retry_wait = float(
+            os.getenv("UPSTREAM_MAX_RETRY_WAIT_SECONDS", "20")
+        )
+        self.upstream_limiter = UpstreamLimiter()
+        self.cache = GenerationCache()
+        # Maps a concept to the key its generations are cached and coalesced under;
+        # the API swaps in the concept index so equivalent wordings share them
+        self.resolve_concept: Callable[[str], str] = concept_key
+        self.single_flight = SingleFlight(progress=generation_progress)
+        self.micro_batcher = MicroBatcher(self._execute_micro_batch)
+        self.router = self._build_router()
+        # Hash of the prompt template so cached entries are invalidated when it changes
+        self.prompt_version = hashlib.sha256(
+            self._build_prompt("{concept}", "{num_questions}").encode()
+        ).hexdigest()[:12]
 
     def _build_prompt(self, concept: str, num_questions: int) -> str:
         """Build the prompt for generating MCAT questions."""
-        return f"""Generate {num_questions} discrete MCAT-style multiple choice questions about {concept}.
-            Each question should be:
-            - Discrete (standalone, not passage-based)
-            - At the difficulty level appropriate for the MCAT
-            - The question stem and answer choices should be unambiguous and clear.  
-            - Have exactly 4 answer choices
-            - Include a clear explanation for the correct answer. the explanation shuold be from first principles and contain a clear and relatable example.
-            - Tagged with relevant concept tags
-            - Categorized by MCAT subject and subtopic
-
-
-            IMPORTANT FORMATTING RULES:
-            - answer_choices: Array of exactly 4 strings WITHOUT letter prefixes (A), B), etc.). Just the answer text.
-            - correct_answer: Integer 0, 1, 2, or 3 representing the index of the correct answer in the answer_choices array (0 = first choice, 1 = second choice, etc.)
-
-            Return the questions as a JSON array where each question has the following structure:
-            {{
-            "question_text": "The question text here",
-            "answer_choices": ["First answer choice text", "Second answer choice text", "Third answer choice text", "Fourth answer choice text"],
-            "correct_answer": 0,
-            "explanation": "Detailed explanation of why this is correct",
-            "concept_tags": ["tag1", "tag2"],
-            "subject": "One of: Biology, Biochemistry, Psych/Soc, General Chemistry, Organic Chemistry, Physics",
-            "subject_subtopic": "Specific subtopic within the subject (e.g., 'Cell Biology', 'Enzyme Kinetics', 'Cognition', 'Acid-Base Chemistry', 'Reactions', 'Mechanics')"
-            }}
-
-            Return ONLY valid JSON, no markdown formatting or additional text."""
-
-    async def _call_openrouter(self, prompt: str) -> str:
-        """Call OpenRouter API to generate questions."""
+        return build_question_prompt(concept, num_questions)
+
+    def _build_request(
+        self,
+        prompt: str,
+        max_tokens: int | None = None,
+        stream: bool = False,
+        model: str | None = None,
+    ) -> tuple[dict, dict]:
+        """Build the headers and JSON payload for an OpenRouter chat completion."""
         if not self.api_key:
             raise ValueError("OPENROUTER_API_KEY environment variable not set")
 
@@ -71,77 +134,233 @@ class MCATQuestionMaker:
             "X-Title": "MCAT Question Generator",
         }
 
+        model = model or self.model
         payload = {
-            "model": self.model,
+            "model": model,
             "messages": [{"role": "user", "content": prompt}],
             "temperature": 0.7,
-            "max_tokens": 4000,
+            "max_tokens": max_tokens or self.max_tokens,
         }
+        if stream:
+            payload["stream"] = True
+            # Ask for a final chunk with token usage, which streams omit by default
+            payload["stream_options"] = {"include_usage": True}
 
-        logger.info(f"Using model: {self.model}")
+        logger.info(f"Using model: {model}")
         logger.debug(f"API URL: {self.api_url}")
-
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            try:
-                response = await client.post(
-                    self.api_url, headers=headers, json=payload
+        return headers, payload
+
+    def _raise_upstream_error(
+        self, status_code: int, error_detail: str, model: str | None = None
+    ):
+        """Translate an OpenRouter error status into a user-friendly ValueError."""
+        model = model or self.model
+        if status_code == 404:
+            logger.error(
+                f"OpenRouter API 404 error. Model: {model}, Response: {error_detail}"
+            )
+            # Check if it's a data policy issue
+            if "data policy" in error_detail.lower() or "privacy" in error_detail.lower():
+                raise ValueError(
+                    "The selected AI model requires privacy settings to be configured. Please check your OpenRouter account settings or try a different model."
                 )
+            raise ValueError(
+                f"The AI model '{model}' is not available. Please check your model configuration."
+            )
 
-                if response.status_code == 404:
-                    error_detail = response.text
-                    logger.error(
-                        f"OpenRouter API 404 error. Model: {self.model}, Response: {error_detail}"
-                    )
-                    # Check if it's a data policy issue
-                    if (
-                        "data policy" in error_detail.lower()
-                        or "privacy" in error_detail.lower()
-                    ):
-                        raise ValueError(
-                            "The selected AI model requires privacy settings to be configured. Please check your OpenRouter account settings or try a different model."
-                        )
-                    raise ValueError(
-                        f"The AI model '{self.model}' is not available. Please check your model configuration."
-                    )
+        logger.error(
+            f"OpenRouter API error ({status_code}). Model: {model}, Detail: {error_detail}"
+        )
 
-                response.raise_for_status()
-                return response.json()["choices"][0]["message"]["content"]
-            except httpx.HTTPStatusError as e:
-                error_detail = ""
-                try:
-                    error_detail = e.response.text
-                except:
-                    pass
-                logger.error(
-                    f"OpenRouter API error ({e.response.status_code}). Model: {self.model}, Detail: {error_detail or str(e)}"
-                )
+        # Return user-friendly error messages
+        if status_code == 401:
+            raise ValueError("Authentication failed. Please check your API key.")
+        elif status_code == 403:
+            raise ValueError("Access denied. Please check your API key permissions.")
+        elif status_code == 429:
+            raise ValueError("Rate limit exceeded. Please try again in a moment.")
+        elif status_code >= 500:
+            raise ValueError(
+                "The AI service is temporarily unavailable. Please try again later."
+            )
+        else:
+            raise ValueError(
+                "Failed to generate questions. Please try again or contact support if the problem persists."
+            )
 
-                # Return user-friendly error messages
-                if e.response.status_code == 401:
-                    raise ValueError(
-                        "Authentication failed. Please check your API key."
-                    )
-                elif e.response.status_code == 403:
-                    raise ValueError(
-                        "Access denied. Please check your API key permissions."
-                    )
-                elif e.response.status_code == 429:
-                    raise ValueError(
-                        "Rate limit exceeded. Please try again in a moment."
-                    )
-                elif e.response.status_code >= 500:
-                    raise ValueError(
-                        "The AI service is temporarily unavailable. Please try again later."
-                    )
-                else:
-                    raise ValueError(
-                        "Failed to generate questions. Please try again or contact support if the problem persists."
+    def _retry_delay(self, response: httpx.Response, attempt: int) -> float | None:
+        """Backoff before retrying a throttled or failed upstream call, or None to give up."""
+        status_code = response.status_code
+        if status_code == 429:
+            self.upstream_limiter.record_throttled()
+        if status_code != 429 and status_code < 500:
+            return None
+        if attempt >= self.upstream_retries:
+            return None
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        if retry_after is not None and retry_after > self.upstream_max_retry_wait:
+            return None
+        delay = backoff_delay(attempt, retry_after)
+        left = time_remaining()
+        if left is not None and delay >= left:
+            # The retry could not finish before the deadline anyway
+            return None
+        logger.warning(
+            f"OpenRouter returned {status_code}, retrying in {delay:.1f}s "
+            f"(attempt {attempt + 1}/{self.upstream_retries})"
+        )
+        RETRIES.inc(kind="upstream")
+        return delay
+
+    async def _call_openrouter(
+        self, prompt: str, max_tokens: int | None = None, model: str | None = None
+    ) -> str:
+        """Call OpenRouter API to generate questions."""
+        headers, payload = self._build_request(prompt, max_tokens, model=model)
+
+        model = payload["model"]
+        client = get_http_client()
+        attempt = 0
+        while True:
+            try:
+                # One slot per HTTP attempt, so hedges and failovers each take
+                # their own and none is held through the backoff below
+                async with self.upstream_limiter.slot():
+                    response = await client.post(
+                        self.api_url,
+                        headers=headers,
+                        json=payload,
+                        timeout=capped_timeout(self.timeout),
                     )
+            except httpx.HTTPError:
+                UPSTREAM_RESPONSES.inc(model=model, status="error")
+                # A timeout cut short by the deadline is not the provider's fault
+                check_deadline("the upstream call")
+                raise
+            UPSTREAM_RESPONSES.inc(model=model, status=str(response.status_code))
+            if response.status_code < 400:
+                break
+            delay = self._retry_delay(response, attempt)
+            if delay is None:
+                self._raise_upstream_error(response.status_code, response.text, model)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+        self.upstream_limiter.record_success()
+        data = response.json()
+        record_usage(model, data.get("usage"))
+        return data["choices"][0]["message"]["content"]
+
+    async def _stream_openrouter(
+        self, prompt: str, max_tokens: int | None = None, model: str | None = None
+    ) -> AsyncIterator[str]:
+        """Call OpenRouter with stream=true and yield content deltas as they arrive."""
+        headers, payload = self._build_request(
+            prompt, max_tokens, stream=True, model=model
+        )
 
-    def _parse_response(self, response_text: str) -> List[dict]:
-        """Parse the OpenRouter response and extract JSON."""
-        logger.info(f"Response text: {response_text}")
-        # Clean up markdown code blocks if present
+        model = payload["model"]
+        client = get_http_client()
+        attempt = 0
+        while True:
+            async with self.upstream_limiter.slot(), client.stream(
+                "POST",
+                self.api_url,
+                headers=headers,
+                json=payload,
+                timeout=capped_timeout(self.timeout),
+            ) as response:
+                UPSTREAM_RESPONSES.inc(model=model, status=str(response.status_code))
+                if response.status_code < 400:
+                    self.upstream_limiter.record_success()
+                    async for delta in self._iter_stream_deltas(response, model):
+                        yield delta
+                    return
+                error_detail = (await response.aread()).decode(errors="replace")
+                delay = self._retry_delay(response, attempt)
+                if delay is None:
+                    self._raise_upstream_error(response.status_code, error_detail, model)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _iter_stream_deltas(
+        self, response: httpx.Response, model: str
+    ) -> AsyncIterator[str]:
+        """Yield content deltas from an OpenRouter server-sent event stream."""
+        # Server-sent events: "data: {...}" lines, terminated by "data: [DONE]"
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            try:
+                chunk = json.loads(data)
+            except json.JSONDecodeError:
+                logger.warning(f"Skipping malformed stream event: {data[:200]}")
+                continue
+            # The final event carries the usage totals
+            record_usage(model, chunk.get("usage"))
+            choices = chunk.get("choices") or []
+            if not choices:
+                continue
+            content = (choices[0].get("delta") or {}).get("content")
+            if content:
+                yield content
+
+    def _openrouter_provider(self, model: str) -> Provider:
+        async def complete(prompt: str, max_tokens: int | None) -> str:
+            return await self._call_openrouter(prompt, max_tokens, model=model)
+
+        return Provider(name=model, complete=complete, kind="openrouter", model=model)
+
+    def _build_router(self) -> ProviderRouter:
+        """Put the configured OpenRouter models and the local model behind one router."""
+        providers = []
+        if self.backend != "local":
+            providers = [self._openrouter_provider(model) for model in self.models]
+        if self.backend == "local" or os.getenv(
+            "LOCAL_LLM_FALLBACK", "false"
+        ).lower() in ("1", "true", "yes"):
+            from services.local_llm import get_local_llm
+
+            providers.append(
+                Provider(
+                    name="local",
+                    complete=lambda prompt, max_tokens: get_local_llm().agenerate(
+                        prompt, max_tokens or self.max_tokens
+                    ),
+                    kind="local",
+                )
+            )
+        return ProviderRouter(providers)
+
+    async def _call_llm(self, prompt: str, max_tokens: int | None = None) -> str:
+        """Send a prompt to the best available backend and return the completion text."""
+        return await self.router.complete(prompt, max_tokens)
+
+    async def _stream_llm(
+        self, prompt: str, max_tokens: int | None = None
+    ) -> AsyncIterator[str]:
+        """Yield completion text from the best available backend as it is produced."""
+        async for delta in self.router.stream(
+            prompt, max_tokens, self._open_provider_stream
+        ):
+            yield delta
+
+    async def _open_provider_stream(
+        self, provider: Provider, prompt: str, max_tokens: int | None
+    ) -> AsyncIterator[str]:
+        """Stream a completion from one provider."""
+        if provider.kind == "local":
+            # The local model returns the whole completion at once
+            yield await provider.complete(prompt, max_tokens)
+            return
+        async for delta in self._stream_openrouter(prompt, max_tokens, provider.model):
+            yield delta
+
+    def _strip_code_fence(self, response_text: str) -> str:
+        """Clean up markdown code blocks if present."""
         response_text = response_text.strip()
         if response_text.startswith("```json"):
             response_text = response_text[7:]
@@ -149,7 +368,13 @@ class MCATQuestionMaker:
             response_text = response_text[3:]
         if response_text.endswith("```"):
             response_text = response_text[:-3]
-        response_text = response_text.strip()
+        return response_text.strip()
+
+    def _parse_response(self, response_text: str) -> List[dict]:
+        """Parse the OpenRouter response and extract JSON."""
+        logger.info(f"Parsing response ({len(response_text)} chars)")
+        logger.debug(f"Response text: {response_text}")
+        response_text = self._strip_code_fence(response_text)
 
         try:
             questions_data = json.loads(response_text)
@@ -157,6 +382,15 @@ class MCATQuestionMaker:
                 questions_data = [questions_data]
             return questions_data
         except json.JSONDecodeError as e:
+            # Salvage every complete object from truncated or partly malformed output
+            salvaged = JSONArrayStreamParser().feed(response_text)
+            PARSE_FAILURES.inc(salvaged="true" if salvaged else "false")
+            if salvaged:
+                logger.warning(
+                    f"JSON parsing error: {str(e)}. Salvaged {len(salvaged)} complete questions"
+                )
+                return salvaged
+
             # Log the problematic response for debugging
             logger.error(f"JSON parsing error: {str(e)}")
             logger.debug(f"Response text (first 500 chars): {response_text[:500]}")
@@ -220,59 +454,267 @@ class MCATQuestionMaker:
         )
         return 0
 
+    def _build_question(self, q_data: dict, idx: int) -> Question:
+        """Validate one raw question dict and convert it into a Question."""
+        # Clean answer choices (remove letter prefixes)
+        raw_choices = q_data.get("answer_choices", [])
+        if not raw_choices or len(raw_choices) == 0:
+            raise ValueError(f"Question {idx} has no answer_choices")
+
+        cleaned_choices = [
+            self._clean_answer_choice(str(choice)) for choice in raw_choices
+        ]
+
+        # Ensure we have exactly 4 choices
+        if len(cleaned_choices) != 4:
+            raise ValueError(
+                f"Question {idx} must have exactly 4 answer choices, got {len(cleaned_choices)}"
+            )
+
+        # Parse correct answer to integer index
+        correct_answer_idx = self._parse_correct_answer(
+            q_data.get("correct_answer", 0), cleaned_choices
+        )
+
+        return Question(
+            question_id=idx,
+            created_at=datetime.now(),
+            question_text=q_data.get("question_text", ""),
+            answer_choices=cleaned_choices,
+            correct_answer=correct_answer_idx,
+            explanation=q_data.get("explanation", ""),
+            concept_tags=q_data.get("concept_tags", []),
+            subject=q_data.get("subject", "Biology"),
+            subject_subtopic=q_data.get("subject_subtopic", "General"),
+        )
+
     def _build_questions(
         self, questions_data: List[dict], num_questions: int
     ) -> List[Question]:
-        """Convert raw question data into Question objects."""
-        import re
+        """
+        Convert raw question data into Question objects.
 
+        Invalid questions are logged and skipped rather than failing the batch, so
+        the result may hold fewer than num_questions; callers top up the rest.
+        """
         questions = []
-        for idx, q_data in enumerate(questions_data[:num_questions], 1):
+        for q_data in questions_data:
+            if len(questions) >= num_questions:
+                break
+            idx = len(questions) + 1
             try:
-                # Clean answer choices (remove letter prefixes)
-                raw_choices = q_data.get("answer_choices", [])
-                if not raw_choices or len(raw_choices) == 0:
-                    raise ValueError(f"Question {idx} has no answer_choices")
-
-                cleaned_choices = [
-                    self._clean_answer_choice(str(choice)) for choice in raw_choices
-                ]
-
-                # Ensure we have exactly 4 choices
-                if len(cleaned_choices) != 4:
-                    raise ValueError(
-                        f"Question {idx} must have exactly 4 answer choices, got {len(cleaned_choices)}"
-                    )
-
-                # Parse correct answer to integer index
-                correct_answer_idx = self._parse_correct_answer(
-                    q_data.get("correct_answer", 0), cleaned_choices
-                )
-
-                question = Question(
-                    question_id=idx,
-                    created_at=datetime.now(),
-                    question_text=q_data.get("question_text", ""),
-                    answer_choices=cleaned_choices,
-                    correct_answer=correct_answer_idx,
-                    explanation=q_data.get("explanation", ""),
-                    concept_tags=q_data.get("concept_tags", []),
-                    subject=q_data.get("subject", "Biology"),
-                    subject_subtopic=q_data.get("subject_subtopic", "General"),
-                )
-                questions.append(question)
+                questions.append(self._build_question(q_data, idx))
             except Exception as e:
-                logger.error(
-                    f"Error processing question {idx}: {str(e)}. Question data: {q_data}",
-                    exc_info=True,
-                )
-                raise ValueError(
-                    f"Failed to process question {idx}. Please try generating questions again."
+                logger.warning(
+                    f"Skipping invalid question: {str(e)}. Question data: {q_data}"
                 )
         return questions
 
-    async def generate_questions(
+    def _split_into_chunks(self, num_questions: int) -> List[int]:
+        """Split num_questions into near-equal chunk sizes no larger than chunk_size."""
+        num_chunks = math.ceil(num_questions / self.chunk_size)
+        base, extra = divmod(num_questions, num_chunks)
+        return [base + (1 if i < extra else 0) for i in range(num_chunks)]
+
+    async def _generate_once(
+        self, concept: str, num_questions: int, part: tuple[int, int] | None = None
+    ) -> List[Question]:
+        """Run a single prompt -> LLM -> parse -> build cycle."""
+        # Ask only for what can be generated before the request's deadline
+        num_questions, max_tokens = fit_generation(num_questions, self.max_tokens)
+        prompt = self._build_prompt(concept, num_questions)
+        if part:
+            prompt += (
+                f"\n\nThis request is part {part[0]} of {part[1]} for the same concept. "
+                f"Focus on a different aspect of {concept} than the other parts would."
+            )
+
+        token = current_num_questions.set(num_questions)
+        try:
+            logger.info(f"Calling {self.backend} backend...")
+            with stage_timer("llm_call"):
+                response_text = await self._call_llm(prompt, max_tokens)
+
+            logger.info(f"Received response from {self.backend} backend, parsing...")
+            try:
+                with stage_timer("parse_response"):
+                    questions_data = self._parse_response(response_text)
+            except ValueError:
+                return []
+
+            logger.info(
+                f"Parsed {len(questions_data)} questions, building Question objects..."
+            )
+            with stage_timer("build_questions"):
+                return self._build_questions(questions_data, num_questions)
+        finally:
+            current_num_questions.reset(token)
+
+    async def _top_up(
+        self,
+        concept: str,
+        questions: List[Question],
+        num_questions: int,
+        part: tuple[int, int] | None = None,
+    ) -> List[Question]:
+        """
+        Request only the missing count until num_questions is reached.
+
+        Questions salvaged from a partly malformed response are kept, and up to
+        topup_retries smaller follow-up calls replace the ones that were lost, as
+        long as the request's deadline leaves time for them.
+        """
+        for attempt in range(1, self.topup_retries + 1):
+            missing = num_questions - len(questions)
+            if missing <= 0:
+                break
+            logger.info(
+                f"Got {len(questions)}/{num_questions} valid questions, requesting {missing} more (top-up {attempt}/{self.topup_retries})"
+            )
+            RETRIES.inc(kind="topup")
+            try:
+                questions += await self._generate_once(concept, missing, part)
+            except DeadlineExceededError:
+                if not questions:
+                    raise
+                logger.warning("No time left for a top-up, returning what was generated")
+                break
+
+        if not questions:
+            raise ValueError(
+                "Failed to parse questions from API response. Please try generating questions again."
+            )
+        if len(questions) < num_questions:
+            logger.warning(
+                f"Returning {len(questions)}/{num_questions} questions after top-up budget was exhausted"
+            )
+        return renumber_questions(questions[:num_questions])
+
+    async def _generate_batch(
+        self, concept: str, num_questions: int, part: tuple[int, int] | None = None
+    ) -> List[Question]:
+        """Generate num_questions with one call, then top up any shortfall."""
+        questions = await self._generate_once(concept, num_questions, part)
+        return await self._top_up(concept, questions, num_questions, part)
+
+    async def _execute_micro_batch(
+        self, items: List[BatchItem]
+    ) -> dict[str, List[dict]]:
+        """Generate several small requests with one multi-concept prompt."""
+        prompt = build_batch_prompt(
+            [(item.request_id, item.concept, item.num_questions) for item in items]
+        )
+        total = sum(item.num_questions for item in items)
+        _, max_tokens = fit_generation(total, self.max_tokens)
+        token = current_num_questions.set(total)
+        try:
+            with stage_timer("llm_call"):
+                response_text = await self._call_llm(prompt, max_tokens)
+        finally:
+            current_num_questions.reset(token)
+        try:
+            results = json.loads(self._strip_code_fence(response_text))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Failed to parse batched response: {str(e)}")
+        if not isinstance(results, dict):
+            raise ValueError("Batched response is not a JSON object")
+        return {
+            request_id: questions
+            for request_id, questions in results.items()
+            if isinstance(questions, list)
+        }
+
+    async def _generate_micro_batched(
+        self, concept: str, num_questions: int
+    ) -> List[Question] | None:
+        """Generate through the micro-batcher, or return None to generate alone."""
+        questions_data = await self.micro_batcher.submit(concept, num_questions)
+        if questions_data is None:
+            return None
+        questions = self._build_questions(questions_data, num_questions)
+        return await self._top_up(concept, questions, num_questions)
+
+    async def _generate_chunk(
+        self,
+        concept: str,
+        num_questions: int,
+        part: tuple[int, int],
+        semaphore: asyncio.Semaphore,
+    ) -> List[Question]:
+        """Generate one fan-out chunk, retrying only this chunk on failure."""
+        attempts = self.chunk_retries + 1
+        for attempt in range(1, attempts + 1):
+            async with semaphore:
+                try:
+                    questions = await self._generate_batch(concept, num_questions, part)
+                    report_progress = generation_progress.get()
+                    if report_progress is not None:
+                        report_progress(questions)
+                    return questions
+                except DeadlineExceededError as e:
+                    # Keep whatever the other chunks finish in time
+                    logger.warning(f"Chunk {part[0]}/{part[1]} skipped: {str(e)}")
+                    return []
+                except (ValueError, httpx.HTTPError) as e:
+                    if attempt == attempts:
+                        raise
+                    logger.warning(
+                        f"Chunk {part[0]}/{part[1]} failed (attempt {attempt}/{attempts}): {str(e)}. Retrying chunk..."
+                    )
+                    RETRIES.inc(kind="chunk")
+
+    async def _generate_fan_out(
         self, concept: str, num_questions: int
+    ) -> List[Question]:
+        """Generate questions as concurrent chunked calls and merge the results."""
+        chunks = self._split_into_chunks(num_questions)
+        logger.info(f"Fanning out {num_questions} questions into chunks {chunks}")
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks = [
+            asyncio.create_task(
+                self._generate_chunk(concept, size, (i, len(chunks)), semaphore)
+            )
+            for i, size in enumerate(chunks, 1)
+        ]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        questions = [question for chunk in results for question in chunk]
+        if not questions:
+            raise DeadlineExceededError(
+                "The request ran out of time before any questions were generated."
+            )
+        # Merge and renumber so question_id stays sequential across chunks
+        return renumber_questions(questions)
+
+    def _cache_key(self, concept: str, num_questions: int) -> str:
+        return GenerationCache.make_key(
+            self.resolve_concept(concept), num_questions, self.model, self.prompt_version
+        )
+
+    def get_cached_response(
+        self, concept: str, num_questions: int
+    ) -> tuple[List[Question], EncodedPayload] | None:
+        """
+        Return a cached question set with its pre-encoded response body, or None.
+
+        The questions are shared with the cache and must not be modified.
+        """
+        hit = self.cache.get_encoded(self._cache_key(concept, num_questions))
+        if hit is not None:
+            logger.info(f"Cache hit for {num_questions} questions on concept: {concept}")
+        return hit
+
+    async def generate_questions(
+        self,
+        concept: str,
+        num_questions: int,
+        use_cache: bool = True,
+        store: bool = True,
     ) -> List[Question]:
         """
         Generate MCAT questions for a given concept.
@@ -280,6 +722,9 @@ class MCATQuestionMaker:
         Args:
             concept: The MCAT concept/topic (e.g., "Acids and Bases")
             num_questions: Number of questions to generate (1-20)
+            use_cache: If False, skip the cache lookup and always generate fresh questions
+            store: If False, bypass the cache and shared generations entirely, so the
+                questions are never served to anyone else (used for pool refills)
 
         Returns:
             List of Question objects
@@ -288,20 +733,125 @@ class MCATQuestionMaker:
             ValueError: If API key is missing or response parsing fails
             httpx.HTTPError: If API request fails
         """
-        logger.info(f"Generating {num_questions} questions for concept: {concept}")
-        prompt = self._build_prompt(concept, num_questions)
-
-        logger.info("Calling OpenRouter API...")
-        response_text = await self._call_openrouter(prompt)
-        # response_text = LocalLLM().generate_questions(prompt)
+        if not store:
+            return await self._generate(concept, num_questions)
+
+        cache_key = self._cache_key(concept, num_questions)
+        if use_cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.info(
+                    f"Cache hit for {num_questions} questions on concept: {concept}"
+                )
+                return cached
+
+        # Concurrent identical requests share one upstream generation, which is
+        # cached once as a whole rather than per waiter
+        return await self.single_flight.run(
+            cache_key,
+            num_questions,
+            lambda count: self._generate(concept, count),
+            store=lambda count, questions: self._store(concept, count, questions),
+        )
 
-        logger.info("Received response from OpenRouter, parsing...")
-        questions_data = self._parse_response(response_text)
+    def _store(self, concept: str, num_questions: int, questions: List[Question]):
+        """Cache a generated set, unless it came back short of num_questions."""
+        # A short set (top-up budget exhausted) must not be served for the full count
+        if len(questions) == num_questions:
+            self.cache.put(self._cache_key(concept, num_questions), questions)
 
-        logger.info(
-            f"Parsed {len(questions_data)} questions, building Question objects..."
-        )
-        questions = self._build_questions(questions_data, num_questions)
+    async def _generate(self, concept: str, num_questions: int) -> List[Question]:
+        """Generate questions upstream, fanning out large requests."""
+        logger.info(f"Generating {num_questions} questions for concept: {concept}")
+        questions = None
+        if self.micro_batcher.accepts(num_questions):
+            # Small requests share one upstream call with other concepts when possible
+            questions = await self._generate_micro_batched(concept, num_questions)
+        if questions is None:
+            if self.fan_out_enabled and num_questions > self.chunk_size:
+                questions = await self._generate_fan_out(concept, num_questions)
+            else:
+                questions = await self._generate_batch(concept, num_questions)
 
         logger.info(f"Successfully generated {len(questions)} questions")
         return questions
+
+    async def stream_questions(
+        self, concept: str, num_questions: int, use_cache: bool = True
+    ) -> AsyncIterator[Question]:
+        """
+        Generate MCAT questions and yield each one as soon as it is complete.
+
+        The completion is streamed from OpenRouter and the JSON array is parsed
+        incrementally, so the first question arrives after roughly one question's
+        worth of generation time instead of the whole batch.
+        Under a request deadline fewer questions may be requested, and the stream
+        is closed once the deadline passes.
+
+        Args:
+            concept: The MCAT concept/topic (e.g., "Acids and Bases")
+            num_questions: Number of questions to generate (1-20)
+            use_cache: If False, skip the cache lookup and always generate fresh questions
+
+        Yields:
+            Question objects in generation order
+
+        Raises:
+            ValueError: If the API call fails or a question cannot be validated
+        """
+        cache_key = self._cache_key(concept, num_questions)
+        if use_cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.info(
+                    f"Cache hit for {num_questions} streamed questions on concept: {concept}"
+                )
+                for question in cached:
+                    yield question
+                return
+
+        logger.info(f"Streaming {num_questions} questions for concept: {concept}")
+        target, max_tokens = fit_generation(num_questions, self.max_tokens)
+        prompt = self._build_prompt(concept, target)
+        parser = JSONArrayStreamParser()
+
+        questions = []
+        async for delta in iterate_within_deadline(self._stream_llm(prompt, max_tokens)):
+            for q_data in parser.feed(delta):
+                try:
+                    question = self._build_question(q_data, len(questions) + 1)
+                except Exception as e:
+                    logger.warning(
+                        f"Skipping invalid question: {str(e)}. Question data: {q_data}"
+                    )
+                    continue
+                questions.append(question)
+                yield question
+                if len(questions) >= target:
+                    break
+            if len(questions) >= target:
+                break
+
+        # Top up questions lost to malformed or truncated output with a smaller call
+        missing = target - len(questions)
+        if missing > 0 and self.topup_retries > 0:
+            logger.info(
+                f"Streamed {len(questions)}/{target} valid questions, requesting {missing} more"
+            )
+            try:
+                extra = await self._generate_batch(concept, missing)
+            except (ValueError, DeadlineExceededError) as e:
+                if not questions:
+                    raise
+                logger.warning(f"Top-up after stream failed: {str(e)}")
+                extra = []
+            for question in extra:
+                question.question_id = len(questions) + 1
+                questions.append(question)
+                yield question
+
+        if not questions:
+            raise ValueError("Failed to parse questions from API response")
+        if len(questions) == num_questions:
+            self.cache.put(cache_key, questions)
+        logger.info(f"Successfully streamed {len(questions)} questions")
@@ -0,0 +1,224 @@
+"""
+Minimal Prometheus-style metrics: labelled counters and histograms rendered in the
+text exposition format served by /api/metrics.
+"""
+
+import bisect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Tuple
+
+# Seconds; spans fast cache/bank hits up to multi-minute LLM generations
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    20.0,
+    30.0,
+    60.0,
+    120.0,
+)
+
+# Question count of the generation currently in progress, used to label upstream metrics
+current_num_questions: ContextVar[int | None] = ContextVar(
+    "current_num_questions", default=None
+)
+
+
+def num_questions_bucket(num_questions: int | None) -> str:
+    """Coarse bucket label for a question count."""
+    if num_questions is None:
+        return "unknown"
+    if num_questions <= 1:
+        return "1"
+    if num_questions <= 3:
+        return "2-3"
+    if num_questions <= 5:
+        return "4-5"
+    if num_questions <= 10:
+        return "6-10"
+    return "11+"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(
+    labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = ""
+) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> (per-bucket counts, sum, count)
+        self._values: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        state = self._values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            state[0][index] += 1
+        state[1] += value
+        state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall-clock duration of the with-block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = _format_labels(self.labelnames, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {count}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames=(), **kwargs) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+REQUEST_DURATION = REGISTRY.histogram(
+    "mcat_request_duration_seconds",
+    "Total time to serve a generation request.",
+    ("endpoint", "num_questions_bucket"),
+)
+STAGE_DURATION = REGISTRY.histogram(
+    "mcat_stage_duration_seconds",
+    "Time spent in each generation stage (llm_call, parse_response, build_questions, persistence).",
+    ("stage", "num_questions_bucket"),
+)
+UPSTREAM_RESPONSES = REGISTRY.counter(
+    "mcat_upstream_responses_total",
+    "Upstream LLM responses by model and HTTP status.",
+    ("model", "status"),
+)
+PARSE_FAILURES = REGISTRY.counter(
+    "mcat_parse_failures_total",
+    "LLM responses that were not valid JSON, by whether any questions were salvaged.",
+    ("salvaged",),
+)
+RETRIES = REGISTRY.counter(
+    "mcat_retries_total",
+    "Generation retries by kind (chunk, topup, upstream).",
+    ("kind",),
+)
+TOKENS = REGISTRY.counter(
+    "mcat_llm_tokens_total",
+    "Tokens reported in the upstream usage field.",
+    ("model", "type", "num_questions_bucket"),
+)
+
+
+def record_usage(model: str, usage: dict | None):
+    """Count prompt/completion tokens from an OpenRouter usage object."""
+    if not usage:
+        return
+    bucket = num_questions_bucket(current_num_questions.get())
+    for token_type in ("prompt_tokens", "completion_tokens"):
+        count = usage.get(token_type)
+        if count:
+            TOKENS.inc(
+                count,
+                model=model,
+                type=token_type.split("_")[0],
+                num_questions_bucket=bucket,
+            )
+
+
+def stage_timer(stage: str):
+    """Time a generation stage, labelled with the current question count bucket."""
+    bucket = num_questions_bucket(current_num_questions.get())
+    return STAGE_DURATION.time(stage=stage, num_questions_bucket=bucket)
@@ -0,0 +1,132 @@
+import asyncio
+import contextvars
+import itertools
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Set
+from logger_config import setup_logger
+from services.deadline import current_deadline, deadline_scope
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = setup_logger("MicroBatcher")
+
+
+@dataclass
+class BatchItem:
+    request_id: str
+    concept: str
+    num_questions: int
+    future: asyncio.Future = field(repr=False)
+    deadline: float | None = None
+
+
+ExecuteBatchFn = Callable[[List[BatchItem]], Awaitable[Dict[str, List[dict]]]]
+
+
+class MicroBatcher:
+    """
+    Pack small generation requests from different callers into one LLM call.
+
+    Requests for at most ``max_questions`` questions are held for up to
+    ``window_seconds``; the pending set is then sent as a single multi-concept
+    prompt and the raw question dicts are handed back to each caller by request
+    id. A batch is flushed early once it reaches ``max_batch_size`` requests or
+    ``max_total_questions`` questions. ``submit`` returns None when a request ends
+    up alone or the batch call fails, and the caller then generates on its own.
+    The batch call runs under the latest deadline of the requests in it.
+    """
+
+    def __init__(self, execute_batch: ExecuteBatchFn):
+        self.execute_batch = execute_batch
+        self.enabled = os.getenv("MICRO_BATCH_ENABLED", "false").lower() in (
+            "1",
+            "true",
+            "yes",
+        )
+        self.window_seconds = float(os.getenv("MICRO_BATCH_WINDOW_MS", "100")) / 1000
+        self.max_batch_size = int(os.getenv("MICRO_BATCH_MAX_SIZE", "8"))
+        self.max_questions = int(os.getenv("MICRO_BATCH_MAX_QUESTIONS", "2"))
+        self.max_total_questions = int(os.getenv("MICRO_BATCH_MAX_TOTAL_QUESTIONS", "8"))
+        self._pending: List[BatchItem] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        # Running batch calls, kept so they are not garbage collected mid-flight
+        self._tasks: Set[asyncio.Task] = set()
+        self._ids = itertools.count(1)
+        self.batches = 0
+        self.batched_requests = 0
+        self.fallbacks = 0
+
+    def accepts(self, num_questions: int) -> bool:
+        return self.enabled and num_questions <= self.max_questions
+
+    async def submit(self, concept: str, num_questions: int) -> List[dict] | None:
+        """Queue a request and wait for its share of the batched response."""
+        pending_questions = sum(item.num_questions for item in self._pending)
+        if self._pending and pending_questions + num_questions > self.max_total_questions:
+            self._flush()
+
+        loop = asyncio.get_running_loop()
+        item = BatchItem(
+            request_id=f"r{next(self._ids)}",
+            concept=concept,
+            num_questions=num_questions,
+            future=loop.create_future(),
+            deadline=current_deadline.get(),
+        )
+        self._pending.append(item)
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window_seconds, self._flush)
+        return await asyncio.shield(item.future)
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        if len(batch) == 1:
+            # Nothing to share the call with
+            batch[0].future.set_result(None)
+            return
+        # A fresh context: the request that triggered the flush must not lend its
+        # deadline or request id to a call made on behalf of the whole batch
+        task = contextvars.Context().run(asyncio.create_task, self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[BatchItem]):
+        self.batches += 1
+        self.batched_requests += len(batch)
+        logger.info(f"Sending micro-batch of {len(batch)} requests")
+        results = {}
+        deadlines = [item.deadline for item in batch]
+        deadline = None if None in deadlines else max(deadlines)
+        try:
+            with deadline_scope(None if deadline is None else deadline - time.monotonic()):
+                results = await self.execute_batch(batch)
+        except Exception as e:
+            logger.warning(f"Micro-batch failed, falling back to single calls: {str(e)}")
+        finally:
+            # Runs on cancellation too, so no waiter is left hanging on its future
+            for item in batch:
+                questions = results.get(item.request_id)
+                if not questions:
+                    self.fallbacks += 1
+                if not item.future.done():
+                    item.future.set_result(questions or None)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "batched_requests": self.batched_requests,
+            "upstream_calls_saved": self.batched_requests - self.batches - self.fallbacks,
+            "fallbacks": self.fallbacks,
+        }
@@ -0,0 +1,222 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, List, Tuple
+from models.question import Question, content_hash
+from models.user_query import UserQuery
+from logger_config import setup_logger
+from services.metrics import STAGE_DURATION, num_questions_bucket
+from services.deadline import time_remaining
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = setup_logger("PersistenceQueue")
+
+QueuedWrite = Tuple[UserQuery, List[Question]]
+
+_backend = None
+
+
+def get_persistence_backend():
+    """
+    Return the process-wide persistence backend selected by PERSISTENCE_BACKEND.
+
+    "supabase" (default) writes through the Supabase REST API; "postgres" writes
+    directly to DATABASE_URL (Postgres or a SQLite stand-in) via SQLAlchemy.
+    """
+    global _backend
+    if _backend is None:
+        backend = os.getenv("PERSISTENCE_BACKEND", "supabase").lower()
+        if backend == "postgres":
+            from services.postgres_connector import PostgresConnector
+
+            _backend = PostgresConnector()
+        elif backend == "supabase":
+            from services.supabase_connector import get_supabase_connector
+
+            _backend = get_supabase_connector()
+        else:
+            raise ValueError(f"Unknown PERSISTENCE_BACKEND '{backend}'")
+        logger.info(f"Using {backend} persistence backend")
+    return _backend
+
+
+class PersistenceQueue:
+    """
+    Write-behind queue for generated queries and questions.
+
+    Handlers enqueue results and return immediately; a background worker collects
+    them into batches and writes each batch with the backend's multi-row
+    ``save_batch``, flushing when the batch is full or the flush interval elapses.
+    The queue is bounded: when it is full, ``enqueue`` waits (backpressure, never
+    past the request's deadline) and falls back to a direct write if no space frees
+    up in time. When the worker is
+    not running (e.g. the serverless entry point has no lifespan) every write goes
+    straight to the backend off the event loop.
+
+    Questions already written by this process (cache hits and coalesced copies
+    are served many times) are dropped from later writes, remembering the last
+    PERSISTENCE_DEDUPE_SIZE content hashes; the query itself is still recorded.
+    """
+
+    def __init__(self, backend_factory: Callable):
+        """
+        Initialize the queue.
+
+        Args:
+            backend_factory: Callable returning a connector that implements
+                save_query_and_questions and save_batch (blocking).
+        """
+        self.backend_factory = backend_factory
+        self.batch_size = int(os.getenv("PERSISTENCE_BATCH_SIZE", "50"))
+        self.flush_seconds = float(os.getenv("PERSISTENCE_FLUSH_SECONDS", "1.0"))
+        self.max_pending = int(os.getenv("PERSISTENCE_MAX_PENDING", "1000"))
+        self.enqueue_timeout = float(os.getenv("PERSISTENCE_ENQUEUE_TIMEOUT", "2.0"))
+        self.dedupe_size = int(os.getenv("PERSISTENCE_DEDUPE_SIZE", "10000"))
+        self._persisted: "OrderedDict[str, None]" = OrderedDict()
+        self._queue: asyncio.Queue[QueuedWrite] | None = None
+        self._task: asyncio.Task | None = None
+        self.enqueued = 0
+        self.flushed_batches = 0
+        self.flushed_items = 0
+        self.direct_writes = 0
+        self.failed_items = 0
+        self.duplicates_dropped = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _drop_persisted(self, questions: List[Question]) -> List[Question]:
+        """Filter out questions this process has already written and remember the rest."""
+        new = []
+        for question in questions:
+            key = content_hash(question)
+            if key in self._persisted:
+                self._persisted.move_to_end(key)
+                self.duplicates_dropped += 1
+                continue
+            self._persisted[key] = None
+            new.append(question)
+        while len(self._persisted) > self.dedupe_size:
+            self._persisted.popitem(last=False)
+        return new
+
+    async def enqueue(self, query: UserQuery, questions: List[Question]):
+        """Queue a query and its questions for persistence."""
+        questions = self._drop_persisted(questions)
+        if not self.running:
+            await self._write_direct(query, questions)
+            return
+        # Backpressure may not hold the response past the request's deadline
+        timeout = self.enqueue_timeout
+        left = time_remaining()
+        if left is not None:
+            timeout = max(0.0, min(timeout, left))
+        try:
+            if timeout > 0:
+                await asyncio.wait_for(self._queue.put((query, questions)), timeout)
+            else:
+                self._queue.put_nowait((query, questions))
+            self.enqueued += 1
+        except (asyncio.TimeoutError, asyncio.QueueFull):
+            logger.warning("Persistence queue is full, writing directly")
+            await self._write_direct(query, questions)
+
+    async def write_batch(self, items: List[QueuedWrite]):
+        """Persist several queries and their questions in one backend call, bypassing the queue."""
+        await self._flush(
+            [(query, self._drop_persisted(questions)) for query, questions in items]
+        )
+
+    async def _write_direct(self, query: UserQuery, questions: List[Question]):
+        self.direct_writes += 1
+        try:
+            backend = self.backend_factory()
+            with STAGE_DURATION.time(
+                stage="persistence",
+                num_questions_bucket=num_questions_bucket(len(questions)),
+            ):
+                await asyncio.to_thread(
+                    backend.save_query_and_questions, query, questions
+                )
+        except Exception as e:
+            self.failed_items += 1
+            logger.error(f"Failed to persist query '{query.concept}': {str(e)}")
+
+    async def _flush(self, batch: List[QueuedWrite]):
+        try:
+            backend = self.backend_factory()
+            with STAGE_DURATION.time(stage="persistence", num_questions_bucket="batch"):
+                await asyncio.to_thread(backend.save_batch, batch)
+            self.flushed_batches += 1
+            self.flushed_items += len(batch)
+            logger.info(f"Flushed {len(batch)} queued writes")
+        except Exception as e:
+            self.failed_items += len(batch)
+            logger.error(
+                f"Failed to flush {len(batch)} queued writes: {str(e)}", exc_info=True
+            )
+
+    async def _collect_batch(self) -> Tuple[List[QueuedWrite], bool]:
+        """
+        Wait for one item, then gather more until the batch is full or time is up.
+
+        Returns the batch and whether the shutdown sentinel was reached.
+        """
+        item = await self._queue.get()
+        if item is None:
+            return [], True
+        batch = [item]
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._collect_batch()
+            if batch:
+                await self._flush(batch)
+
+    def start(self):
+        """Start the background flush worker on the running event loop."""
+        if not self.running:
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._task = asyncio.create_task(self._run())
+            logger.info("Persistence queue started")
+
+    async def stop(self):
+        """Stop accepting queued writes and flush everything still pending."""
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        if not task.done():
+            # The sentinel sits behind every pending item, so the worker drains them all
+            await self._queue.put(None)
+            await task
+        logger.info("Persistence queue stopped")
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "enqueued": self.enqueued,
+            "flushed_batches": self.flushed_batches,
+            "flushed_items": self.flushed_items,
+            "direct_writes": self.direct_writes,
+            "failed_items": self.failed_items,
+            "duplicates_dropped": self.duplicates_dropped,
+        }
@@ -0,0 +1,238 @@
+import json
+import os
+import uuid
+from datetime import datetime
+from typing import List, Tuple
+from sqlalchemy import bindparam, func, insert, select, update
+from models.question import Question
+from models.user_query import UserQuery
+from models.db_models import QuestionDB, QuestionFeedbackStatsDB, UserQueryDB
+from database import get_engine, get_database_url, init_db
+from logger_config import setup_logger
+from services.generation_cache import normalize_concept
+from services.feedback_buffer import FeedbackAggregate, merge_comments
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = setup_logger("PostgresConnector")
+
+
+class PostgresConnector:
+    """
+    Persistence backend that writes directly to Postgres (or a SQLite stand-in)
+    through a pooled SQLAlchemy engine, using the models in models.db_models.
+
+    Exposes the same interface as SupabaseConnector so either can back the
+    persistence queue.
+    """
+
+    def __init__(self):
+        self.engine = get_engine()
+        create_default = "true" if get_database_url().startswith("sqlite") else "false"
+        if os.getenv("DATABASE_CREATE_TABLES", create_default).lower() in (
+            "1",
+            "true",
+            "yes",
+        ):
+            init_db(self.engine)
+
+    def _question_rows(self, questions: List[Question], query_id: str) -> List[dict]:
+        return [
+            {
+                "id": str(uuid.uuid4()),
+                "query_id": query_id,
+                "question_id": q.question_id,
+                "created_at": q.created_at,
+                "question_text": q.question_text,
+                "answer_choices": json.dumps(q.answer_choices),
+                "correct_answer": q.correct_answer,
+                "explanation": q.explanation,
+                "concept_tags": json.dumps(q.concept_tags),
+                "subject": q.subject,
+                "subject_subtopic": q.subject_subtopic,
+            }
+            for q in questions
+        ]
+
+    def save_query_and_questions(self, query: UserQuery, questions: List[Question]):
+        self.save_batch([(query, questions)])
+
+    def save_batch(self, items: List[Tuple[UserQuery, List[Question]]]) -> List[str]:
+        """
+        Save several queries and their questions in a single transaction.
+
+        Rows are sent as executemany bulk inserts, which SQLAlchemy batches into
+        multi-row INSERT statements. Returns the query ids in the order of items.
+        """
+        if not items:
+            return []
+
+        now = datetime.now()
+        query_ids = [str(uuid.uuid4()) for _ in items]
+        query_rows = [
+            {
+                "id": query_id,
+                "concept": query.concept,
+                "num_questions": query.num_questions,
+                "canonical_topic": query.canonical_topic,
+                "created_at": now,
+            }
+            for (query, _), query_id in zip(items, query_ids)
+        ]
+        question_rows = [
+            row
+            for (_, questions), query_id in zip(items, query_ids)
+            for row in self._question_rows(questions, query_id)
+        ]
+
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(insert(UserQueryDB.__table__), query_rows)
+                if question_rows:
+                    conn.execute(insert(QuestionDB.__table__), question_rows)
+        except Exception as e:
+            logger.error(f"Failed to save query batch: {e}")
+            raise e
+        return query_ids
+
+    def fetch_popular_concepts(
+        self, since: datetime, limit: int = 30
+    ) -> List[Tuple[str, int]]:
+        """Return the most requested concepts since a given time, most popular first."""
+        statement = (
+            select(UserQueryDB.concept, func.count().label("requests"))
+            .where(UserQueryDB.created_at >= since)
+            .group_by(UserQueryDB.concept)
+        )
+        with self.engine.connect() as conn:
+            rows = conn.execute(statement).all()
+
+        # Fold spellings that only differ in case/whitespace, keeping the most common
+        totals: dict[str, int] = {}
+        best: dict[str, Tuple[str, int]] = {}
+        for concept, requests in rows:
+            key = normalize_concept(concept)
+            totals[key] = totals.get(key, 0) + requests
+            if key not in best or requests > best[key][1]:
+                best[key] = (concept, requests)
+        ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)
+        return [(best[key][0], total) for key, total in ranked[:limit]]
+
+    def fetch_questions_since(self, since: datetime | None, limit: int = 500) -> List[dict]:
+        """
+        Return stored questions for up to ``limit`` queries saved at or after ``since``.
+
+        Rows are ordered by the time their query was saved, which is carried in
+        ``inserted_at`` along with the query's ``concept`` so callers can page
+        forward incrementally.
+        """
+        queries = select(
+            UserQueryDB.id, UserQueryDB.concept, UserQueryDB.created_at.label("inserted_at")
+        )
+        if since is not None:
+            queries = queries.where(UserQueryDB.created_at >= since)
+        queries = queries.order_by(UserQueryDB.created_at).limit(limit).subquery()
+        statement = (
+            select(QuestionDB.__table__, queries.c.concept, queries.c.inserted_at)
+            .join(queries, QuestionDB.query_id == queries.c.id)
+            .order_by(queries.c.inserted_at, QuestionDB.question_id)
+        )
+        with self.engine.connect() as conn:
+            rows = conn.execute(statement).mappings().all()
+
+        return [
+            {
+                **row,
+                "answer_choices": json.loads(row["answer_choices"]),
+                "concept_tags": json.loads(row["concept_tags"]),
+            }
+            for row in rows
+        ]
+
+    def save_feedback_aggregates(
+        self, aggregates: List[FeedbackAggregate], max_comments: int = 5
+    ):
+        """
+        Add buffered feedback to the per-question totals in one transaction.
+
+        Existing rows are locked, merged in Python (counts added, comments trimmed
+        to the most recent ``max_comments``) and written back with one executemany
+        update; questions without a row yet are inserted in one executemany insert.
+        """
+        if not aggregates:
+            return
+        table = QuestionFeedbackStatsDB.__table__
+        now = datetime.now()
+        try:
+            with self.engine.begin() as conn:
+                existing = {
+                    row.question_hash: row
+                    for row in conn.execute(
+                        select(table)
+                        .where(
+                            table.c.question_hash.in_([a.question_hash for a in aggregates])
+                        )
+                        .with_for_update()
+                    )
+                }
+                inserts, updates = [], []
+                for aggregate in aggregates:
+                    row = existing.get(aggregate.question_hash)
+                    if row is None:
+                        inserts.append(
+                            {
+                                "question_hash": aggregate.question_hash,
+                                "rating_count": aggregate.count,
+                                "rating_sum": aggregate.rating_sum,
+                                "recent_comments": json.dumps(
+                                    aggregate.comments[-max_comments:]
+                                ),
+                                "updated_at": now,
+                            }
+                        )
+                    else:
+                        comments = merge_comments(
+                            json.loads(row.recent_comments),
+                            aggregate.comments,
+                            max_comments,
+                        )
+                        updates.append(
+                            {
+                                "b_question_hash": aggregate.question_hash,
+                                "b_rating_count": row.rating_count + aggregate.count,
+                                "b_rating_sum": row.rating_sum + aggregate.rating_sum,
+                                "b_recent_comments": json.dumps(comments),
+                                "b_updated_at": now,
+                            }
+                        )
+                if inserts:
+                    conn.execute(insert(table), inserts)
+                if updates:
+                    conn.execute(
+                        update(table)
+                        .where(table.c.question_hash == bindparam("b_question_hash"))
+                        .values(
+                            rating_count=bindparam("b_rating_count"),
+                            rating_sum=bindparam("b_rating_sum"),
+                            recent_comments=bindparam("b_recent_comments"),
+                            updated_at=bindparam("b_updated_at"),
+                        ),
+                        updates,
+                    )
+        except Exception as e:
+            logger.error(f"Failed to save feedback aggregates: {e}")
+            raise e
+
+    def fetch_feedback_stats(self, question_hashes: List[str]) -> List[dict]:
+        """Return stored feedback totals for the given question hashes."""
+        if not question_hashes:
+            return []
+        table = QuestionFeedbackStatsDB.__table__
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(table).where(table.c.question_hash.in_(question_hashes))
+            ).mappings().all()
+        return [
+            {**row, "recent_comments": json.loads(row["recent_comments"])} for row in rows
+        ]
@@ -0,0 +1,72 @@
+"""
+Prompt text for question generation.
+
+The instructions and JSON schema never change between requests, so they come first
+as a fixed prefix and only the short request line (concept and count) varies at the
+end. Backends with prompt/KV caching can then reuse the evaluated prefix and only
+process the suffix tokens for each request.
+"""
+
+QUESTION_INSTRUCTIONS = """You write discrete MCAT-style multiple choice questions.
+Each question should be:
+- Discrete (standalone, not passage-based)
+- At the difficulty level appropriate for the MCAT
+- The question stem and answer choices should be unambiguous and clear.
+- Have exactly 4 answer choices
+- Include a clear explanation for the correct answer. the explanation shuold be from first principles and contain a clear and relatable example.
+- Tagged with relevant concept tags
+- Categorized by MCAT subject and subtopic
+
+IMPORTANT FORMATTING RULES:
+- answer_choices: Array of exactly 4 strings WITHOUT letter prefixes (A), B), etc.). Just the answer text.
+- correct_answer: Integer 0, 1, 2, or 3 representing the index of the correct answer in the answer_choices array (0 = first choice, 1 = second choice, etc.)
+
+Return the questions as a JSON array where each question has the following structure:
+{
+"question_text": "The question text here",
+"answer_choices": ["First answer choice text", "Second answer choice text", "Third answer choice text", "Fourth answer choice text"],
+"correct_answer": 0,
+"explanation": "Detailed explanation of why this is correct",
+"concept_tags": ["tag1", "tag2"],
+"subject": "One of: Biology, Biochemistry, Psych/Soc, General Chemistry, Organic Chemistry, Physics",
+"subject_subtopic": "Specific subtopic within the subject (e.g., 'Cell Biology', 'Enzyme Kinetics', 'Cognition', 'Acid-Base Chemistry', 'Reactions', 'Mechanics')"
+}
+
+Return ONLY valid JSON, no markdown formatting or additional text."""
+
+
+def build_question_request(concept: str, num_questions: int) -> str:
+    """The variable part of the prompt."""
+    return f"Generate {num_questions} discrete MCAT-style multiple choice questions about {concept}."
+
+
+def build_question_prompt(concept: str, num_questions: int) -> str:
+    """Full single-message prompt: static instructions first, request last."""
+    return f"{QUESTION_INSTRUCTIONS}\n\n{build_question_request(concept, num_questions)}"
+
+
+def split_prompt(prompt: str) -> tuple[str, str] | None:
+    """Split a prompt into (static instructions, variable suffix) if it has the prefix."""
+    if not prompt.startswith(QUESTION_INSTRUCTIONS):
+        return None
+    return QUESTION_INSTRUCTIONS, prompt[len(QUESTION_INSTRUCTIONS) :].strip()
+
+
+def build_batch_prompt(requests: list[tuple[str, str, int]]) -> str:
+    """
+    Prompt for several (request_id, concept, num_questions) requests in one call.
+
+    The model answers with a JSON object keyed by request id, each value being the
+    JSON array of questions for that request.
+    """
+    lines = "\n".join(
+        f'- "{request_id}": {num_questions} questions about {concept}'
+        for request_id, concept, num_questions in requests
+    )
+    return (
+        f"{QUESTION_INSTRUCTIONS}\n\n"
+        "Generate questions for each of the following requests. Return a single JSON "
+        "object whose keys are the request ids and whose values are the JSON arrays of "
+        "questions for that request, with the structure above.\n"
+        f"{lines}"
+    )
@@ -0,0 +1,319 @@
+import asyncio
+import os
+import statistics
+import time
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, List
+from logger_config import setup_logger
+from services.admission import OverloadedError
+from services.deadline import DeadlineExceededError
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = setup_logger("ProviderRouter")
+
+CompleteFn = Callable[[str, int | None], Awaitable[str]]
+# Opens a streamed completion on the given provider
+StreamFn = Callable[["Provider", str, int | None], AsyncIterator[str]]
+
+
+class CircuitBreaker:
+    """
+    Stop sending traffic to a provider after consecutive failures.
+
+    After ``failure_threshold`` failures in a row the breaker opens for
+    ``cooldown_seconds``; then a single probe request is let through (half-open)
+    and its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, failure_threshold: int, cooldown_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.consecutive_failures = 0
+        self.opened_at: float | None = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.probing:
+            return True
+        return False
+
+    def on_attempt(self):
+        if self.state == "half_open":
+            self.probing = True
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self.probing = False
+        if self.opened_at is not None or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class Provider:
+    """One upstream completion backend with rolling latency and error statistics."""
+
+    def __init__(
+        self,
+        name: str,
+        complete: CompleteFn,
+        kind: str = "openrouter",
+        model: str | None = None,
+    ):
+        self.name = name
+        self.complete = complete
+        self.kind = kind
+        self.model = model
+        window = int(os.getenv("ROUTER_STATS_WINDOW", "50"))
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv("ROUTER_BREAKER_FAILURES", "3")),
+            cooldown_seconds=float(os.getenv("ROUTER_BREAKER_COOLDOWN_SECONDS", "30")),
+        )
+
+    def _percentile(self, fraction: float) -> float | None:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    @property
+    def p50(self) -> float | None:
+        return statistics.median(self.latencies) if self.latencies else None
+
+    @property
+    def p95(self) -> float | None:
+        return self._percentile(0.95)
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def record(self, latency: float, success: bool):
+        self.outcomes.append(success)
+        if success:
+            self.latencies.append(latency)
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "model": self.model,
+            "samples": len(self.latencies),
+            "p50_seconds": self.p50,
+            "p95_seconds": self.p95,
+            "error_rate": self.error_rate,
+            "circuit": self.breaker.state,
+        }
+
+
+class ProviderRouter:
+    """
+    Route completions to the fastest healthy provider.
+
+    Providers are ranked by rolling p50 latency (providers without enough samples
+    keep their configured order behind measured ones). If the primary has not
+    answered by its own p95, a hedged request is sent to the next provider and the
+    first success wins; the loser is cancelled. Failures fail over to the next
+    provider, and a circuit breaker takes repeatedly failing providers out of
+    rotation until a probe succeeds.
+    """
+
+    def __init__(self, providers: List[Provider]):
+        if not providers:
+            raise ValueError("At least one provider is required")
+        self.providers = providers
+        self.hedge_enabled = os.getenv("ROUTER_HEDGE_ENABLED", "true").lower() in (
+            "1",
+            "true",
+            "yes",
+        )
+        self.min_samples = int(os.getenv("ROUTER_MIN_SAMPLES", "5"))
+        self.max_error_rate = float(os.getenv("ROUTER_MAX_ERROR_RATE", "0.5"))
+        self.hedged_requests = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    def ranked(self) -> List[Provider]:
+        """Providers currently allowed by their breaker, fastest healthy first."""
+        allowed = [p for p in self.providers if p.breaker.allow()]
+        healthy = [p for p in allowed if p.error_rate <= self.max_error_rate]
+        candidates = healthy or allowed
+
+        def sort_key(provider: Provider):
+            measured = len(provider.latencies) >= self.min_samples
+            return (
+                0 if measured else 1,
+                provider.p50 if measured else 0.0,
+                self.providers.index(provider),
+            )
+
+        return sorted(candidates, key=sort_key)
+
+    def choose(self) -> Provider:
+        """The provider that would be used as primary right now."""
+        ranked = self.ranked()
+        if not ranked:
+            raise ValueError(
+                "The AI service is temporarily unavailable. Please try again later."
+            )
+        return ranked[0]
+
+    async def _attempt(
+        self, provider: Provider, prompt: str, max_tokens: int | None
+    ) -> str:
+        provider.breaker.on_attempt()
+        start = time.monotonic()
+        try:
+            result = await provider.complete(prompt, max_tokens)
+        except (asyncio.CancelledError, DeadlineExceededError, OverloadedError):
+            # Lost a hedge race, ran out of request time or found no free upstream
+            # slot; says nothing about the provider's health
+            provider.breaker.probing = False
+            raise
+        except Exception:
+            provider.record(time.monotonic() - start, success=False)
+            raise
+        provider.record(time.monotonic() - start, success=True)
+        return result
+
+    def _hedge_delay(self, provider: Provider) -> float | None:
+        if not self.hedge_enabled or len(provider.latencies) < self.min_samples:
+            return None
+        return provider.p95
+
+    async def complete(self, prompt: str, max_tokens: int | None = None) -> str:
+        """Return a completion from the best available provider."""
+        candidates = self.ranked()
+        if not candidates:
+            raise ValueError(
+                "The AI service is temporarily unavailable. Please try again later."
+            )
+
+        backups = candidates[1:]
+        primary = candidates[0]
+        tasks: Dict[asyncio.Task, Provider] = {
+            asyncio.create_task(self._attempt(primary, prompt, max_tokens)): primary
+        }
+        hedge_delay = self._hedge_delay(primary)
+        hedge: Provider | None = None
+        last_error: Exception | None = None
+
+        try:
+            while tasks:
+                timeout = hedge_delay if backups else None
+                done, _ = await asyncio.wait(
+                    tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # Primary is slower than its own p95: hedge on the next provider
+                    hedge = backups.pop(0)
+                    logger.info(f"Hedging request from {primary.name} to {hedge.name}")
+                    self.hedged_requests += 1
+                    tasks[
+                        asyncio.create_task(self._attempt(hedge, prompt, max_tokens))
+                    ] = hedge
+                    hedge_delay = None
+                    continue
+
+                for task in done:
+                    provider = tasks.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        if provider is hedge:
+                            self.hedge_wins += 1
+                        return task.result()
+                    if isinstance(error, (DeadlineExceededError, OverloadedError)):
+                        # No time or upstream capacity left for a backup either
+                        raise error
+                    logger.warning(f"Provider {provider.name} failed: {str(error)}")
+                    last_error = error
+
+                if not tasks and backups:
+                    backup = backups.pop(0)
+                    self.failovers += 1
+                    logger.info(f"Failing over to {backup.name}")
+                    tasks[
+                        asyncio.create_task(self._attempt(backup, prompt, max_tokens))
+                    ] = backup
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        raise last_error
+
+    async def stream(
+        self, prompt: str, max_tokens: int | None, open_stream: StreamFn
+    ) -> AsyncIterator[str]:
+        """
+        Stream a completion from the best available provider.
+
+        Outcomes and latencies feed the same statistics and circuit breakers as
+        ``complete``. A provider that fails before sending anything fails over to
+        the next one; once text has been yielded a failure is raised, since the
+        caller has already used part of the output. Streams are not hedged.
+        """
+        candidates = self.ranked()
+        if not candidates:
+            raise ValueError(
+                "The AI service is temporarily unavailable. Please try again later."
+            )
+
+        for position, provider in enumerate(candidates):
+            if position > 0:
+                self.failovers += 1
+                logger.info(f"Failing over stream to {provider.name}")
+            provider.breaker.on_attempt()
+            start = time.monotonic()
+            sent = False
+            try:
+                async for delta in open_stream(provider, prompt, max_tokens):
+                    sent = True
+                    yield delta
+            except (
+                asyncio.CancelledError,
+                GeneratorExit,
+                DeadlineExceededError,
+                OverloadedError,
+            ):
+                # The reader went away, ran out of time or found no free upstream
+                # slot; not the provider's fault
+                provider.breaker.probing = False
+                raise
+            except Exception as e:
+                provider.record(time.monotonic() - start, success=False)
+                if sent or position == len(candidates) - 1:
+                    raise
+                logger.warning(f"Provider {provider.name} failed: {str(e)}")
+                continue
+            provider.record(time.monotonic() - start, success=True)
+            return
+
+    def stats(self) -> dict:
+        return {
+            "providers": {p.name: p.stats() for p in self.providers},
+            "hedged_requests": self.hedged_requests,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers,
+        }
@@ -0,0 +1,315 @@
+import asyncio
+import base64
+import contextvars
+import heapq
+import itertools
+import os
+import random
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Set, Tuple
+from pydantic import ValidationError
+from models.question import Question, content_hash
+from logger_config import setup_logger
+from services.generation_cache import normalize_concept
+from services.concept_index import concept_key
+from services.serialization import dumps, encode_question
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = setup_logger("QuestionBank")
+
+# (since, limit) -> rows as returned by the persistence backend's fetch_questions_since
+QuestionSource = Callable[[datetime | None, int], List[dict]]
+
+
+class QuestionBank:
+    """
+    In-memory, indexed copy of the stored questions for no-LLM quiz retrieval.
+
+    Questions are loaded from the persistence backend and kept in insertion order
+    with inverted indexes from normalized subject, subtopic, concept tag and the
+    concept of the originating query to question ids, so a filtered lookup is a few
+    set intersections. Each question is kept only as its pre-encoded JSON (without
+    question_id, which is numbered per page), so a page is served by joining bytes.
+    Rows with the same content (the same question stored more than once) are
+    indexed once. Pages are ordered by the stored (created_at, id) of each question
+    and cursors encode that key, so a cursor stays valid on any instance and across
+    restarts. The bank refreshes incrementally: each refresh only fetches
+    queries saved since the newest one already loaded, and lookups start it in the
+    background once QUESTION_BANK_REFRESH_SECONDS have passed. When more than
+    QUESTION_BANK_MAX_QUESTIONS are loaded the oldest are dropped.
+    """
+
+    def __init__(self, source: QuestionSource):
+        self.source = source
+        self.enabled = os.getenv("QUESTION_BANK_ENABLED", "true").lower() in (
+            "1",
+            "true",
+            "yes",
+        )
+        self.refresh_seconds = float(os.getenv("QUESTION_BANK_REFRESH_SECONDS", "30"))
+        self.fetch_batch = int(os.getenv("QUESTION_BANK_FETCH_BATCH", "500"))
+        self.max_questions = int(os.getenv("QUESTION_BANK_MAX_QUESTIONS", "50000"))
+        self.max_page_size = int(os.getenv("QUESTION_BANK_MAX_PAGE_SIZE", "50"))
+
+        # seq -> encoded question; seq increases with insertion order
+        self._questions: Dict[int, bytes] = {}
+        self._row_seq: Dict[str, int] = {}
+        self._seq_row: Dict[int, str] = {}
+        self._hash_seq: Dict[str, int] = {}
+        self._seq_hash: Dict[int, str] = {}
+        # seq -> stored (created_at, row id), the page order and cursor key
+        self._order: Dict[int, Tuple[datetime, str]] = {}
+        self._keys: Dict[int, List[Tuple[str, str]]] = {}
+        self._index: Dict[Tuple[str, str], Set[int]] = {}
+        self._seq = itertools.count(1)
+        self._watermark: datetime | None = None
+        self._last_refresh = 0.0
+        self._refresh_lock: asyncio.Lock | None = None
+        self._refresh_task: asyncio.Task | None = None
+        self.refreshes = 0
+        self.lookups = 0
+
+    def _index_keys(self, row: dict, question: Question) -> List[Tuple[str, str]]:
+        keys = {
+            ("subject", normalize_concept(question.subject)),
+            ("subtopic", normalize_concept(question.subject_subtopic)),
+        }
+        # Concepts are keyed like the concept index, so equivalent wordings match
+        keys.add(("concept", concept_key(question.subject_subtopic)))
+        for tag in question.concept_tags:
+            keys.add(("tag", normalize_concept(tag)))
+            # A tag matching the concept is as good as the concept itself
+            keys.add(("concept", concept_key(tag)))
+        if row.get("concept"):
+            keys.add(("concept", concept_key(row["concept"])))
+        return list(keys)
+
+    def add_rows(self, rows: List[dict]) -> int:
+        """Index backend rows, skipping ones already loaded; return how many were added."""
+        added = 0
+        for row in rows:
+            inserted_at = row.get("inserted_at")
+            if inserted_at is not None and (
+                self._watermark is None or inserted_at > self._watermark
+            ):
+                self._watermark = inserted_at
+            row_id = str(row.get("id"))
+            if row_id in self._row_seq:
+                continue
+            try:
+                question = Question.model_validate(row)
+            except ValidationError as e:
+                logger.warning(f"Skipping invalid stored question {row_id}: {str(e)}")
+                continue
+            digest = content_hash(question)
+            if digest in self._hash_seq:
+                # The same question stored again, e.g. by another instance
+                continue
+
+            seq = next(self._seq)
+            keys = self._index_keys(row, question)
+            self._questions[seq] = encode_question(question, exclude={"question_id"})
+            self._row_seq[row_id] = seq
+            self._seq_row[seq] = row_id
+            self._hash_seq[digest] = seq
+            self._seq_hash[seq] = digest
+            self._order[seq] = (question.created_at, row_id)
+            self._keys[seq] = keys
+            for key in keys:
+                self._index.setdefault(key, set()).add(seq)
+            added += 1
+
+        while len(self._questions) > self.max_questions:
+            self._remove(next(iter(self._questions)))
+        return added
+
+    def _remove(self, seq: int):
+        self._questions.pop(seq)
+        del self._row_seq[self._seq_row.pop(seq)]
+        del self._hash_seq[self._seq_hash.pop(seq)]
+        self._order.pop(seq)
+        for key in self._keys.pop(seq):
+            postings = self._index[key]
+            postings.discard(seq)
+            if not postings:
+                del self._index[key]
+
+    async def _fetch_new(self) -> int:
+        """Page through rows saved since the watermark."""
+        added = 0
+        while True:
+            # Only the blocking fetch runs off the loop; indexing stays on it so
+            # lookups never see the indexes mid-update
+            rows = await asyncio.to_thread(self.source, self._watermark, self.fetch_batch)
+            new = self.add_rows(rows)
+            added += new
+            # Rows at the watermark are re-read each time, so stop once nothing is new
+            if not rows or new == 0:
+                return added
+
+    async def refresh(self, force: bool = False) -> int:
+        """Load newly stored questions if the refresh interval has elapsed."""
+        if not force and time.monotonic() - self._last_refresh < self.refresh_seconds:
+            return 0
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+        async with self._refresh_lock:
+            # Another request may have refreshed while this one waited
+            if not force and time.monotonic() - self._last_refresh < self.refresh_seconds:
+                return 0
+            try:
+                added = await self._fetch_new()
+            except Exception as e:
+                logger.error(f"Question bank refresh failed: {str(e)}")
+                return 0
+            finally:
+                self._last_refresh = time.monotonic()
+            self.refreshes += 1
+            if added:
+                logger.info(
+                    f"Question bank loaded {added} questions ({len(self._questions)} total)"
+                )
+            return added
+
+    def schedule_refresh(self):
+        """Start a refresh in the background if one is due and none is running."""
+        if not self.enabled:
+            return
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        if time.monotonic() - self._last_refresh < self.refresh_seconds:
+            return
+        # Not tied to the request that noticed the refresh was due
+        self._refresh_task = contextvars.Context().run(
+            asyncio.create_task, self.refresh()
+        )
+
+    def start(self):
+        """Warm the bank in the background on startup."""
+        self.schedule_refresh()
+
+    async def stop(self):
+        """Cancel a background refresh that is still running."""
+        task, self._refresh_task = self._refresh_task, None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def _matching(
+        self,
+        subject: str | None,
+        subtopic: str | None,
+        tags: List[str] | None,
+        concept: str | None,
+    ) -> Set[int] | None:
+        """Question seqs matching every given filter, or None if there are no filters."""
+        filters: List[Set[int]] = []
+        if subject:
+            filters.append(self._index.get(("subject", normalize_concept(subject)), set()))
+        if subtopic:
+            filters.append(
+                self._index.get(("subtopic", normalize_concept(subtopic)), set())
+            )
+        if tags:
+            # Any of the requested tags
+            filters.append(
+                set().union(
+                    *(self._index.get(("tag", normalize_concept(t)), set()) for t in tags)
+                )
+            )
+        if concept:
+            filters.append(self._index.get(("concept", concept_key(concept)), set()))
+        if not filters:
+            return None
+        filters.sort(key=len)
+        return set.intersection(*filters)
+
+    def search(
+        self,
+        subject: str | None = None,
+        subtopic: str | None = None,
+        tags: List[str] | None = None,
+        concept: str | None = None,
+        limit: int = 10,
+        cursor: str | None = None,
+        sample: bool = False,
+    ) -> Tuple[List[bytes], str | None, int]:
+        """
+        Return (encoded questions, next_cursor, total_matches) for the given filters.
+
+        With ``sample`` a random selection of ``limit`` matches is returned and there
+        is no next cursor; otherwise matches are paged oldest first and
+        ``next_cursor`` is passed back to get the following page. Raises ValueError
+        for a malformed cursor.
+        """
+        self.lookups += 1
+        limit = max(1, min(limit, self.max_page_size))
+        matching = self._matching(subject, subtopic, tags, concept)
+        candidates = list(self._questions) if matching is None else matching
+        total = len(candidates)
+
+        if sample:
+            chosen = random.sample(list(candidates), min(limit, total))
+            next_cursor = None
+        else:
+            if cursor:
+                after = self._decode_cursor(cursor)
+                try:
+                    candidates = [seq for seq in candidates if self._order[seq] > after]
+                except TypeError:
+                    # Naive vs. aware timestamps: not a cursor from this store
+                    raise ValueError("Invalid cursor.")
+            ordered = heapq.nsmallest(limit + 1, candidates, key=self._order.__getitem__)
+            chosen = ordered[:limit]
+            next_cursor = (
+                self._encode_cursor(self._order[chosen[-1]]) if len(ordered) > limit else None
+            )
+
+        return [self._questions[seq] for seq in chosen], next_cursor, total
+
+    @staticmethod
+    def _encode_cursor(key: Tuple[datetime, str]) -> str:
+        created_at, row_id = key
+        raw = f"{created_at.isoformat()}|{row_id}".encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple[datetime, str]:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+            created_at, row_id = raw.split("|", 1)
+            return datetime.fromisoformat(created_at), row_id
+        except ValueError:
+            raise ValueError("Invalid cursor.")
+
+    @staticmethod
+    def encode_page(questions: List[bytes], next_cursor: str | None, total: int) -> bytes:
+        """Assemble a QuestionPage body, numbering the questions from 1."""
+        # Each stored question is '{"created_at":...}'; splice question_id in front
+        items = b",".join(
+            b'{"question_id":%d,' % idx + encoded[1:]
+            for idx, encoded in enumerate(questions, 1)
+        )
+        return (
+            b'{"questions":['
+            + items
+            + b'],"next_cursor":'
+            + dumps(next_cursor)
+            + b',"total":%d}' % total
+        )
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "questions": len(self._questions),
+            "index_keys": len(self._index),
+            "watermark": self._watermark.isoformat() if self._watermark else None,
+            "refreshes": self.refreshes,
+            "lookups": self.lookups,
+        }
@@ -0,0 +1,178 @@
+import asyncio
+import os
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Callable, Deque, Dict, List, Tuple
+from models.question import Question
+from logger_config import setup_logger
+from services.generation_cache import normalize_concept
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = setup_logger("QuestionPool")
+
+
+class QuestionPool:
+    """
+    Warm inventory of pre-generated questions for the most requested concepts.
+
+    A background loop reads recent demand from the ``user_queries`` table, keeps the
+    hottest concepts topped up to a target number of validated questions, and never
+    spends more than the configured number of generated questions per hour.
+    Requests take what they can from the inventory and generate only the remainder.
+    """
+
+    def __init__(
+        self,
+        question_maker,
+        demand_source: Callable[[datetime, int], List[Tuple[str, int]]],
+    ):
+        """
+        Initialize the pool.
+
+        Args:
+            question_maker: MCATQuestionMaker used to generate refills.
+            demand_source: Blocking callable returning (concept, request_count)
+                pairs for queries made since a given time, most popular first.
+        """
+        self.question_maker = question_maker
+        self.demand_source = demand_source
+        self.target_per_concept = int(os.getenv("QUESTION_POOL_TARGET", "10"))
+        self.max_concepts = int(os.getenv("QUESTION_POOL_MAX_CONCEPTS", "30"))
+        self.refill_batch_size = int(os.getenv("QUESTION_POOL_BATCH_SIZE", "5"))
+        self.refill_concurrency = int(os.getenv("QUESTION_POOL_REFILL_CONCURRENCY", "2"))
+        self.hourly_budget = int(os.getenv("QUESTION_POOL_HOURLY_BUDGET", "200"))
+        self.refresh_seconds = float(os.getenv("QUESTION_POOL_REFRESH_SECONDS", "300"))
+        self.demand_window = timedelta(
+            hours=float(os.getenv("QUESTION_POOL_DEMAND_WINDOW_HOURS", "24"))
+        )
+
+        self._inventory: Dict[str, Deque[Question]] = {}
+        self._hot_concepts: Dict[str, str] = {}  # normalized key -> display concept
+        self._spent: Deque[Tuple[float, int]] = deque()  # (timestamp, questions)
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self.served = 0
+        self.generated = 0
+        self.refill_failures = 0
+
+    @classmethod
+    def enabled_from_env(cls) -> bool:
+        return os.getenv("QUESTION_POOL_ENABLED", "false").lower() in ("1", "true", "yes")
+
+    def take(self, concept: str, num_questions: int) -> List[Question]:
+        """Remove and return up to num_questions pre-generated questions for concept."""
+        inventory = self._inventory.get(normalize_concept(concept))
+        if not inventory:
+            return []
+
+        taken = [inventory.popleft() for _ in range(min(num_questions, len(inventory)))]
+        self.served += len(taken)
+        if len(inventory) < self.target_per_concept:
+            self._wakeup.set()
+        return taken
+
+    def _budget_remaining(self) -> int:
+        """Questions that may still be generated in the current rolling hour."""
+        cutoff = time.monotonic() - 3600
+        while self._spent and self._spent[0][0] < cutoff:
+            self._spent.popleft()
+        return self.hourly_budget - sum(count for _, count in self._spent)
+
+    async def refresh_demand(self):
+        """Reload the set of hot concepts from recent user queries."""
+        since = datetime.now() - self.demand_window
+        popular = await asyncio.to_thread(self.demand_source, since, self.max_concepts)
+        self._hot_concepts = {normalize_concept(c): c for c, _ in popular}
+        # Drop inventory for concepts that have cooled off
+        for key in list(self._inventory):
+            if key not in self._hot_concepts:
+                del self._inventory[key]
+        logger.info(f"Question pool tracking {len(self._hot_concepts)} hot concepts")
+
+    async def _refill_concept(self, key: str, concept: str, semaphore: asyncio.Semaphore):
+        inventory = self._inventory.setdefault(key, deque())
+        while len(inventory) < self.target_per_concept:
+            count = min(
+                self.refill_batch_size,
+                self.target_per_concept - len(inventory),
+                self._budget_remaining(),
+            )
+            if count <= 0:
+                return
+            # Reserve budget before the call so concurrent refills cannot overspend
+            self._spent.append((time.monotonic(), count))
+            async with semaphore:
+                try:
+                    questions = await self.question_maker.generate_questions(
+                        concept=concept, num_questions=count, store=False
+                    )
+                except Exception as e:
+                    self.refill_failures += 1
+                    logger.warning(f"Failed to refill pool for '{concept}': {str(e)}")
+                    return
+            inventory.extend(questions)
+            self.generated += len(questions)
+
+    async def refill(self):
+        """Top up every hot concept to the target level within the hourly budget."""
+        semaphore = asyncio.Semaphore(self.refill_concurrency)
+        await asyncio.gather(
+            *(
+                self._refill_concept(key, concept, semaphore)
+                for key, concept in self._hot_concepts.items()
+            )
+        )
+
+    async def _run(self):
+        last_refresh = 0.0
+        while True:
+            try:
+                if time.monotonic() - last_refresh >= self.refresh_seconds:
+                    await self.refresh_demand()
+                    last_refresh = time.monotonic()
+                await self.refill()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Question pool cycle failed: {str(e)}", exc_info=True)
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.refresh_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Start the background refill loop on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info("Question pool started")
+
+    async def stop(self):
+        """Cancel the background refill loop."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Question pool stopped")
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "hot_concepts": len(self._hot_concepts),
+            "inventory": {
+                self._hot_concepts.get(key, key): len(questions)
+                for key, questions in self._inventory.items()
+            },
+            "target_per_concept": self.target_per_concept,
+            "budget_remaining": self._budget_remaining(),
+            "served": self.served,
+            "generated": self.generated,
+            "refill_failures": self.refill_failures,
+        }
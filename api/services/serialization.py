@@ -0,0 +1,147 @@
+"""
+Fast response serialization for trusted question objects.
+
+Questions built by the app are already validated, so responses are encoded straight
+to JSON bytes with pydantic-core (or orjson for plain data) instead of going through
+FastAPI's response_model validation and jsonable_encoder. Payloads that are served
+repeatedly (cache hits) are encoded once and kept as bytes, optionally with gzip
+and brotli variants, and picked per request from Accept-Encoding. orjson and brotli
+are in requirements.txt; without them (e.g. a bare local environment) encoding
+falls back to the json module and only gzip is pre-compressed. Environment:
+
+- RESPONSE_PRECOMPRESS: encodings to pre-compress cached payloads with
+  ("gzip,br" by default)
+- RESPONSE_COMPRESS_MIN_BYTES: smaller payloads are not compressed (default 1024)
+"""
+
+import gzip
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from models.job import Job
+from models.question import Question
+from logger_config import setup_logger
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = setup_logger("Serialization")
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+QUESTION_LIST = TypeAdapter(List[Question])
+
+# Internal fields never sent to clients
+RESPONSE_EXCLUDE = {"query_id"}
+
+
+def dumps(data) -> bytes:
+    """Encode plain JSON-compatible data, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":")).encode()
+
+
+def encode_questions(questions: List[Question]) -> bytes:
+    """Encode a question list as a JSON array without re-validating it."""
+    return QUESTION_LIST.dump_json(questions, exclude={"__all__": RESPONSE_EXCLUDE})
+
+
+def encode_question(question: Question, exclude: set | None = None) -> bytes:
+    """Encode a single question, excluding internal fields."""
+    return question.__pydantic_serializer__.to_json(
+        question, exclude=RESPONSE_EXCLUDE | (exclude or set())
+    )
+
+
+def encode_job(job: Job) -> bytes:
+    """Encode a job with its questions so far, excluding internal fields."""
+    return job.__pydantic_serializer__.to_json(
+        job, exclude={"questions": {"__all__": RESPONSE_EXCLUDE}}
+    )
+
+
+def _precompress_encodings() -> List[str]:
+    encodings = [
+        e.strip().lower()
+        for e in os.getenv("RESPONSE_PRECOMPRESS", "gzip,br").split(",")
+        if e.strip()
+    ]
+    if "br" in encodings and brotli is None:
+        encodings.remove("br")
+    return encodings
+
+
+@dataclass
+class EncodedPayload:
+    """A JSON body encoded once, plus any pre-compressed variants keyed by encoding."""
+
+    body: bytes
+    compressed: Dict[str, bytes] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, body: bytes, precompress: bool = True) -> "EncodedPayload":
+        payload = cls(body)
+        min_bytes = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", "1024"))
+        if precompress and len(body) >= min_bytes:
+            for encoding in _precompress_encodings():
+                if encoding == "gzip":
+                    payload.compressed["gzip"] = gzip.compress(body, compresslevel=6)
+                elif encoding == "br":
+                    # The default quality (11) takes tens of milliseconds on the
+                    # event loop for a large set; 5 is close in size and far faster
+                    payload.compressed["br"] = brotli.compress(body, quality=5)
+        return payload
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self.body) + sum(len(v) for v in self.compressed.values())
+
+
+def _accepted_encodings(request: Request | None) -> List[str]:
+    if request is None:
+        return []
+    header = request.headers.get("accept-encoding", "")
+    accepted = []
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        accepted.append(name.strip().lower())
+    return accepted
+
+
+def json_response(
+    payload: EncodedPayload | bytes, request: Request | None = None, status_code: int = 200
+) -> Response:
+    """Build a JSON response from pre-encoded bytes, using a compressed variant if accepted."""
+    if isinstance(payload, bytes):
+        payload = EncodedPayload(payload)
+    headers = {}
+    body = payload.body
+    if payload.compressed:
+        headers["Vary"] = "Accept-Encoding"
+        accepted = _accepted_encodings(request)
+        # Prefer brotli, which is smaller for JSON, when the client takes both
+        for encoding in ("br", "gzip"):
+            if encoding in payload.compressed and encoding in accepted:
+                body = payload.compressed[encoding]
+                headers["Content-Encoding"] = encoding
+                break
+    return Response(
+        content=body,
+        status_code=status_code,
+        media_type="application/json",
+        headers=headers,
+    )
@@ -0,0 +1,254 @@
+import asyncio
+import contextvars
+import os
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, List
+from models.question import Question
+from logger_config import setup_logger
+from services.deadline import (
+    current_deadline,
+    deadline_scope,
+    default_budget,
+    run_within_deadline,
+)
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = setup_logger("SingleFlight")
+
+GenerateFn = Callable[[int], Awaitable[List[Question]]]
+# Called once per generation with the requested count and the full result
+StoreFn = Callable[[int, List[Question]], None]
+# Called with partial results (e.g. each finished chunk) while a generation runs
+ProgressFn = Callable[[List[Question]], None]
+
+
+class _Flight:
+    """One upstream generation shared by every request that joined it."""
+
+    def __init__(self, num_questions: int, progress: ProgressFn | None):
+        self.requested: List[int] = [num_questions]
+        # Deadlines (time.monotonic(), None for none) of the waiters known at launch
+        self.deadlines: List[float | None] = [current_deadline.get()]
+        # Each waiter's progress callback, by slot
+        self.progress: List[ProgressFn | None] = [progress]
+        self.reported = 0
+        self.done: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.launched = False
+        self.waiters = 0
+        self.task: asyncio.Task | None = None
+        self.launch_handle: asyncio.TimerHandle | None = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical generation requests into one upstream call.
+
+    In "shared" mode, requests with the same key that arrive while a generation is
+    in flight wait for it and receive copies of the same questions. In "distinct"
+    mode, requests arriving within a short window are pooled: one generation for
+    the combined count is made and each waiter receives its own slice, so students
+    requesting the same concept still get different questions; a waiter whose
+    slice came back short tops it up with its own call. The upstream call runs in
+    its own task with a fresh context, so no waiter's context variables leak into
+    it and a waiter disconnecting never cancels it for the rest; it is cancelled
+    only once every waiter has gone.
+
+    The shared generation runs under the latest deadline of the waiters present at
+    launch, and never a shorter one than REQUEST_DEADLINE_SECONDS, so one client
+    asking for a short timeout cannot shrink the result for everyone else. Each
+    waiter's own deadline is enforced while it waits.
+
+    ``progress`` is the context variable generation code reads its progress
+    callback from. Each waiter's callback is kept, and the shared generation runs
+    with one that passes partial results on to every waiter (in "distinct" mode,
+    only the part that falls in the waiter's slice).
+    """
+
+    def __init__(self, progress: ContextVar[ProgressFn | None] | None = None):
+        self.progress = progress
+        # "shared" (default), "distinct" or "off"
+        self.mode = os.getenv("COALESCE_MODE", "shared").lower()
+        self.window_seconds = float(os.getenv("COALESCE_WINDOW_MS", "50")) / 1000
+        self.max_questions = int(os.getenv("COALESCE_MAX_QUESTIONS", "20"))
+        self._flights: Dict[str, _Flight] = {}
+        self.upstream_calls = 0
+        self.coalesced_requests = 0
+        self.abandoned = 0
+
+    async def run(
+        self,
+        key: str,
+        num_questions: int,
+        fn: GenerateFn,
+        store: StoreFn | None = None,
+    ) -> List[Question]:
+        """
+        Return questions for key, sharing an in-flight generation when possible.
+
+        ``store`` receives the whole result of each upstream generation once, not
+        each waiter's slice of it.
+        """
+        if self.mode == "off":
+            self.upstream_calls += 1
+            questions = await fn(num_questions)
+            if store is not None:
+                store(num_questions, questions)
+            return questions
+
+        flight = self._flights.get(key)
+        if flight is not None and self._can_join(flight, num_questions):
+            slot = len(flight.requested)
+            flight.requested.append(num_questions)
+            flight.deadlines.append(current_deadline.get())
+            flight.progress.append(self._waiter_progress())
+            self.coalesced_requests += 1
+        else:
+            flight = _Flight(num_questions, self._waiter_progress())
+            self._flights[key] = flight
+            slot = 0
+            if self.mode == "distinct":
+                flight.launch_handle = asyncio.get_running_loop().call_later(
+                    self.window_seconds, self._launch, key, flight, fn, store
+                )
+            else:
+                self._launch(key, flight, fn, store)
+
+        flight.waiters += 1
+        try:
+            # Leaves the shared generation running if this waiter runs out of time
+            questions = await run_within_deadline(asyncio.shield(flight.done))
+        except BaseException:
+            flight.waiters -= 1
+            if flight.waiters == 0:
+                self._abandon(key, flight)
+            raise
+        flight.waiters -= 1
+        if self.mode == "distinct":
+            offset = sum(flight.requested[:slot])
+            questions = questions[offset : offset + num_questions]
+            missing = num_questions - len(questions)
+            if missing > 0:
+                # The shared generation came back short and this slice lost out
+                logger.warning(
+                    f"Coalesced slice got {len(questions)}/{num_questions} questions, generating {missing} more"
+                )
+                self.upstream_calls += 1
+                questions = questions + await fn(missing)
+            if not questions:
+                raise ValueError(
+                    "Failed to generate questions. Please try generating questions again."
+                )
+        copies = [question.model_copy(deep=True) for question in questions]
+        for idx, question in enumerate(copies, 1):
+            question.question_id = idx
+        return copies
+
+    def _waiter_progress(self) -> ProgressFn | None:
+        return self.progress.get() if self.progress is not None else None
+
+    def _report_progress(self, flight: _Flight, questions: List[Question]):
+        """Pass partial results of a shared generation on to its waiters."""
+        if self.mode != "distinct":
+            for report in flight.progress:
+                if report is not None:
+                    report(questions)
+            return
+        # Results fill the slices in slot order, as the final result is split
+        start = flight.reported
+        flight.reported += len(questions)
+        offset = 0
+        for requested, report in zip(flight.requested, flight.progress):
+            part = questions[max(0, offset - start) : max(0, offset + requested - start)]
+            offset += requested
+            if report is not None and part:
+                report(part)
+
+    def _can_join(self, flight: _Flight, num_questions: int) -> bool:
+        if self.mode == "distinct":
+            return (
+                not flight.launched
+                and sum(flight.requested) + num_questions <= self.max_questions
+            )
+        return True
+
+    def _launch(
+        self, key: str, flight: _Flight, fn: GenerateFn, store: StoreFn | None
+    ):
+        flight.launched = True
+        if self.mode == "distinct" and self._flights.get(key) is flight:
+            # Late arrivals start a new window instead of joining a launched batch
+            del self._flights[key]
+        total = sum(flight.requested) if self.mode == "distinct" else flight.requested[0]
+        if len(flight.requested) > 1:
+            logger.info(
+                f"Coalesced {len(flight.requested)} requests into one generation of {total} questions"
+            )
+        self.upstream_calls += 1
+        # A fresh context: the first waiter's deadline, request id and other context
+        # variables must not apply to work shared with everyone else
+        flight.task = contextvars.Context().run(
+            asyncio.create_task,
+            self._execute(key, flight, fn, total, store, self._flight_deadline(flight)),
+        )
+
+    @staticmethod
+    def _flight_deadline(flight: _Flight) -> float | None:
+        """The latest waiter deadline, but no earlier than a default request's."""
+        budget = default_budget()
+        if budget is None or None in flight.deadlines:
+            return None
+        return max(flight.deadlines + [time.monotonic() + budget])
+
+    def _abandon(self, key: str, flight: _Flight):
+        """Cancel a generation nobody is waiting for any more."""
+        if flight.done.done():
+            return
+        self.abandoned += 1
+        logger.info("All waiters left, cancelling the shared generation")
+        if flight.launch_handle is not None:
+            flight.launch_handle.cancel()
+        if flight.task is not None:
+            flight.task.cancel()
+        flight.done.cancel()
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    async def _execute(
+        self,
+        key: str,
+        flight: _Flight,
+        fn: GenerateFn,
+        total: int,
+        store: StoreFn | None,
+        deadline: float | None,
+    ):
+        if self.progress is not None:
+            # Set in the flight's own context, so no waiter's callback is replaced
+            self.progress.set(lambda questions: self._report_progress(flight, questions))
+        try:
+            with deadline_scope(None if deadline is None else deadline - time.monotonic()):
+                result = await fn(total)
+            # Only full-count results are stored, never ones shrunk to fit a deadline
+            if store is not None:
+                store(total, result)
+            if not flight.done.done():
+                flight.done.set_result(result)
+        except Exception as e:
+            if not flight.done.done():
+                flight.done.set_exception(e)
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "in_flight": len(self._flights),
+            "upstream_calls": self.upstream_calls,
+            "coalesced_requests": self.coalesced_requests,
+            "abandoned": self.abandoned,
+            "upstream_calls_saved": self.coalesced_requests,
+        }
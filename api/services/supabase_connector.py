@@ -1,13 +1,14 @@
-import psycopg2
-from psycopg2.extras import Json, RealDictCursor
 from dotenv import load_dotenv
+import json
 import os
-from typing import List, Optional
+from collections import Counter
+from typing import List, Optional, Tuple
 from datetime import datetime
 from models.question import Question
 from models.user_query import UserQuery
 from logger_config import setup_logger
-import os
+from services.generation_cache import normalize_concept
+from services.feedback_buffer import FeedbackAggregate, merge_comments
 from supabase import create_client, Client
 
 
@@ -32,6 +33,7 @@ class SupabaseConnector:
                     {
                         "concept": query.concept,
                         "num_questions": query.num_questions,
+                        "canonical_topic": query.canonical_topic,
                     }
                 )
                 .execute()
@@ -53,7 +55,7 @@ class SupabaseConnector:
             # Include question_id (sequential number within query), exclude db_id (auto-generated UUID)
             questions_dict = [
                 {
-                    **q.model_dump(exclude={"db_id", "query_id"}, mode="json"),
+                    **q.model_dump(exclude={"db_id", "query_id", "question_hash"}, mode="json"),
                     "query_id": query_id,
                 }
                 for q in questions
@@ -65,4 +67,200 @@ class SupabaseConnector:
 
     def save_query_and_questions(self, query: UserQuery, questions: List[Question]):
         query_id = self._save_user_query(query)
-        self._save_questions(questions, query_id)
+        if questions:
+            self._save_questions(questions, query_id)
+
+    def save_batch(self, items: List[Tuple[UserQuery, List[Question]]]) -> List[str]:
+        """
+        Save several queries and their questions with two multi-row inserts.
+
+        Returns the inserted query ids in the same order as items.
+        """
+        if not items:
+            return []
+        try:
+            response = (
+                self.supabase.table("user_queries")
+                .insert(
+                    [
+                        {
+                            "concept": query.concept,
+                            "num_questions": query.num_questions,
+                            "canonical_topic": query.canonical_topic,
+                        }
+                        for query, _ in items
+                    ]
+                )
+                .execute()
+            )
+            query_ids = [row.get("id") or row.get("query_id") for row in response.data]
+            if len(query_ids) != len(items) or not all(query_ids):
+                raise ValueError("Failed to get query_ids from inserted user_queries")
+        except Exception as e:
+            logger.error(f"Failed to save user query batch: {e}")
+            raise e
+
+        try:
+            questions_dict = [
+                {
+                    **q.model_dump(exclude={"db_id", "query_id", "question_hash"}, mode="json"),
+                    "query_id": query_id,
+                }
+                for (_, questions), query_id in zip(items, query_ids)
+                for q in questions
+            ]
+            if questions_dict:
+                self.supabase.table("questions").insert(questions_dict).execute()
+        except Exception as e:
+            logger.error(f"Failed to save question batch: {e}")
+            raise e
+        return query_ids
+
+    def fetch_popular_concepts(
+        self, since: datetime, limit: int = 30, max_rows: int = 5000
+    ) -> List[Tuple[str, int]]:
+        """
+        Return the most requested concepts since a given time.
+
+        Concepts are grouped case- and whitespace-insensitively; the most common
+        spelling of each group is returned along with its request count.
+        """
+        try:
+            response = (
+                self.supabase.table("user_queries")
+                .select("concept")
+                .gte("created_at", since.isoformat())
+                .order("created_at", desc=True)
+                .limit(max_rows)
+                .execute()
+            )
+        except Exception as e:
+            logger.error(f"Failed to fetch popular concepts: {e}")
+            raise e
+
+        counts: Counter = Counter()
+        spellings: dict[str, Counter] = {}
+        for row in response.data:
+            concept = (row.get("concept") or "").strip()
+            if not concept:
+                continue
+            key = normalize_concept(concept)
+            counts[key] += 1
+            spellings.setdefault(key, Counter())[concept] += 1
+
+        return [
+            (spellings[key].most_common(1)[0][0], count)
+            for key, count in counts.most_common(limit)
+        ]
+
+    def fetch_questions_since(self, since: datetime | None, limit: int = 500) -> List[dict]:
+        """
+        Return stored questions for up to ``limit`` queries saved at or after ``since``.
+
+        Rows are ordered by the time their query was saved, which is carried in
+        ``inserted_at`` along with the query's ``concept`` so callers can page
+        forward incrementally.
+        """
+        try:
+            request = self.supabase.table("user_queries").select("id, concept, created_at")
+            if since is not None:
+                request = request.gte("created_at", since.isoformat())
+            queries = request.order("created_at").limit(limit).execute().data
+            if not queries:
+                return []
+            questions = (
+                self.supabase.table("questions")
+                .select("*")
+                .in_("query_id", [query["id"] for query in queries])
+                .execute()
+                .data
+            )
+        except Exception as e:
+            logger.error(f"Failed to fetch stored questions: {e}")
+            raise e
+
+        by_query = {query["id"]: query for query in queries}
+        rows = []
+        for question in questions:
+            query = by_query.get(question.get("query_id"))
+            if query is None:
+                continue
+            row = {
+                **question,
+                "concept": query["concept"],
+                "inserted_at": datetime.fromisoformat(query["created_at"]),
+            }
+            for field in ("answer_choices", "concept_tags"):
+                if isinstance(row.get(field), str):
+                    row[field] = json.loads(row[field])
+            rows.append(row)
+        rows.sort(key=lambda row: (row["inserted_at"], row.get("question_id") or 0))
+        return rows
+
+    def save_feedback_aggregates(
+        self, aggregates: List[FeedbackAggregate], max_comments: int = 5
+    ):
+        """
+        Add buffered feedback to the per-question totals with one multi-row upsert.
+
+        The current totals are read first and merged in Python. The REST API has
+        no row locking, so concurrent flushes from separate instances can lose an
+        update; the buffering keeps such flushes rare.
+        """
+        if not aggregates:
+            return
+        try:
+            existing = {
+                row["question_hash"]: row
+                for row in self.fetch_feedback_stats([a.question_hash for a in aggregates])
+            }
+            now = datetime.now().isoformat()
+            rows = []
+            for aggregate in aggregates:
+                row = existing.get(aggregate.question_hash, {})
+                rows.append(
+                    {
+                        "question_hash": aggregate.question_hash,
+                        "rating_count": row.get("rating_count", 0) + aggregate.count,
+                        "rating_sum": row.get("rating_sum", 0) + aggregate.rating_sum,
+                        "recent_comments": merge_comments(
+                            row.get("recent_comments", []),
+                            aggregate.comments,
+                            max_comments,
+                        ),
+                        "updated_at": now,
+                    }
+                )
+            self.supabase.table("question_feedback_stats").upsert(
+                rows, on_conflict="question_hash"
+            ).execute()
+        except Exception as e:
+            logger.error(f"Failed to save feedback aggregates: {e}")
+            raise e
+
+    def fetch_feedback_stats(self, question_hashes: List[str]) -> List[dict]:
+        """Return stored feedback totals for the given question hashes."""
+        if not question_hashes:
+            return []
+        response = (
+            self.supabase.table("question_feedback_stats")
+            .select("*")
+            .in_("question_hash", question_hashes)
+            .execute()
+        )
+        rows = response.data
+        for row in rows:
+            if isinstance(row.get("recent_comments"), str):
+                row["recent_comments"] = json.loads(row["recent_comments"])
+        return rows
+
+
+_connector: SupabaseConnector | None = None
+
+
+def get_supabase_connector() -> SupabaseConnector:
+    """Return the process-wide SupabaseConnector, creating the client on first use."""
+    global _connector
+    if _connector is None:
+        _connector = SupabaseConnector()
+    return _connector
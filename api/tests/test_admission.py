@@ -0,0 +1,37 @@
+from services.admission import ClientRateLimiter, client_address
+
+
+def test_forwarded_for_ignored_without_trusted_proxies():
+    assert client_address("10.0.0.1", "203.0.113.9", trusted_proxies=0) == "10.0.0.1"
+
+
+def test_client_is_hop_added_by_trusted_proxy():
+    # The client sent "1.2.3.4"; the trusted proxy appended the real address
+    assert (
+        client_address("10.0.0.1", "1.2.3.4, 198.51.100.7", trusted_proxies=1)
+        == "198.51.100.7"
+    )
+    assert (
+        client_address("10.0.0.1", "1.2.3.4, 198.51.100.7, 10.0.0.2", trusted_proxies=2)
+        == "198.51.100.7"
+    )
+
+
+def test_short_forwarded_for_falls_back_to_peer():
+    assert client_address("10.0.0.1", "198.51.100.7", trusted_proxies=2) == "10.0.0.1"
+    assert client_address(None, None, trusted_proxies=1) == "unknown"
+
+
+def test_forged_forwarded_for_does_not_get_a_new_bucket(monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_BURST", "1")
+    monkeypatch.setenv("RATE_LIMIT_PER_MINUTE", "1")
+    limiter = ClientRateLimiter()
+
+    def check(forged: str) -> float | None:
+        # The proxy appends the real client address after whatever was sent
+        forwarded_for = f"{forged}, 198.51.100.7"
+        return limiter.check(client_address("10.0.0.1", forwarded_for, trusted_proxies=1))
+
+    assert check("1.1.1.1") is None
+    assert check("2.2.2.2") is not None
+    assert limiter.stats()["tracked_clients"] == 1
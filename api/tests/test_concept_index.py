@@ -0,0 +1,40 @@
+import asyncio
+from datetime import datetime
+
+from services.concept_index import ConceptIndex, concept_key
+
+
+def test_lookups_do_not_wait_for_a_refresh():
+    def failing_source(since, limit):
+        raise RuntimeError("database unavailable")
+
+    async def scenario():
+        index = ConceptIndex(failing_source)
+        index.schedule_refresh()
+        # Served from the (empty) snapshot while the refresh runs and fails
+        key = index.canonical_concept("Acids and Bases")
+        await index.stop()
+        return key
+
+    assert asyncio.run(scenario()) == concept_key("Acids and Bases")
+
+
+def test_background_refresh_learns_aliases():
+    rows = [
+        {
+            "id": "q1",
+            "subject": "General Chemistry",
+            "subject_subtopic": "Acid-Base Equilibria",
+            "concept_tags": ["Acids and Bases"],
+            "inserted_at": datetime(2026, 1, 1),
+        }
+    ]
+
+    async def scenario():
+        index = ConceptIndex(lambda since, limit: rows)
+        index.start()
+        await index._refresh_task
+        return index.lookup("acids & bases")
+
+    match = asyncio.run(scenario())
+    assert match is not None and match.score == 1.0
@@ -0,0 +1,56 @@
+import asyncio
+import threading
+
+from models.feedback import QuestionFeedback
+from services.feedback_buffer import FeedbackBuffer
+
+
+class GatedBackend:
+    """Fails the first flush once released, then records what later flushes write."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = 0
+        self.saved = []
+
+    def save_feedback_aggregates(self, aggregates, max_comments):
+        self.calls += 1
+        if self.calls == 1:
+            self.release.wait(5)
+            raise RuntimeError("database unavailable")
+        self.saved.extend(aggregates)
+
+
+def feedback(comment: str) -> QuestionFeedback:
+    return QuestionFeedback(question_hash="q1", rating=4, comment=comment)
+
+
+def test_failed_flush_keeps_newest_comments(monkeypatch):
+    monkeypatch.setenv("FEEDBACK_FLUSH_SECONDS", "3600")
+    monkeypatch.setenv("FEEDBACK_RECENT_COMMENTS", "3")
+    backend = GatedBackend()
+
+    async def scenario():
+        buffer = FeedbackBuffer(lambda: backend)
+        buffer.start()
+        for comment in ("old 1", "old 2"):
+            await buffer.add(feedback(comment))
+
+        # Newer feedback arrives while the older batch is being written
+        flush = asyncio.create_task(buffer.flush())
+        while backend.calls == 0:
+            await asyncio.sleep(0.01)
+        for comment in ("new 1", "new 2"):
+            await buffer.add(feedback(comment))
+        backend.release.set()
+        await flush
+        assert buffer.failed_flushes == 1
+
+        await buffer.flush()
+        await buffer.stop()
+        return backend.saved
+
+    saved = asyncio.run(scenario())
+    assert len(saved) == 1
+    assert saved[0].count == 4
+    assert saved[0].comments == ["old 2", "new 1", "new 2"]
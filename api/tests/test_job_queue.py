@@ -0,0 +1,62 @@
+import asyncio
+from datetime import datetime
+
+from models.question import Question
+from models.user_query import UserQuery
+from services.job_queue import JobQueue, MemoryJobStore
+from services.mcat_question_maker import generation_progress
+from services.single_flight import SingleFlight
+
+
+def make_questions(count: int, start: int = 0) -> list[Question]:
+    return [
+        Question(
+            question_id=i + 1,
+            created_at=datetime(2026, 1, 1),
+            question_text=f"Question {start + i}?",
+            answer_choices=["A", "B", "C", "D"],
+            correct_answer=0,
+            explanation="Because.",
+            concept_tags=[],
+            subject="Biology",
+            subject_subtopic="Enzymes",
+        )
+        for i in range(count)
+    ]
+
+
+def test_job_reports_chunks_of_a_shared_generation(monkeypatch):
+    monkeypatch.setenv("COALESCE_MODE", "shared")
+    flight = SingleFlight(progress=generation_progress)
+    completed = []
+
+    async def generate_chunks(count: int):
+        questions = []
+        for start in range(0, count, 3):
+            await asyncio.sleep(0.01)
+            chunk = make_questions(3, start)
+            questions.extend(chunk)
+            generation_progress.get()(chunk)
+            completed.append((await queue.get(job.job_id)).completed)
+        return questions
+
+    async def generate(query: UserQuery):
+        return await flight.run("key", query.num_questions, generate_chunks)
+
+    async def persist(query, questions):
+        pass
+
+    queue = JobQueue(generate, persist, MemoryJobStore())
+
+    async def scenario():
+        nonlocal job
+        job, _ = await queue.submit(UserQuery(concept="Enzymes", num_questions=9))
+        while not (await queue.get(job.job_id)).finished:
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return await queue.get(job.job_id)
+
+    job = None
+    finished = asyncio.run(scenario())
+    assert completed == [3, 6, 9]
+    assert finished.completed == 9
@@ -0,0 +1,29 @@
+import asyncio
+
+from services.deadline import deadline_scope, time_remaining
+from services.micro_batcher import MicroBatcher
+
+
+def test_batch_runs_under_the_latest_waiter_deadline(monkeypatch):
+    monkeypatch.setenv("MICRO_BATCH_ENABLED", "true")
+    monkeypatch.setenv("MICRO_BATCH_WINDOW_MS", "10")
+    budgets = []
+
+    async def execute_batch(items):
+        budgets.append(time_remaining())
+        return {item.request_id: [{"concept": item.concept}] for item in items}
+
+    async def submit(batcher, concept, seconds):
+        with deadline_scope(seconds):
+            return await batcher.submit(concept, 1)
+
+    async def scenario():
+        batcher = MicroBatcher(execute_batch)
+        return await asyncio.gather(
+            submit(batcher, "Acids", 1), submit(batcher, "Enzymes", 60)
+        )
+
+    results = asyncio.run(scenario())
+    assert results == [[{"concept": "Acids"}], [{"concept": "Enzymes"}]]
+    # Not the short deadline of the request that happened to be first
+    assert budgets[0] > 30
@@ -0,0 +1,27 @@
+import asyncio
+
+import pytest
+
+from services.admission import OverloadedError
+from services.provider_router import Provider, ProviderRouter
+
+
+def test_no_free_upstream_slot_is_not_a_provider_failure():
+    backup_calls = []
+
+    async def busy(prompt, max_tokens):
+        raise OverloadedError("busy")
+
+    async def backup(prompt, max_tokens):
+        backup_calls.append(prompt)
+        return "ok"
+
+    primary = Provider("primary", busy)
+    router = ProviderRouter([primary, Provider("backup", backup)])
+
+    with pytest.raises(OverloadedError):
+        asyncio.run(router.complete("prompt"))
+    # Neither penalised nor failed over, since any backup would queue as well
+    assert primary.breaker.consecutive_failures == 0
+    assert not primary.outcomes
+    assert backup_calls == []
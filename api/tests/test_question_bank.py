@@ -0,0 +1,70 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.question_bank import QuestionBank
+
+BASE = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def row(row_id: str, text: str, minutes: int = 0) -> dict:
+    return {
+        "id": row_id,
+        "question_id": 1,
+        "created_at": BASE + timedelta(minutes=minutes),
+        "question_text": text,
+        "answer_choices": ["A", "B", "C", "D"],
+        "correct_answer": 0,
+        "explanation": "Because.",
+        "concept_tags": ["Acids"],
+        "subject": "General Chemistry",
+        "subject_subtopic": "Acid-Base",
+        "concept": "Acids and Bases",
+        "inserted_at": BASE + timedelta(minutes=minutes),
+    }
+
+
+def test_duplicate_content_is_indexed_once():
+    bank = QuestionBank(lambda since, limit: [])
+    added = bank.add_rows([row("a", "What is pH?"), row("b", "What  is pH?", 1)])
+    assert added == 1
+    _, _, total = bank.search(concept="acids and bases")
+    assert total == 1
+
+
+def test_cursor_is_valid_on_another_instance():
+    rows = [row(f"r{i}", f"Question {i}?", i) for i in range(5)]
+    first = QuestionBank(lambda since, limit: [])
+    first.add_rows(rows)
+    page, cursor, _ = first.search(limit=2)
+    assert len(page) == 2 and cursor is not None
+
+    # Another instance that loaded the same rows in a different order
+    second = QuestionBank(lambda since, limit: [])
+    second.add_rows(list(reversed(rows)))
+    rest, _, _ = second.search(limit=10, cursor=cursor)
+    assert [b"Question 2?" in q for q in rest] == [True, False, False]
+    assert len(rest) == 3
+
+
+def test_malformed_cursor_is_rejected():
+    bank = QuestionBank(lambda since, limit: [])
+    with pytest.raises(ValueError):
+        bank.search(cursor="not a cursor")
+
+
+def test_background_refresh_loads_new_rows():
+    rows = [row("a", "What is pH?")]
+
+    async def scenario():
+        bank = QuestionBank(lambda since, limit: rows)
+        bank.schedule_refresh()
+        # Lookups do not wait for the refresh
+        _, _, before = bank.search(concept="acids and bases")
+        await bank._refresh_task
+        _, _, after = bank.search(concept="acids and bases")
+        await bank.stop()
+        return before, after
+
+    assert asyncio.run(scenario()) == (0, 1)
@@ -0,0 +1,119 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from models.question import Question
+from services.deadline import DeadlineExceededError, deadline_scope, time_remaining
+from services.single_flight import SingleFlight
+
+
+def make_questions(count: int, start: int = 0) -> list[Question]:
+    return [
+        Question(
+            question_id=i + 1,
+            created_at=datetime(2026, 1, 1),
+            question_text=f"Question {start + i}?",
+            answer_choices=["A", "B", "C", "D"],
+            correct_answer=0,
+            explanation="Because.",
+            concept_tags=[],
+            subject="Physics",
+            subject_subtopic="Kinematics",
+        )
+        for i in range(count)
+    ]
+
+
+def test_short_waiter_deadline_does_not_apply_to_shared_flight(monkeypatch):
+    monkeypatch.setenv("COALESCE_MODE", "shared")
+    monkeypatch.setenv("REQUEST_DEADLINE_SECONDS", "120")
+    budgets = []
+    stored = []
+
+    async def generate(count: int) -> list[Question]:
+        budgets.append(time_remaining())
+        await asyncio.sleep(0.2)
+        return make_questions(count)
+
+    async def scenario():
+        flight = SingleFlight()
+
+        async def short():
+            with deadline_scope(0.05):
+                return await flight.run("k", 3, generate, lambda n, qs: stored.append(n))
+
+        async def normal():
+            await asyncio.sleep(0.01)
+            return await flight.run("k", 3, generate, lambda n, qs: stored.append(n))
+
+        return await asyncio.gather(short(), normal(), return_exceptions=True)
+
+    short_result, normal_result = asyncio.run(scenario())
+    assert isinstance(short_result, DeadlineExceededError)
+    assert len(normal_result) == 3
+    assert len(budgets) == 1 and budgets[0] > 100
+    assert stored == [3]
+
+
+def test_short_distinct_slice_is_topped_up(monkeypatch):
+    monkeypatch.setenv("COALESCE_MODE", "distinct")
+    calls = []
+
+    async def generate(count: int) -> list[Question]:
+        calls.append(count)
+        # The shared generation comes back two questions short
+        return make_questions(count - 2 if len(calls) == 1 else count, start=100 * len(calls))
+
+    async def scenario():
+        flight = SingleFlight()
+        return await asyncio.gather(
+            flight.run("k", 2, generate), flight.run("k", 2, generate)
+        )
+
+    first, second = asyncio.run(scenario())
+    assert calls == [4, 2]
+    assert len(first) == 2 and len(second) == 2
+    assert {q.question_text for q in first}.isdisjoint(q.question_text for q in second)
+
+
+def test_empty_distinct_slice_is_an_error(monkeypatch):
+    monkeypatch.setenv("COALESCE_MODE", "distinct")
+
+    async def generate(count: int) -> list[Question]:
+        return []
+
+    async def scenario():
+        return await SingleFlight().run("k", 2, generate)
+
+    with pytest.raises(ValueError):
+        asyncio.run(scenario())
+
+
+def test_distinct_waiters_see_progress_of_their_own_slice(monkeypatch):
+    from contextvars import ContextVar
+
+    monkeypatch.setenv("COALESCE_MODE", "distinct")
+    progress = ContextVar("progress", default=None)
+    reported = {"a": [], "b": []}
+
+    async def generate(count: int) -> list[Question]:
+        questions = []
+        for start in range(0, count, 2):
+            chunk = make_questions(2, start)
+            questions.extend(chunk)
+            progress.get()(chunk)
+        return questions
+
+    async def waiter(flight: SingleFlight, name: str, count: int):
+        progress.set(lambda questions: reported[name].extend(questions))
+        return await flight.run("key", count, generate)
+
+    async def scenario():
+        flight = SingleFlight(progress=progress)
+        await asyncio.gather(waiter(flight, "a", 3), waiter(flight, "b", 3))
+
+    asyncio.run(scenario())
+    texts = {name: [q.question_text for q in qs] for name, qs in reported.items()}
+    assert texts["a"] == ["Question 0?", "Question 1?", "Question 2?"]
+    assert texts["b"] == ["Question 3?", "Question 4?", "Question 5?"]
@@ -58,7 +58,7 @@ export default function QuestionCard({ question }: QuestionCardProps) {
         <p className="text-gray-700 leading-relaxed">{question.explanation}</p>
       </div>
 
-      <QuestionFeedback questionId={question.question_id} />
+      <QuestionFeedback questionHash={question.question_hash} />
     </div>
   );
 }
@@ -4,11 +4,11 @@ import { useState } from 'react';
 import { submitFeedback } from '@/lib/api';
 
 interface QuestionFeedbackProps {
-  questionId: number;
+  questionHash: string;
   onFeedbackSubmitted?: () => void;
 }
 
-export default function QuestionFeedback({ questionId, onFeedbackSubmitted }: QuestionFeedbackProps) {
+export default function QuestionFeedback({ questionHash, onFeedbackSubmitted }: QuestionFeedbackProps) {
   const [rating, setRating] = useState(0);
   const [hoveredRating, setHoveredRating] = useState(0);
   const [comment, setComment] = useState('');
@@ -33,7 +33,7 @@ export default function QuestionFeedback({ questionId, onFeedbackSubmitted }: Qu
 
     try {
       await submitFeedback({
-        question_id: questionId,
+        question_hash: questionHash,
         rating,
         comment: comment.trim(),
       });
@@ -97,11 +97,11 @@ export default function QuestionFeedback({ questionId, onFeedbackSubmitted }: Qu
         </div>
 
         <div className="mb-4">
-          <label htmlFor={`comment-${questionId}`} className="block text-sm font-medium text-gray-700 mb-2">
+          <label htmlFor={`comment-${questionHash}`} className="block text-sm font-medium text-gray-700 mb-2">
             Comment (optional):
           </label>
           <textarea
-            id={`comment-${questionId}`}
+            id={`comment-${questionHash}`}
             value={comment}
             onChange={(e) => setComment(e.target.value)}
             placeholder="Share your thoughts about this question..."
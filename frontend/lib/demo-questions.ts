@@ -3,6 +3,7 @@ import { Question } from '@/types';
 export const DEMO_QUESTIONS: Question[] = [
   {
     question_id: 1,
+    question_hash: "demo-1",
     created_at: new Date().toISOString(),
     question_text: "A researcher is studying the structure of a protein and observes that it has multiple polypeptide chains that are held together by disulfide bonds and hydrogen bonds. What level of protein structure is being described?",
     answer_choices: [
@@ -19,6 +20,7 @@ export const DEMO_QUESTIONS: Question[] = [
   },
   {
     question_id: 2,
+    question_hash: "demo-2",
     created_at: new Date().toISOString(),
     question_text: "An enzyme has a Km value of 2 mM for its substrate. Which of the following statements best describes the meaning of this Km value?",
     answer_choices: [
@@ -35,6 +37,7 @@ export const DEMO_QUESTIONS: Question[] = [
   },
   {
     question_id: 3,
+    question_hash: "demo-3",
     created_at: new Date().toISOString(),
     question_text: "During protein synthesis, a newly formed polypeptide chain is translocated into the endoplasmic reticulum (ER) lumen. Which of the following sequences would most likely be found at the N-terminus of this protein?",
     answer_choices: [
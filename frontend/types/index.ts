@@ -18,6 +18,7 @@ export interface Question {
   subject_subtopic: string;
   // db_id?: string;  // UUID from database
   query_id?: string;  // UUID of the query this question belongs to
+  question_hash: string;  // Stable id of the question's content; used for feedback
 }
 
 export interface UserQuery {
@@ -31,13 +32,13 @@ export interface GenerateQuestionsRequest {
 }
 
 export interface FeedbackSubmission {
-  question_id: number;
+  question_hash: string;
   rating: number;
   comment: string;
 }
 
 export interface QuestionFeedback {
-  question_id: number;
+  question_hash: string;
   rating: number;
   comment: string;
   created_at: string;